@@ -3,6 +3,7 @@
 import math as m
 import cv2
 import numpy as np
+from collections import OrderedDict
 #------------------------------------------------------------------------------#
 def d2_gaussianMasks(s):
     """Implements Gaussian's second derivatives masks for a given standard
@@ -44,7 +45,220 @@ def d2_gaussianMasks(s):
 
 '-----------------------------------------------------------------------------'
 
-def MVEF_2D(I, scales, thresholds):
+class HessianBank(object):
+    """Bank of the separable filters used to compute the Hessian matrix of
+    an image smoothed by a Gaussian kernel of standard deviation sigma (the
+    scales of MVEF_2D). For each sigma, the 1-D kernels are computed once:
+    the Gaussian kernel g of scipy.ndimage.gaussian_filter (truncated at 4
+    sigma), and the kernels g1, g2 of its first and second derivatives by
+    central differences (g convolved once and twice with [0.5, 0, -0.5], as
+    np.gradient). The kernels are kept in a least recently used order: when
+    the bank holds more than maxEntries sigmas, the least recently used
+    ones are removed.
+    The Hessian matrix is the same as skimage.feature.hessian_matrix (with
+    mode = 'constant' and use_gaussian_derivatives = False): one Gaussian
+    smoothing, with cv2.sepFilter2D (or by FFT for kernels longer than
+    fftSize), shared by the three second derivatives.
+
+    Args:
+        maxEntries (int): maximal number of sigmas whose kernels are kept
+        fftSize (int): kernels longer than fftSize are applied by FFT
+
+    Example:
+        > bank = HessianBank()
+        > Hrr, Hrc, Hcc = bank.hessian(I, 2.)
+        > Ic = bank.derivative(I, 2., order = (0, 1))
+        > bank.report()
+    """
+
+    def __init__(self, maxEntries = 16, fftSize = 101):
+        import threading
+
+        self.maxEntries = maxEntries
+        self.fftSize = fftSize
+        self.filters = OrderedDict()
+        #the bank can be shared by the threads of a tiled MVEF_2D
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def kernels(self, sigma):
+        """Returns the 1-D kernels (g, g1, g2) of standard deviation sigma,
+        as convolution kernels, from the bank if possible.
+        """
+        key = round(float(sigma), 6)
+        with self.lock:
+            if key in self.filters:
+                self.hits = self.hits + 1
+                self.filters.move_to_end(key)
+                return self.filters[key]
+            self.misses = self.misses + 1
+            #same kernel as scipy.ndimage.gaussian_filter
+            radius = int(4. * sigma + 0.5)
+            x = np.arange(-radius, radius + 1)
+            g = np.exp(-0.5 / (sigma * sigma) * x ** 2)
+            g = g / g.sum()
+            g1 = np.convolve(g, [0.5, 0., -0.5])
+            g2 = np.convolve(g1, [0.5, 0., -0.5])
+            kernels = (g, g1, g2)
+            self.filters[key] = kernels
+            while len(self.filters) > self.maxEntries:
+                self.filters.popitem(last = False)
+        return kernels
+
+    def _filter(self, F, kernelR, kernelC):
+        """Separable convolution of the float image F by kernelR along axis 0
+        and kernelC along axis 1, pixels outside F being 0.
+        """
+        if max(kernelR.size, kernelC.size) > self.fftSize:
+            from scipy.signal import fftconvolve
+            return fftconvolve(fftconvolve(F, kernelR[:, np.newaxis], mode = 'same'), kernelC[np.newaxis, :], mode = 'same')
+        #cv2 computes correlations: kernels are flipped
+        return cv2.sepFilter2D(F, cv2.CV_64F, kernelC[::-1], kernelR[::-1], borderType = cv2.BORDER_CONSTANT)
+
+    def derivative(self, I, sigma, order = (0, 0)):
+        """Derivative of order (order along axis 0, order along axis 1),
+        each order being 0, 1 or 2, of the image I (one canal) smoothed by
+        the Gaussian kernel of standard deviation sigma.
+        """
+        from skimage.util import img_as_float
+
+        k = self.kernels(sigma)
+        return self._filter(np.float64(img_as_float(I)), k[order[0]], k[order[1]])
+
+    def hessian(self, I, sigma):
+        """Hessian matrix [Hrr, Hrc, Hcc] of the image I (one canal) smoothed
+        by the Gaussian kernel of standard deviation sigma: same output as
+        skimage.feature.hessian_matrix(I, sigma, order = 'rc').
+        """
+        smoothed = self.derivative(I, sigma)
+        gradR = np.gradient(smoothed, axis = 0)
+        gradC = np.gradient(smoothed, axis = 1)
+        del smoothed
+        return [np.gradient(gradR, axis = 0), np.gradient(gradR, axis = 1), np.gradient(gradC, axis = 1)]
+
+    def report(self):
+        """Returns a dict with the number of hits and misses of the bank and
+        the number of sigmas whose kernels are kept.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.filters)}
+
+#filter bank shared by MVEF_2D calls
+hessianBank = HessianBank()
+
+def _expLoop(x, out):
+    """out = exp(x), element by element, with math.exp (exponential of the C
+    library, used by the pixel loop of MVEF_2D; np.exp can differ from it
+    by one unit in the last place). Compiled by Numba, see _exp.
+    """
+    for k in range(x.size):
+        out[k] = m.exp(x[k])
+    return out
+
+# Numba-compiled version of _expLoop, built on first use
+_kernels = {}
+
+def _exp(x):
+    """Exponential of the array x. With Numba installed, it is identical to
+    math.exp applied to each element (compiled _expLoop), so that the
+    vectorized MVEF_2D gives the same output as the pixel loop. Otherwise
+    np.exp is used, which can differ from math.exp by one unit in the last
+    place.
+    """
+    if 'exp' not in _kernels:
+        try:
+            import numba
+            _kernels['exp'] = numba.njit(cache = True, nogil = True)(_expLoop)
+        except ImportError:
+            _kernels['exp'] = None
+    x = np.asarray(x, dtype = float)
+    if _kernels['exp'] is None:
+        with np.errstate(over = 'ignore', under = 'ignore'):
+            return np.exp(x)
+    return _kernels['exp'](x.ravel(), np.empty(x.size)).reshape(x.shape)
+
+def _foldScale(eigvals, s, sc, b, c, I2, scale):
+    """Computes the vesselness of scale s (index sc in the scales of
+    MVEF_2D) from the eigenvalues of the Hessian matrix, and folds it into
+    the running maximum I2 and the argmax scale (both modified in place).
+    """
+    #same operations as in the loop of MVEF_2D, on all the pixels with a
+    #positive highest eigenvalue at once
+    positive = eigvals[0] > 0
+    e0 = eigvals[0][positive]
+    e1 = eigvals[1][positive]
+    R = e1/e0
+    Fr = np.sqrt(e0*e0 + e1*e1)
+    v = s*_exp(-R*R/(2.*b*b))*(1.-_exp(-Fr*Fr/(2*c*c)))
+    del e0, e1, R, Fr
+    #vesselness is null where the highest eigenvalue is not positive
+    if sc == 0:
+        I2[positive] = v
+    else:
+        larger = np.zeros(positive.shape, dtype = bool)
+        larger[positive] = v > I2[positive]
+        I2[larger] = v[larger[positive]]
+        scale[larger] = sc
+
+def _MVEFTiled(I, scales, b, c, bank, tile, workers):
+    """Vectorized MVEF_2D of the one canal image I, computed tile by tile
+    on a thread pool. Each tile of size tile x tile is extended by a halo
+    of the radius of the largest Gaussian kernel plus 2 pixels (the central
+    differences of the Hessian), so that the Hessian matrices of the tile
+    pixels are computed from the same pixels as in the whole image. If c
+    is 0, it is first computed from the maxima of the Frobenius norm on the
+    tiles. Returns I2 and the argmax scale.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from skimage.feature import hessian_matrix_eigvals
+
+    halo = int(4. * max(scales) + 0.5) + 2
+    align = 16
+    tiles = [(r, c0) for r in range(0, I.shape[0], tile) for c0 in range(0, I.shape[1], tile)]
+
+    def window(t):
+        """sub-image of tile t with its halo, and slices of the tile in it"""
+        r1, r2 = max(t[0] - halo, 0), min(t[0] + tile + halo, I.shape[0])
+        #columns aligned to the vectorization of the filters (the last
+        #columns of a row are computed apart and can differ by a rounding)
+        c1 = max((t[1] - halo) // align * align, 0)
+        c2 = min(-(-(t[1] + tile + halo) // align) * align, I.shape[1])
+        inner = (slice(t[0] - r1, min(t[0] + tile, I.shape[0]) - r1), slice(t[1] - c1, min(t[1] + tile, I.shape[1]) - c1))
+        return I[r1:r2, c1:c2], inner
+
+    def frobenius(t):
+        sub, inner = window(t)
+        H = bank.hessian(sub, scales[0])
+        return np.amax(np.sqrt(H[0]**2+ H[1]**2 + 2 * H[2]**2)[inner])
+
+    I2 = np.zeros((I.shape[0], I.shape[1]))
+    scale = np.zeros((I.shape[0], I.shape[1]), dtype = int)
+    #builds the kernels (and compiles _exp) before the threads use them
+    _exp(np.zeros(1))
+    for s in scales:
+        bank.kernels(s)
+
+    def vesselness(t):
+        sub, inner = window(t)
+        subI2 = np.zeros(sub.shape)
+        subScale = np.zeros(sub.shape, dtype = int)
+        for sc in range(len(scales)):
+            eigvals = hessian_matrix_eigvals(bank.hessian(sub, scales[sc]))
+            _foldScale(eigvals, scales[sc], sc, b, c, subI2, subScale)
+            del eigvals
+        rows = slice(t[0], t[0] + subI2[inner].shape[0])
+        cols = slice(t[1], t[1] + subI2[inner].shape[1])
+        I2[rows, cols] = subI2[inner]
+        scale[rows, cols] = subScale[inner]
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        if c == 0:
+            c = 1 / 2 * max(executor.map(frobenius, tiles))
+        list(executor.map(vesselness, tiles))
+    return I2, scale
+
+def MVEF_2D(I, scales, thresholds, method = 'vectorized', argmax = False, bank = None,\
+            tile = None, workers = None):
     """Multiscale Vessel Enhancement Method for 2D images - based on Frangi's,
     Rana's, and Jalborg's works. This method searches for geometrical 
     structures which can be regarded as tubular.
@@ -62,10 +276,31 @@ def MVEF_2D(I, scales, thresholds):
                             of the hessian matrix.
         scales (list):      scales is a list of lengths that correspond to 
                             the diameter (in pixels) of the tube-like structure to find
+        method (string):    'vectorized' (default) or 'loop'. Both return the
+                            same array. 'vectorized' computes the vesselness of
+                            all pixels of a scale at once; 'loop' computes it
+                            pixel by pixel and is kept for reference and benchmarking.
+                            With 'vectorized', the scales are processed one
+                            after the other and folded into a running maximum,
+                            so that the memory used does not depend on the
+                            number of scales.
+        argmax (bool):      if True, the index in scales of the scale giving
+                            the highest vesselness of each pixel is also returned
+        bank (HessianBank): filters used to compute the Hessian matrices.
+                            If None, the module bank hessianBank is used.
+        tile (int):         if not None (method 'vectorized' only), the image
+                            is processed by tiles of size tile x tile, with
+                            overlapping halos, on a thread pool; the output is
+                            the same as without tiles (as long as the Gaussian
+                            kernels are not applied by FFT, see HessianBank)
+        workers (int):      number of threads used with tiles. If None, the
+                            default of concurrent.futures.ThreadPoolExecutor
     
     Outputs:
         I2 (2D array):  one-canal image I, filtered by the multiscale vessel enhancement
                         filter
+        scale (2D array of int): only if argmax is True, index of the scale
+                        of the highest vesselness of each pixel (first one if equal)
     References:
         Based on [ Automatic detection of skeletal muscle architecture 
         features, Frida Elen Jalborg, Master’s Thesis Spring 2016 ]
@@ -76,28 +311,43 @@ def MVEF_2D(I, scales, thresholds):
                 architecture of human muscle using free hand ultrasound]
 
     """
-    from skimage.feature import hessian_matrix, hessian_matrix_eigvals
+    from skimage.feature import hessian_matrix_eigvals
     
+    if bank is None:
+        bank = hessianBank
     if len(I.shape)>2:
         I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
 
 
-    vesselness = np.zeros((I.shape[0], I.shape[1], len(scales)))
+    if method == 'loop':
+        vesselness = np.zeros((I.shape[0], I.shape[1], len(scales)))
     I2 = np.zeros((I.shape[0], I.shape[1]))
+    scale = np.zeros((I.shape[0], I.shape[1]), dtype = int)
     b = thresholds[0]
     c = thresholds[1]
     if b == 0:
          ValueError('first element of thresholds cannot be null')
     
+    if tile is not None and method == 'vectorized':
+        I2, scale = _MVEFTiled(I, scales, b, c, bank, tile, workers)
+        return (I2, scale) if argmax else I2
+    
     #calculation of Hessian matrix and its eigen values.
     #Corresponding eigen vectors are normal to and in the direction of
     #the tubular structure
     for sc in range(len(scales)): 
-        H = hessian_matrix(image = I, sigma = scales[sc], order = 'rc')
-        eigvals = hessian_matrix_eigvals(H) #2 eigenvalues in decreasing order; shape of ei = (2,I.shape[0], I.shape[1])
-        frobeniusnorm =  np.sqrt(H[0]**2+ H[1]**2 + 2 * H[2]**2)
+        H = bank.hessian(I, scales[sc])
         if c == 0:
+            frobeniusnorm =  np.sqrt(H[0]**2+ H[1]**2 + 2 * H[2]**2)
             c = 1 / 2 * np.amax(frobeniusnorm)
+            del frobeniusnorm
+        eigvals = hessian_matrix_eigvals(H) #2 eigenvalues in decreasing order; shape of ei = (2,I.shape[0], I.shape[1])
+        del H
+
+        if method == 'vectorized':
+            _foldScale(eigvals, scales[sc], sc, b, c, I2, scale)
+            del eigvals
+            continue
 
         for i in range(I.shape[0]):
             for j in range(I.shape[1]):
@@ -125,14 +375,28 @@ def MVEF_2D(I, scales, thresholds):
                     vesselness[i,j,sc]=scales[sc]*m.exp(-R*R/(2.*b*b))*(1.-m.exp(-Fr*Fr/(2*c*c)))
 
     'Keep the highest value of vesselness across all scales'
-    for ind1 in range(I2.shape[0]):
-        for ind2 in range(I2.shape[1]):
-            I2[ind1,ind2] = np.max(vesselness[ind1,ind2,:])
+    if method == 'loop':
+        for ind1 in range(I2.shape[0]):
+            for ind2 in range(I2.shape[1]):
+                I2[ind1,ind2] = np.max(vesselness[ind1,ind2,:])
+        scale = np.argmax(vesselness, axis = 2)
     
+    if argmax:
+        return I2, scale
     return I2
 '-----------------------------------------------------------------------------'
 
-def locateSnippets(I, xcalib, ycalib, minLength, offSetX = 0, offSetY = 0):
+def _featureNorm(vect):
+    """Norm of the features of the snippets (rows of vect), each feature
+    being centered on its median and scaled by its median absolute deviation.
+    """
+    vect = np.array(vect, dtype = float)
+    median = np.median(vect, axis = 0)
+    mad = np.median(abs(vect - median), axis = 0)
+    vect = (vect - median) / mad
+    return np.sqrt(np.sum(vect * vect, axis = 1)), vect
+
+def locateSnippets(I, xcalib, ycalib, minLength, offSetX = 0, offSetY = 0, method = 'vectorized'):
     """
     This function aims at detecting portions of fascicles in a binary image I,
     obtained from the binarization of an image filtered with MVEF.
@@ -151,11 +415,21 @@ def locateSnippets(I, xcalib, ycalib, minLength, offSetX = 0, offSetY = 0):
                             snippets in I2, offSetX and offSetY should correspond
                             to the first line of I in I2 and the first column of I
                             in I2 respectively.
+        method (string):    'vectorized' (default) or 'loop'. Both fit an ellipse
+                            (cv2.fitEllipse) on the contour of each snippet and
+                            build its line from two points of the contour;
+                            'vectorized' searches these points and computes the
+                            alignment with array operations on the contour,
+                            'loop' with Python lists (first version, kept for
+                            reference). The outputs are identical.
     Outputs:
         list of arrays: each array is a snippet's points coordinates
         list of parameters that caracterize the modeling line of a snippet. Each
         parameter is such as [slope, [point1_line + offSetY, pont1_column + offSetX]]
     """
+    if method == 'vectorized':
+        return _locateSnippetsVectorized(I, xcalib, minLength, offSetX, offSetY)
+
     #attention, contours points found by findContours have the structure (columns, rows)
     snippets = cv2.findContours(np.uint8(I), mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_NONE)[0]
     
@@ -238,24 +512,13 @@ def locateSnippets(I, xcalib, ycalib, minLength, offSetX = 0, offSetY = 0):
         vect[i,3] = aspra
         
     # Normalization
-    medianL = np.median(vect[:,0])
-    medianAng = np.median(vect[:,1])
-    medianAl = np.median(vect[:,2])
-    medianAR = np.median(vect[:,3])
-    
-    madL = np.median(abs(vect[:,0] - medianL))
-    madAng = np.median(abs(vect[:,1] - medianAng))
-    madAl = np.median(abs(vect[:,2] - medianAl))
-    madAR = np.median(abs(vect[:,3] - medianAR))
-    
-    vect[:,0] = (vect[:,0] - medianL) / madL
-    vect[:,1] = (vect[:,1] - medianAng) / madAng
-    vect[:,2] = (vect[:,2] - medianAl) / madAl
-    vect[:,3] = (vect[:,3] - medianAR) / madAR
-        
-    norm = np.sqrt(vect[:,0]*vect[:,0] + vect[:,1]*vect[:,1]\
-        + vect[:,2]*vect[:,2] + vect[:,3]*vect[:,3])
+    norm, vect = _featureNorm(vect)
    
+    return _filterSnippets(snippets, line_snip, vect, norm, minLength, offSetX, offSetY)
+
+def _filterSnippets(snippets, line_snip, vect, norm, minLength, offSetX, offSetY):
+    """Keeps the snippets of large normalized features and of length larger
+    than minLength, see locateSnippets."""
     #Filtering on norm
     #The value "4" has been empirically chosen by observing snippets depending on their norm value
     lines = []
@@ -277,6 +540,76 @@ def locateSnippets(I, xcalib, ycalib, minLength, offSetX = 0, offSetY = 0):
     
     return filtered_snippets, lines
 
+def _sidePoint(sn, column, extreme, previous):
+    """Point of the line of a snippet on one side of its contour sn (points
+    (column, row) sorted by column), as in the loop of locateSnippets: middle
+    of the two contour points of column, the contour point of column if it
+    is alone, the extremal point extreme if there are more. If column has
+    no contour point, the point found for the previous snippet is kept."""
+    side = sn[sn[:, 0] == column]
+    if side.shape[0] == 2:
+        return [int((side[0][0] + side[1][0])/2), int((side[0][1] + side[1][1])/2)]
+    elif side.shape[0] == 1:
+        return side[0]
+    elif side.shape[0] > 2:
+        return extreme
+    return previous
+
+def _locateSnippetsVectorized(I, xcalib, minLength, offSetX, offSetY):
+    """locateSnippets with method = 'vectorized': same operations as the
+    loop, on the arrays of points of each contour."""
+    #attention, contours points found by findContours have the structure (columns, rows)
+    snippets = cv2.findContours(np.uint8(I), mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_NONE)[0]
+    if len(snippets) == 0:
+        return 'error', 'error'
+
+    line_snip = []
+    vect = np.zeros((len(snippets), 4))
+    p1 = None
+    p2 = None
+    for i in range(len(snippets)):
+        contour = snippets[i][:,0,:]
+        sn = contour[np.argsort(contour[:,0], kind = 'stable')] #sort according to columns
+
+        # construction of 2 points p1, p2 to represent sn by a line
+        third = 1/3.*len(sn)/2
+        p1 = _sidePoint(sn, sn[0][0] + int(third), sn[0], p1)
+        p2 = _sidePoint(sn, sn[-1][0] - int(third), sn[np.argmax(sn[:,0] == sn[-1][0])], p2)
+
+        # create line (x_list, y_list) inside snippet's contour
+        y_list = np.arange(np.amin(contour[:,0]), np.amax(contour[:,0]), 1)
+        if p2[0]-p1[0] != 0:
+            slope = (p2[1]-p1[1])/(p2[0]-p1[0])
+            x_list = (slope*(y_list-p1[0])+p1[1])
+        else:
+            slope = 0
+            x_list = np.arange(np.amin(contour[:,1]), np.amax(contour[:,1])+1, 1)
+        line_snip.append([slope, [p1[0] + offSetY, p1[1] + offSetX]])
+
+        # Features: length, alignement, aspect ratio and angle with horizontal
+        if len(sn) > 5 : #make sure minimum of points required for fitEllipse function is reached
+            (x0,y0),(mia,maa), ang = cv2.fitEllipse(snippets[i])
+            angle = 90 - ang
+            aspra = float(mia/maa)
+            if angle == 90:
+                align = 0
+            else:
+                #rows truncated towards 0, as int() in the loop
+                rows = np.int64(x_list[np.arange(y_list.shape[0])])
+                below = rows < I.shape[0]
+                pix_white = int(np.count_nonzero(I[rows[below], y_list[below]] > 0))
+                align = pix_white/y_list.shape[0]
+        else:
+            maa = 0
+            angle = 0
+            aspra = 0.
+            align = 0
+
+        vect[i] = [maa * xcalib, angle, align, aspra]
+
+    norm, vect = _featureNorm(vect)
+    return _filterSnippets(snippets, line_snip, vect, norm, minLength, offSetX, offSetY)
+
 
 
 
@@ -435,62 +768,29 @@ def approximateFasc(typeapprox, listF, d):
         typeapprox (string): either 'Bspline' or 'polyfit', depending on the type of 
         approximation that you want to realize (spline or fitting with a polynom respectively) 
     Outputs:
-        a list of splines.
+        a list of splines. See curveFit.fitPolynomials to get the polynomials
+        as a CurveBank, evaluated all at once.
+        Raises ValueError if a fascicle of listF has no point.
     """
+    try:
+        from . import curveFit
+    except ImportError:
+        import curveFit
+
     approx_fasc = []
     
     if typeapprox == 'Bspline':
         import scipy.interpolate as interpolate
         
-        #transform each fascicle format in list
+        #sort fascicle points in increasing columns order and remove potential double points
+        rows, columns, starts = curveFit.dedupeColumns(listF)
         for n in range(len(listF)):
-            if type(listF[n]) == list:
-                f = listF[n]
-            else:
-                f = list(listF[n])
-            
-            #sort all fascicle points in increasing columns order
-            f.sort(key = lambda x: x[1])
-
-            #remove potential double points           
-            to_remove = []
-            for pt in range(len(f)-1):
-                if f[pt][1] == f[pt+1][1]:
-                    to_remove.append(pt+1)
-            fa = [f[ind] for ind in range(len(f)) if ind not in to_remove]
-            
-            ycoord = [fa[i][1] for i in range(len(fa))]
-            xcoord = [fa[i][0] for i in range(len(fa))]               
-            
             #interpolation
-            spline = interpolate.UnivariateSpline(ycoord, xcoord, k=d, ext = 0)   
+            spline = interpolate.UnivariateSpline(columns[starts[n]:starts[n+1]], rows[starts[n]:starts[n+1]], k=d, ext = 0)   
             approx_fasc.append(spline)
 
     if typeapprox == 'polyfit':
-        for n in range(len(listF)):
-
-            #change format to list if necessary
-            if type(listF[n]) == list:
-                f = listF[n]
-            else:
-                f = list(listF[n])
-                  
-            #sort fascicle points in increasing columns order
-            f.sort(key = lambda x: x[1])
-            
-            #remove potential double points
-            to_remove = []
-            for pt in range(len(f)-1):
-                if f[pt][1] == f[pt+1][1]:
-                    to_remove.append(pt+1)
-            fa = [f[ind] for ind in range(len(f)) if ind not in to_remove]
-
-            ycoord = [fa[i][1] for i in range(len(fa))]
-            xcoord = [fa[i][0] for i in range(len(fa))]               
-            
-            #interpolation and conversion to spline
-            p = np.polyfit(ycoord, xcoord, deg=d)
-            spline = np.poly1d(p)
-            approx_fasc.append(spline)
+        #polynomial fitting of all fascicles at once, converted to a list of splines
+        approx_fasc = list(curveFit.fitPolynomials(listF, d))
         
     return approx_fasc
\ No newline at end of file
@@ -46,9 +46,11 @@ def muscleThickness(start, end, calibV, calibH, spl1 = None, spl2 = None, points
     Args:
         spl1 (scipy spline): spline modeling one aponeurosis in I.
         spl2 (scipy spline): spline modeling the other aponeurosis in I.
-        points1, points2 (optional): are array of dimension (n,2). 
+        points1, points2 (optional): are array of dimension (n,2) or
+                curveFit.ColumnCurve objects. 
                 they are aponeuroses' points. Default value is None for
-                each array (they are calculated from spl1 and spl2 in this case)
+                each array (they are calculated from spl1 and spl2 in this case).
+                If several points have the same column, the first one is used.
         start (int) : starting column to calculate muscle thickness. Its
                         value should be >= 0 and <I.shape[1]
         end (int): ending column to calculate muscle thickness. Its value
@@ -65,9 +67,6 @@ def muscleThickness(start, end, calibV, calibH, spl1 = None, spl2 = None, points
     start = int(start)
     end = int(end)
     
-    mt = []
-    absc = []
-    
     #generate aponeuroses' points coordinates if necessary
     if (spl1 is None and points1 is None) or (spl2 is None and points2 is None):
         raise ValueError('Missing value. Spline or array of points should be input for each aponeurosis.')
@@ -77,15 +76,22 @@ def muscleThickness(start, end, calibV, calibH, spl1 = None, spl2 = None, points
         points2, spl2 = pointsCoordinates('spline', spl2, [start, end])
     
 
-    for col in range(start, end + 1):
-        #search if there exist points in each aponeurosis with abscissa col
-        search1 = [pt for pt in points1 if pt[1]==col]
-        search2 = [pt for pt in points2 if pt[1]==col]
-
-        if search1 and search2: #if there exist a point whith abscissa col 
-                                #in each list points1, points2, then calculates MT
-            mt.append(abs(search1[0][0]-search2[0][0])*calibV)
-            absc.append(col*calibH)
+    #rows of each aponeurosis at each column, looked up in column-indexed curves
+    try:
+        from .curveFit import ColumnCurve
+    except ImportError:
+        from curveFit import ColumnCurve
+    if not isinstance(points1, ColumnCurve):
+        points1 = ColumnCurve.fromPoints(points1)
+    if not isinstance(points2, ColumnCurve):
+        points2 = ColumnCurve.fromPoints(points2)
+    cols = np.arange(start, end + 1)
+    rows1 = points1.at(cols)
+    rows2 = points2.at(cols)
+    #MT is calculated where there exist a point with abscissa col in each aponeurosis
+    found = ~np.isnan(rows1) & ~np.isnan(rows2)
+    mt = (np.abs(rows1[found] - rows2[found])*calibV).tolist()
+    absc = (cols[found]*calibH).tolist()
     
     #interpolation of MT curve
     import scipy.interpolate as interpolate
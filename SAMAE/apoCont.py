@@ -1,6 +1,7 @@
 """Functions for the active contour model - detection of aponeuroses"""
 import cv2
 import math
+import time
 import numpy as np
 
 def gaussianKernel(sigma):
@@ -82,7 +83,55 @@ def intensities(I, previousPhi, eps, s, l1, l2):
     
     return c1, c2, f1, f2, LIF, GIF
 
-def initiateContour(I, typeC, setPoints = None, param = None):
+def _signedDistancePolygon(shape, contour):
+    """Computes, for each pixel (i,j) of a grid of size shape, the signed
+    distance to the closed polygon contour, with the same convention
+    as - cv2.pointPolygonTest(contour, (i,j), True): pixels inside the
+    polygon are negative, pixels outside are positive.
+    The distance to each edge is computed at once for all pixels, so that
+    the only Python loop is on the (few) summits of the polygon.
+
+    Args:
+        shape (tuple): size of the grid (rows, columns)
+        contour (array): summits of the polygon, as output by cv2.convexHull,
+        with coordinates (row, column)
+
+    Returns:
+        2D array of size shape
+    """
+    pts = np.float64(contour.reshape(-1, 2))
+    x, y = np.ogrid[0:shape[0], 0:shape[1]]
+    x = np.float64(x)
+    y = np.float64(y)
+    dist2 = np.full(shape, np.inf)
+    inside = np.zeros(shape, dtype = bool)
+
+    for k in range(pts.shape[0]):
+        x0, y0 = pts[k-1]
+        x1, y1 = pts[k]
+        ex = x1 - x0
+        ey = y1 - y0
+        wx = x - x0
+        wy = y - y0
+        #distance to the segment [summit k-1, summit k]
+        len2 = ex*ex + ey*ey
+        if len2 > 0:
+            t = np.clip((wx*ex + wy*ey) / len2, 0., 1.)
+        else:
+            t = 0.
+        dx = wx - t*ex
+        dy = wy - t*ey
+        np.minimum(dist2, dx*dx + dy*dy, out = dist2)
+        #crossing number: the horizontal half-line starting from (x,y)
+        #crosses the edge
+        if ey != 0:
+            crosses = (y0 > y) != (y1 > y)
+            inside ^= crosses & (x < x0 + wy * ex / ey)
+
+    dist = np.sqrt(dist2)
+    return np.where(inside, -dist, dist)
+
+def initiateContour(I, typeC, setPoints = None, param = None, method = 'vectorized'):
     """Create an initial contour for I, as a zero level set function. The
     shape of this contour depends on typeC.
 
@@ -114,6 +163,11 @@ def initiateContour(I, typeC, setPoints = None, param = None):
         parameters for the line x = ay + b. param[2] defines the desired
         width of the quadrangle
 
+        method (string): 'vectorized' (default) or 'loop'. Both return the
+        same array. 'vectorized' computes the distance of all pixels to the
+        contour at once; 'loop' evaluates cv2.pointPolygonTest pixel by pixel
+        and is kept for reference and benchmarking.
+
     Returns:
         array_like of same size than I. Pixels on the contour are zeros,
         pixels inside the contour are negative, pixels outside the
@@ -125,18 +179,27 @@ def initiateContour(I, typeC, setPoints = None, param = None):
     if typeC =='circle':
         if setPoints is None:
             raise ValueError('Missing setPoints list.')
-        for i in range(I.shape[0]):
-            for j in range(I.shape[1]):
-                C[i,j] = -3 + np.sqrt((setPoints[0][0]-i)**2\
-                                + (setPoints[0][1]-j)**2)
+        if method == 'vectorized':
+            i, j = np.ogrid[0:I.shape[0], 0:I.shape[1]]
+            #broadcast over canals, if any
+            C.T[...] = (-3 + np.sqrt((setPoints[0][0]-i)**2\
+                                + (setPoints[0][1]-j)**2)).T
+        else:
+            for i in range(I.shape[0]):
+                for j in range(I.shape[1]):
+                    C[i,j] = -3 + np.sqrt((setPoints[0][0]-i)**2\
+                                    + (setPoints[0][1]-j)**2)
 
     if typeC == 'set_of_points':
         if setPoints is None:
             raise ValueError('Missing setPoints list.')
         contour = cv2.convexHull(setPoints,  clockwise = False)
-        for i in range(I.shape[0]):
-            for j in range(I.shape[1]):
-                C[i,j] = - cv2.pointPolygonTest(contour, (i,j), True)
+        if method == 'vectorized':
+            C.T[...] = _signedDistancePolygon(I.shape[:2], contour).T
+        else:
+            for i in range(I.shape[0]):
+                for j in range(I.shape[1]):
+                    C[i,j] = - cv2.pointPolygonTest(contour, (i,j), True)
     
     if typeC == 'quadrangle_param':
         if param is None:
@@ -168,13 +231,827 @@ def initiateContour(I, typeC, setPoints = None, param = None):
 
         setPoints = np.array([[x_m[n1],n1],[x_p[n3],n3],[x_p[n4],n4],[x_m[n2],n2]])
         contour = cv2.convexHull(setPoints,  clockwise = False)
-        for i in range(I.shape[0]):
-            for j in range(I.shape[1]):
-                C[i,j] = - cv2.pointPolygonTest(contour, (i,j), True)
+        if method == 'vectorized':
+            C.T[...] = _signedDistancePolygon(I.shape[:2], contour).T
+        else:
+            for i in range(I.shape[0]):
+                for j in range(I.shape[1]):
+                    C[i,j] = - cv2.pointPolygonTest(contour, (i,j), True)
     return C
 
 
-def activeContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt):
+def _signedDistance(phi):
+    """Reinitialises the level set function phi as the signed distance
+    (in pixels) to its zero level set, with the same sign convention:
+    negative inside the contour, positive outside. If phi has no zero
+    level set, it is returned unchanged.
+    """
+    outside = np.uint8(phi > 0)
+    if np.all(outside) or not np.any(outside):
+        return phi
+    d_out = cv2.distanceTransform(outside, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    d_in = cv2.distanceTransform(1 - outside, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    #the zero level set lies half-way between inside and outside pixels
+    return np.where(outside, np.float64(d_out) - 0.5, 0.5 - np.float64(d_in))
+
+
+def widenContour(phi, width):
+    """Warm start of a new evolution from a level set phi output by
+    activeContour: phi is reinitialised as a signed distance function and
+    its contour is moved outwards by width pixels.
+
+    Args:
+        phi (array): level set, negative inside the contour
+        width (double): number of pixels added around the contour
+
+    Returns:
+        array: initial level set of same size than phi, or None if phi has
+        no contour (the contour vanished, nothing can be reused)
+
+    Example:
+        > contour, n = activeContour(I, contourIni, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+        > contour2, n2 = activeContour(I, widenContour(contour, 5), 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+    """
+    if np.min(phi) > 0 or np.max(phi) <= 0:
+        return None
+    return _signedDistance(phi) - width
+
+def extendContour(phi, shape, rowOffset = 0):
+    """Warm start for the band on the right of the band of a level set phi
+    output by activeContour: the values of the last column of phi are
+    extended horizontally on a grid of size shape, then reinitialised as a
+    signed distance function. The aponeurosis that leaves the previous band
+    thus enters the new band at the same rows.
+
+    Args:
+        phi (array): level set of the previous (left) band
+        shape (tuple): size (rows, columns) of the new band
+        rowOffset (int): row of the previous band corresponding to the first
+        row of the new band (difference between the first rows of both
+        bands in the whole image)
+
+    Returns:
+        array: initial level set of size shape, or None if the contour does
+        not reach the last column of phi
+    """
+    rows = np.clip(np.arange(shape[0]) + rowOffset, 0, phi.shape[0] - 1)
+    edge = np.float64(phi[rows, -1])
+    if np.min(edge) > 0 or np.max(edge) <= 0:
+        return None
+    return _signedDistance(np.repeat(edge[:, np.newaxis], shape[1], axis = 1))
+
+
+def _fusedStep(phi, force, eps, mu, nu, dt, newPhi, normal):
+    """Dirac, curvature and update stage of a step of the LGIF recurrence,
+    written with explicit loops so that it can be compiled by Numba
+    (see _fusedKernel): newPhi = phi + dt * dPhi is computed in one pass
+    over the pixels, after a first pass that computes the normalized
+    gradient of phi in the work array normal (shape (2,) + phi.shape).
+    The finite differences are those of np.gradient and of cv2.Laplacian
+    (border reflected without repeating the border pixel).
+    phi must have at least two rows and two columns.
+
+    Args:
+        phi (2D array): level set
+        force (2D array): intensity force (1-w)*GIF + w*LIF
+        eps, mu, nu, dt (double): constants of the model
+        newPhi (2D array): output, level set at the next step
+        normal (3D array): work array
+
+    Returns:
+        double: maximum of |newPhi - phi|
+    """
+    n, m = phi.shape
+    for i in range(n):
+        for j in range(m):
+            if i == 0:
+                gx = phi[1, j] - phi[0, j]
+            elif i == n-1:
+                gx = phi[n-1, j] - phi[n-2, j]
+            else:
+                gx = 0.5*(phi[i+1, j] - phi[i-1, j])
+            if j == 0:
+                gy = phi[i, 1] - phi[i, 0]
+            elif j == m-1:
+                gy = phi[i, m-1] - phi[i, m-2]
+            else:
+                gy = 0.5*(phi[i, j+1] - phi[i, j-1])
+            norm = math.sqrt(gx*gx + gy*gy)
+            if norm == 0:
+                norm = 1.
+            normal[0, i, j] = gx/norm
+            normal[1, i, j] = gy/norm
+
+    stop_criterion = 0.
+    for i in range(n):
+        up = i-1 if i > 0 else 1
+        down = i+1 if i < n-1 else n-2
+        for j in range(m):
+            left = j-1 if j > 0 else 1
+            right = j+1 if j < m-1 else m-2
+            if i == 0:
+                div = normal[0, 1, j] - normal[0, 0, j]
+            elif i == n-1:
+                div = normal[0, n-1, j] - normal[0, n-2, j]
+            else:
+                div = 0.5*(normal[0, i+1, j] - normal[0, i-1, j])
+            if j == 0:
+                div += normal[1, i, 1] - normal[1, i, 0]
+            elif j == m-1:
+                div += normal[1, i, m-1] - normal[1, i, m-2]
+            else:
+                div += 0.5*(normal[1, i, j+1] - normal[1, i, j-1])
+            p = phi[i, j]
+            lap = phi[up, j] + phi[down, j] + phi[i, left] + phi[i, right] - 4.*p
+            dirac = eps/(math.pi*(eps*eps + p*p))
+            d = dt * (dirac*force[i, j] + nu*dirac*div + mu*(lap - div))
+            newPhi[i, j] = p + d
+            if abs(d) > stop_criterion:
+                stop_criterion = abs(d)
+    return stop_criterion
+
+# Numba-compiled version of _fusedStep, built on first use
+_kernels = {}
+
+def _fusedKernel():
+    """Returns _fusedStep compiled by Numba, or None if Numba is not
+    installed (the step is then computed with NumPy).
+    """
+    if 'fusedStep' not in _kernels:
+        try:
+            import numba
+            _kernels['fusedStep'] = numba.njit(cache = True)(_fusedStep)
+        except ImportError:
+            _kernels['fusedStep'] = None
+    return _kernels['fusedStep']
+
+
+class LGIFSolver(object):
+    """Solver of the local and global intensity fitting (LGIF) active contour
+    model on image I. All the terms of the recurrence that only depend on I
+    (gaussian kernel and its spectrum, I*I, convolutions of constant
+    images, sum of I...) are computed once when the solver is created, so
+    that each step only computes the terms that depend on the level set Phi.
+    The recurrence is the same as the one described in activeContour.
+
+    Args:
+        I (array_like): one-canal image
+        s (double): standard deviation for gaussian kernels
+        l1, l2 (double): stricly positive constants
+        eps (double): strictly positive constant used in dirac and
+        heaviside functions approximation
+        mu (double): stricly positive constant that weights the level set regularization term
+        nu (double): stricly positive constant that weights the length term
+        dt (double): time step
+        w (double): constant weight between global and local intensity forces
+        jit (bool): if True and Numba is installed, the dirac, curvature and
+        update stage of each step is computed by a compiled kernel in one
+        pass over the pixels (see _fusedStep). Otherwise it is computed with
+        NumPy.
+
+    Example:
+        > solver = LGIFSolver(I, 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10)
+        > contour, n = solver.run(contourIni, thresh = 0.5)
+        > contour, n = solver.run(contourIni, thresh = 0.5, narrow_band = 6)
+    """
+
+    def __init__(self, I, s, l1, l2, eps, mu, nu, dt, w = 0.01, jit = False):
+        self.I = self._prepare(I)
+        self.s = s
+        self.l1 = l1
+        self.l2 = l2
+        self.eps = eps
+        self.mu = mu
+        self.nu = nu
+        self.dt = dt
+        self.w = w
+        self.ksize = (2*int(s)+1, 2*int(s)+1)
+        self.K = gaussianKernel(s)
+        # number of pixels beyond which a pixel of the level set has no
+        # influence on the derivative of another pixel: blur, convolution
+        # by K and finite differences
+        self.radius = int(s) + int(self.K.shape[0]/2) + 2
+
+        # image-only terms
+        self.I2 = self.I * self.I
+        self.sumI = np.sum(self.I, axis = (0, 1))
+        self.KI = self._blur(self.I)
+        self.K1 = self._blur(np.ones(self.I.shape))
+
+        self._setDomain((slice(0, self.I.shape[0]), slice(0, self.I.shape[1])))
+        self.LIF0 = (l2 - l1) * self.I2 * self._convolve(np.ones(self.I.shape))
+        # sums of H and H*I outside the domain, see _buildBand
+        self.sumsOut = (0., 0.)
+        self.kernel = _fusedKernel() if jit else None
+
+    def _prepare(self, I):
+        """Converts I to a one-canal float image"""
+        if len(I.shape) > 2:
+            I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
+        return np.float64(I)
+
+    def _setDomain(self, domain):
+        """Restricts the computation of the forces to the sub-image I[domain],
+        where domain is a tuple of two slices (rows, columns). The spectrum of
+        the gaussian kernel K is padded to a size that allows the computation
+        of 'same' linear convolutions of sub-images of this size by FFT.
+        """
+        import scipy.fft as fft
+        self.domain = domain
+        shape = self.I[domain].shape
+        self.fftShape = tuple(fft.next_fast_len(shape[k] + self.K.shape[k] - 1, True)\
+                              for k in range(2))
+        self.Kf = fft.rfft2(self.K, s = self.fftShape)
+
+    def _blur(self, A):
+        """Gaussian blur of A, with the same parameters as in function intensities"""
+        #(OpenCV drops the last axis of a stack of one image)
+        return cv2.GaussianBlur(A, ksize = self.ksize, sigmaX = self.s, sigmaY = self.s,\
+                                borderType = cv2.BORDER_DEFAULT).reshape(A.shape)
+
+    def _convolve(self, A):
+        """Convolution of A with the gaussian kernel K, thanks to the cached
+        spectrum of K. Same output as signal.fftconvolve(A, K, mode = 'same').
+        A has the size of the current domain. It can be a stack of images
+        along its last axes; the convolution is computed along the two first axes.
+        """
+        import scipy.fft as fft
+        Kf = self.Kf.reshape(self.Kf.shape + (1,)*(A.ndim - 2))
+        full = fft.irfft2(fft.rfft2(A, s = self.fftShape, axes = (0, 1)) * Kf,\
+                          s = self.fftShape, axes = (0, 1))
+        r0 = int((self.K.shape[0] - 1) / 2)
+        c0 = int((self.K.shape[1] - 1) / 2)
+        return full[r0:r0 + A.shape[0], c0:c0 + A.shape[1]]
+
+    def _intensities(self, phi, sumsOut = (0., 0.)):
+        """Computes the intensities on the current domain, phi being the
+        level set restricted to this domain. sumsOut are the sums of H and
+        H*I outside of the domain, needed for the global intensities.
+        """
+        I = self.I[self.domain]
+        H = (1 + np.arctan(phi/self.eps)*2/math.pi)/2
+        HI = H*I
+
+        #global intensities
+        sumH = np.sum(H, axis = (0, 1)) + sumsOut[0]
+        sumHI = np.sum(HI, axis = (0, 1)) + sumsOut[1]
+        c1 = sumHI/sumH
+        c2 = (self.sumI - sumHI)/(self.I.shape[0]*self.I.shape[1] - sumH)
+
+        #local intensities
+        #blurs of (1-H) and (1-H)*I are deduced from blurs of H and H*I
+        KHI = self._blur(HI)
+        KH = self._blur(H)
+        f1 = KHI/KH
+        f2 = (self.KI[self.domain] - KHI)/(self.K1[self.domain] - KH)
+
+        #Local and global intensity forces
+        GIF = -self.l1 * (I-c1)*(I-c1) + self.l2 * (I-c2)*(I-c2)
+        conv = self._convolve(np.stack((-self.l1 * f1 + self.l2 * f2,\
+                                        -self.l1 * f1*f1 + self.l2 * f2*f2), axis = -1))
+        LIF = self.LIF0[self.domain] - 2 * I * conv[..., 0] + conv[..., 1]
+
+        return c1, c2, f1, f2, LIF, GIF
+
+    def intensities(self, phi):
+        """Same as function intensities, for the level set function phi.
+
+        Returns:
+            c1, c2, f1, f2, LIF, GIF
+        """
+        return self._intensities(phi)
+
+    def _dPhi(self, phi, sumsOut = (0., 0.)):
+        """Derivative of the level set phi, restricted to the current domain"""
+        c1, c2, f1, f2, LIF, GIF = self._intensities(phi, sumsOut)
+
+        # compute mathematical operators
+        dirac = self.eps/(math.pi*(self.eps*self.eps+phi*phi))
+        grad = (np.gradient(phi, axis = 0), np.gradient(phi, axis = 1))
+        normgrad = np.sqrt(grad[0]*grad[0] + grad[1]*grad[1])
+        normgrad = normgrad + (normgrad == 0)*1.
+        div = np.gradient(grad[0]/normgrad, axis = 0) + np.gradient(grad[1]/normgrad, axis = 1)
+        lap = cv2.Laplacian(phi, cv2.CV_64F).reshape(phi.shape)
+
+        # compute derivative of contour
+        # (the weight w is applied to the local force, (1-w) to the global one)
+        return dirac * ((1-self.w)*GIF + self.w*LIF)\
+                + self.nu * dirac * div\
+                + self.mu * (lap - div)
+
+    def step(self, phi):
+        """Computes one step of the recurrence from level set phi.
+
+        Returns:
+            newPhi (array): level set at the next step
+            stop_criterion (double): maximum of |newPhi - phi|
+        """
+        if self.kernel is not None:
+            c1, c2, f1, f2, LIF, GIF = self._intensities(phi)
+            force = (1-self.w)*GIF + self.w*LIF
+            newPhi = np.empty(phi.shape)
+            stop_criterion = self.kernel(phi, force, self.eps, self.mu, self.nu, self.dt,\
+                                         newPhi, np.empty((2,) + phi.shape))
+            return newPhi, stop_criterion
+        dPhi = self._dPhi(phi)
+        newPhi = phi + self.dt * dPhi
+        stop_criterion = np.max(abs(dPhi * self.dt))
+        return newPhi, stop_criterion
+
+    def _buildBand(self, phi, width):
+        """Computes the narrow band |phi| <= width around the zero level set
+        of phi, restricts the domain of computation to the bounding box of
+        the band enlarged by self.radius pixels, and computes the sums of H
+        and H*I outside this domain, which stay constant until the next
+        rebuilding of the band.
+
+        Returns:
+            band (array of bool): band, restricted to the domain
+            ring (array of bool): outer pixels of the band, restricted to the domain
+        """
+        band = np.abs(phi) <= width
+        rows = np.nonzero(np.any(band, axis = 1))[0]
+        cols = np.nonzero(np.any(band, axis = 0))[0]
+        if rows.size == 0:
+            return None, None
+        domain = (slice(max(0, rows[0] - self.radius), min(phi.shape[0], rows[-1] + self.radius + 1)),\
+                  slice(max(0, cols[0] - self.radius), min(phi.shape[1], cols[-1] + self.radius + 1)))
+        self._setDomain(domain)
+
+        H = (1 + np.arctan(phi/self.eps)*2/math.pi)/2
+        self.sumsOut = (np.sum(H) - np.sum(H[domain]),\
+                        np.sum(H*self.I) - np.sum(H[domain]*self.I[domain]))
+
+        band = band[domain]
+        SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
+        ring = band & (cv2.erode(np.uint8(band), SE, borderType = cv2.BORDER_REPLICATE) == 0)
+        return band, ring
+
+    def run(self, contourIni, thresh, maxIter = 10000, narrow_band = None, rebuild = 20,\
+            areaTol = None, window = 10, verbose = True):
+        """Evolves the contour from contourIni until
+        |new contour - previous contour| < thresh, or until maxIter
+        steps have been computed.
+        A convergence record is stored in self.record, as a dict with keys
+        'steps' (number of computed steps), 'residual' (last value of the
+        stopping condition), 'time' (wall time of the evolution, in s),
+        'dt' (time step) and 'stop' (reason of the stop: 'thresh',
+        'area', 'maxIter' or 'no contour').
+
+        Args:
+            contourIni (array_like): initial level set, as output by initiateContour
+            thresh (double): stopping condition for the recurrence
+            maxIter (int): maximal number of steps
+            narrow_band (int): if None, the whole level set is updated at each
+            step. Otherwise, only the pixels at a distance <= narrow_band from
+            the contour are updated, and the forces are computed on the
+            smallest sub-image containing them. The band is rebuilt every
+            'rebuild' steps, or as soon as the contour reaches its border;
+            the level set is then reinitialised as a signed distance function.
+            The stopping condition is evaluated on the band only.
+            rebuild (int): number of steps between two rebuildings of the band
+            areaTol (double): optional. If not None, the evolution also stops
+            when the relative change of the area inside the contour over
+            the last 'window' steps is lower than areaTol.
+            window (int): number of steps of the area-change condition
+            verbose (bool): if True, the current step is printed every ten steps
+
+        Returns:
+            array_like: stationary contour represented by pixels = 0.
+            int: number of computed steps
+        """
+        t0 = time.perf_counter()
+        phi = contourIni
+        step = 1
+        stop_criterion = thresh + 1.
+        areas = []
+        stop = 'maxIter'
+
+        if narrow_band is None:
+            band = Ellipsis
+        else:
+            phi = np.array(contourIni, dtype = np.float64)
+            band, ring = self._buildBand(phi, narrow_band)
+            lastBuild = 1
+            if band is None:
+                stop = 'no contour'
+
+        while band is not None and step <= maxIter:
+            if verbose and step%10 == 0:
+                print('Current tens for step : ', step)
+            if narrow_band is None:
+                phi, stop_criterion = self.step(phi)
+            else:
+                sub = phi[self.domain]
+                dPhi = self._dPhi(sub, self.sumsOut)[band]
+                stop_criterion = np.max(abs(dPhi)) * self.dt
+                sub[band] = sub[band] + self.dt * dPhi
+            step = step+1
+
+            #the contour reached the border of the band, or periodic rebuilding
+            if narrow_band is not None and\
+               (step - lastBuild >= rebuild or np.any(np.abs(sub[ring]) < 1.)):
+                phi = _signedDistance(phi)
+                band, ring = self._buildBand(phi, narrow_band)
+                lastBuild = step
+                if band is None:
+                    stop = 'no contour'
+
+            if stop_criterion <= thresh:
+                stop = 'thresh'
+                break
+            if areaTol is not None:
+                areas.append(np.count_nonzero(phi < 0))
+                if len(areas) > window and \
+                   abs(areas[-1] - areas[-1-window]) <= areaTol*max(areas[-1], 1):
+                    stop = 'area'
+                    break
+
+        if narrow_band is not None:
+            self._setDomain((slice(0, self.I.shape[0]), slice(0, self.I.shape[1])))
+            self.sumsOut = (0., 0.)
+        self.record = {'steps': step-1, 'residual': stop_criterion,\
+                       'time': time.perf_counter() - t0, 'dt': self.dt, 'stop': stop}
+        return phi, step-1
+
+
+class LGIFBatchSolver(LGIFSolver):
+    """Version of LGIFSolver that evolves simultaneously the contours of a
+    stack of images of same size. The images and level sets are stored as
+    one 3D array, with the images along the last axis, so that each
+    operator of the recurrence is computed once for the whole stack
+    (OpenCV filters process the images as the canals of one image, so the
+    stack can contain up to 512 images). The global intensities are
+    computed per image. When the stopping condition is reached for an
+    image, its level set is not updated anymore and it is removed from
+    the computations.
+
+    Args:
+        Is (array or list): stack of one-canal or three-canal images of
+        same size, along the first axis
+        other arguments: same as LGIFSolver
+
+    Example:
+        > solver = LGIFBatchSolver([I1, I2, I3], 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10)
+        > contours, steps = solver.run([contourIni1, contourIni2, contourIni3], thresh = 0.5)
+    """
+
+    def __init__(self, Is, s, l1, l2, eps, mu, nu, dt, w = 0.01):
+        LGIFSolver.__init__(self, Is, s, l1, l2, eps, mu, nu, dt, w)
+        self.full = (self.I, self.sumI, self.KI, self.K1, self.LIF0)
+
+    def _prepare(self, Is):
+        """Converts the images to one-canal float images, stacked along the last axis"""
+        if len(Is) > 512:
+            raise ValueError('A batch cannot contain more than 512 images.')
+        return np.stack([LGIFSolver._prepare(self, I) for I in Is], axis = -1)
+
+    def _setImages(self, active):
+        """Restricts the computations to the images of indices 'active'"""
+        self.I, self.sumI, self.KI, self.K1, self.LIF0 = \
+            [np.ascontiguousarray(A[..., active]) for A in self.full]
+
+    def run(self, contoursIni, thresh, maxIter = 10000):
+        """Evolves each contour from its initial level set until
+        |new contour - previous contour| < thresh on its image, or until
+        maxIter steps have been computed.
+
+        Args:
+            contoursIni (array or list): stack of initial level sets, along the
+            first axis, as output by initiateContour
+            thresh (double): stopping condition for the recurrence
+            maxIter (int): maximal number of steps
+
+        Returns:
+            array: stack of stationary contours, along the first axis
+            array: number of computed steps for each contour
+        """
+        phi = np.stack([np.float64(C) for C in contoursIni], axis = -1)
+        steps = np.zeros(phi.shape[2], dtype = np.int64)
+        active = np.arange(phi.shape[2])
+
+        step = 1
+        while active.size > 0 and step <= maxIter:
+            if step%10 == 0:
+                print('Current tens for step : ', step)
+            sub = phi[..., active]
+            dPhi = self.dt * self._dPhi(sub)
+            phi[..., active] = sub + dPhi
+            steps[active] = steps[active] + 1
+
+            #remove converged images from the computations
+            moving = np.max(np.abs(dPhi), axis = (0, 1)) > thresh
+            if not np.all(moving):
+                active = active[moving]
+                self._setImages(active)
+            step = step + 1
+
+        self._setImages(np.arange(phi.shape[2]))
+        return np.moveaxis(phi, -1, 0), steps
+
+
+def _gradient(A, axis, out):
+    """Same as np.gradient(A, axis = axis) for a 2D array A, written in
+    the preallocated array out.
+    """
+    if axis == 0:
+        np.subtract(A[2:], A[:-2], out = out[1:-1])
+        np.subtract(A[1], A[0], out = out[0])
+        np.subtract(A[-1], A[-2], out = out[-1])
+    else:
+        np.subtract(A[:, 2:], A[:, :-2], out = out[:, 1:-1])
+        np.subtract(A[:, 1], A[:, 0], out = out[:, 0])
+        np.subtract(A[:, -1], A[:, -2], out = out[:, -1])
+    out[(slice(None),)*axis + (slice(1, -1),)] *= 0.5
+    return out
+
+
+class LGIFInPlaceSolver(LGIFSolver):
+    """Low-allocation version of LGIFSolver. All the arrays needed by a
+    step of the recurrence are allocated once, with type dtype, when the
+    solver is created. Each step then updates the level set in place,
+    thanks to the 'out' arguments of numpy functions and the 'dst'
+    arguments of OpenCV functions. The convolutions by the gaussian kernel K
+    are computed with the separable filter cv2.sepFilter2D (K is the outer
+    product of two 1D gaussian kernels) with zero padding, like
+    signal.fftconvolve(A, K, mode = 'same').
+    In float32, the memory traffic of each step is halved compared to LGIFSolver.
+
+    Args:
+        same as LGIFSolver
+        dtype (numpy type): type of the work buffers, np.float32 (default)
+        or np.float64
+
+    Example:
+        > solver = LGIFInPlaceSolver(I, 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10)
+        > contour, n = solver.run(contourIni, thresh = 0.5)
+    """
+
+    def __init__(self, I, s, l1, l2, eps, mu, nu, dt, w = 0.01, dtype = np.float32):
+        LGIFSolver.__init__(self, I, s, l1, l2, eps, mu, nu, dt, w)
+        self.dtype = dtype
+        # image-only terms, cast once
+        self.Ib = self.I.astype(dtype)
+        self.KIb = self.KI.astype(dtype)
+        self.K1b = self.K1.astype(dtype)
+        self.LIF0b = self.LIF0.astype(dtype)
+        # 1D kernel g such that K = g * g.T
+        half = int(self.K.shape[0]/2)
+        x = np.arange(-half, half + 1)
+        self.g = (np.exp(-x*x/(2*s*s)) / (math.sqrt(2*math.pi) * s)).astype(dtype)
+
+        # work buffers
+        names = ['phi', 'H', 'HI', 'KH', 'KHI', 'f1', 'f2', 'tmp', 'conv1', 'conv2',\
+                 'GIF', 'LIF', 'dirac', 'gx', 'gy', 'norm', 'div', 'lap']
+        self.buffers = dict((name, np.empty(self.I.shape, dtype = dtype)) for name in names)
+        self.mask = np.empty(self.I.shape, dtype = bool)
+
+    def step(self, phi):
+        """Computes one step of the recurrence from level set phi, which is
+        updated in place. phi must have the type of the buffers.
+
+        Returns:
+            phi (array): level set at the next step (same object as the input)
+            stop_criterion (double): maximum of the update
+        """
+        b = self.buffers
+        I = self.Ib
+        eps = self.eps
+        H, HI, KH, KHI = b['H'], b['HI'], b['KH'], b['KHI']
+        f1, f2, tmp, conv1, conv2 = b['f1'], b['f2'], b['tmp'], b['conv1'], b['conv2']
+        GIF, LIF, dirac, gx, gy, norm, div, lap = b['GIF'], b['LIF'], b['dirac'],\
+                                        b['gx'], b['gy'], b['norm'], b['div'], b['lap']
+
+        # heaviside
+        np.divide(phi, eps, out = H)
+        np.arctan(H, out = H)
+        H *= 1/math.pi
+        H += 0.5
+        np.multiply(H, I, out = HI)
+
+        #global intensities
+        sumH = np.sum(H, dtype = np.float64)
+        sumHI = np.sum(HI, dtype = np.float64)
+        c1 = sumHI/sumH
+        c2 = (self.sumI - sumHI)/(I.size - sumH)
+
+        #local intensities
+        cv2.GaussianBlur(HI, ksize = self.ksize, sigmaX = self.s, sigmaY = self.s,\
+                         dst = KHI, borderType = cv2.BORDER_DEFAULT)
+        cv2.GaussianBlur(H, ksize = self.ksize, sigmaX = self.s, sigmaY = self.s,\
+                         dst = KH, borderType = cv2.BORDER_DEFAULT)
+        np.divide(KHI, KH, out = f1)
+        np.subtract(self.KIb, KHI, out = f2)
+        np.subtract(self.K1b, KH, out = tmp)
+        f2 /= tmp
+
+        #global intensity force
+        np.subtract(I, c1, out = GIF)
+        GIF *= GIF
+        GIF *= -self.l1
+        np.subtract(I, c2, out = tmp)
+        tmp *= tmp
+        tmp *= self.l2
+        GIF += tmp
+
+        #local intensity force
+        np.multiply(f1, -self.l1, out = conv1)
+        np.multiply(f2, self.l2, out = tmp)
+        conv1 += tmp
+        cv2.sepFilter2D(conv1, -1, self.g, self.g, dst = LIF, borderType = cv2.BORDER_CONSTANT)
+        f1 *= f1
+        f1 *= -self.l1
+        f2 *= f2
+        f2 *= self.l2
+        f1 += f2
+        cv2.sepFilter2D(f1, -1, self.g, self.g, dst = conv2, borderType = cv2.BORDER_CONSTANT)
+        LIF *= I
+        LIF *= -2
+        LIF += conv2
+        LIF += self.LIF0b
+
+        # mathematical operators
+        np.multiply(phi, phi, out = dirac)
+        dirac += eps*eps
+        dirac *= math.pi
+        np.divide(eps, dirac, out = dirac)
+        _gradient(phi, 0, gx)
+        _gradient(phi, 1, gy)
+        np.multiply(gx, gx, out = norm)
+        np.multiply(gy, gy, out = tmp)
+        norm += tmp
+        np.sqrt(norm, out = norm)
+        np.equal(norm, 0, out = self.mask)
+        np.copyto(norm, 1, where = self.mask)
+        gx /= norm
+        gy /= norm
+        _gradient(gx, 0, div)
+        div += _gradient(gy, 1, tmp)
+        cv2.Laplacian(phi, -1, dst = lap)
+
+        # derivative of the contour, stored in GIF
+        # (the weight w is applied to the local force, (1-w) to the global one)
+        GIF *= 1 - self.w
+        LIF *= self.w
+        GIF += LIF
+        np.multiply(div, self.nu, out = tmp)
+        GIF += tmp
+        GIF *= dirac
+        lap -= div
+        lap *= self.mu
+        GIF += lap
+        GIF *= self.dt
+
+        phi += GIF
+        stop_criterion = float(np.max(np.abs(GIF, out = tmp)))
+        return phi, stop_criterion
+
+    def run(self, contourIni, thresh, maxIter = 10000, narrow_band = None, rebuild = 20,\
+            areaTol = None, window = 10, verbose = True):
+        """Same as LGIFSolver.run, with the dense evolution only. The level set is copied into a buffer of type dtype,
+        which is then updated in place; a copy of the buffer is returned,
+        so that the next run does not overwrite it.
+        """
+        if narrow_band is not None:
+            raise ValueError('Narrow band evolution is not available with LGIFInPlaceSolver.')
+        phi = self.buffers['phi']
+        phi[...] = contourIni
+        phi, n = LGIFSolver.run(self, phi, thresh, maxIter, areaTol = areaTol,\
+                                window = window, verbose = verbose)
+        return phi.copy(), n
+
+
+class MorphACWESolver(object):
+    """Morphological active contour without edges (morphological Chan-Vese
+    model), experimental. The contour is represented by a binary mask u (1 inside, 0
+    outside) and evolves with morphological operators only:
+    - the attachment term moves the pixels of the border of u towards the
+    region (inside or outside) whose mean intensity is the closest to
+    their intensity,
+    - the curvature term is approximated by the successive application of
+    the operators SI (supremum of erosions) and IS (infimum of dilations),
+    computed with cv2.erode and cv2.dilate on the four segments of length 3
+    centered on a pixel.
+    A step costs a few integer morphological operations, instead of the
+    gaussian convolutions of the LGIF model, but the fitting is only
+    global: the result is less accurate on images of varying intensity.
+
+    Args:
+        I (array_like): one-canal or three-canal image
+        smoothing (int): number of applications of the curvature operator per step
+        l1 (double): weight of the inside fitting term
+        l2 (double): weight of the outside fitting term
+
+    Example:
+        > solver = MorphACWESolver(I)
+        > contour, n = solver.run(contourIni, thresh = 0.5)
+
+    References:
+        Marquez-Neila P. et al., IEEE Transactions on Pattern Analysis and
+        Machine Intelligence 36 (2014) 2-17. 'A Morphological Approach to
+        Curvature-based Evolution of Curves and Surfaces'
+    """
+
+    def __init__(self, I, smoothing = 1, l1 = 1., l2 = 1.):
+        if len(I.shape) > 2:
+            I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
+        self.I = np.float64(I)
+        self.smoothing = smoothing
+        self.l1 = l1
+        self.l2 = l2
+        self.segments = [np.uint8([[0, 0, 0], [1, 1, 1], [0, 0, 0]]),\
+                         np.uint8([[0, 1, 0], [0, 1, 0], [0, 1, 0]]),\
+                         np.uint8([[1, 0, 0], [0, 1, 0], [0, 0, 1]]),\
+                         np.uint8([[0, 0, 1], [0, 1, 0], [1, 0, 0]])]
+        self._nCurv = 0
+
+    def _SI(self, u):
+        """Supremum of the erosions of u by the four segments"""
+        return np.max([cv2.erode(u, seg) for seg in self.segments], axis = 0)
+
+    def _IS(self, u):
+        """Infimum of the dilations of u by the four segments"""
+        return np.min([cv2.dilate(u, seg) for seg in self.segments], axis = 0)
+
+    def _curvature(self, u):
+        """Curvature operator, alternately SI o IS and IS o SI"""
+        self._nCurv = self._nCurv + 1
+        if self._nCurv%2 == 1:
+            return self._SI(self._IS(u))
+        return self._IS(self._SI(u))
+
+    def step(self, u):
+        """Computes one step of the morphological evolution from mask u
+        (uint8 array of 0 and 1).
+
+        Returns:
+            newU (array): mask at the next step
+            changed (int): number of pixels whose value changed
+        """
+        inside = u > 0
+        nIn = np.count_nonzero(inside)
+        sumIn = np.sum(self.I[inside])
+        c1 = sumIn/max(nIn, 1)
+        c2 = (np.sum(self.I) - sumIn)/max(u.size - nIn, 1)
+
+        # attachment term, on the border of the mask only
+        grad = np.abs(np.gradient(np.float64(u), axis = 0)) + np.abs(np.gradient(np.float64(u), axis = 1))
+        aux = grad * (self.l1*(self.I - c1)**2 - self.l2*(self.I - c2)**2)
+        newU = np.copy(u)
+        newU[aux < 0] = 1
+        newU[aux > 0] = 0
+
+        # curvature term
+        for i in range(self.smoothing):
+            newU = self._curvature(newU)
+        return newU, np.count_nonzero(newU != u)
+
+    def run(self, contourIni, thresh, maxIter = 10000, verbose = True):
+        """Evolves the mask {contourIni < 0} until the number of pixels
+        changed by the last two steps is <= thresh, or until maxIter steps
+        have been computed (the alternation of the curvature operators can
+        make a few border pixels oscillate from one step to the next).
+        The convergence record is stored in self.record, with the same keys
+        as LGIFSolver.run ('residual' is the number of changed pixels, 'dt'
+        is None).
+
+        Args:
+            contourIni (array_like): initial level set, as output by initiateContour
+            thresh (double): stopping condition for the recurrence
+            maxIter (int): maximal number of steps
+            verbose (bool): if True, the current step is printed every ten steps
+
+        Returns:
+            array: level set equal to -1 inside the contour and 1 outside,
+            so that the contour is the border between negative and
+            positive values, as for activeContour
+            int: number of computed steps
+        """
+        t0 = time.perf_counter()
+        u = np.uint8(np.asarray(contourIni) < 0)
+        previousU = u
+        step = 1
+        changed = thresh + 1
+        stop = 'maxIter'
+        while step <= maxIter:
+            if verbose and step%10 == 0:
+                print('Current tens for step : ', step)
+            newU, changed = self.step(u)
+            if step > 1:
+                changed = np.count_nonzero(newU != previousU)
+            previousU = u
+            u = newU
+            step = step + 1
+            if changed <= thresh:
+                stop = 'thresh'
+                break
+        self.record = {'steps': step-1, 'residual': changed,\
+                       'time': time.perf_counter() - t0, 'dt': None, 'stop': stop}
+        return 1. - 2.*u, step-1
+
+
+def activeContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt, narrow_band = None, dtype = None,\
+                  areaTol = None, record = False, backend = 'lgif', jit = False, smoothing = 3):
     """Determines the contour of an object in image I by recurrence. This function
     acts like a snake function. The contour evoluates from the input contourIni until 
     a stationary solution is found, such as:
@@ -185,6 +1062,7 @@ def activeContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt):
             dC/dt = dirac(C) * (F1 + F2) + nu * dirac(C) * div( grad(C)/|grad(C)|)
                     + mu * (lap(C) - div( grad(C)/|grad(C)|) )
     See reference articles in References for the further detailed approach.
+    The recurrence is computed by an LGIFSolver object.
 
     Args:
         I (array_like): one-canal image
@@ -199,10 +1077,44 @@ def activeContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt):
         but big enough to reach a reasonable computational time
         eps (double): strictly positive constant
         thresh (double): stopping condition for the recurrence
+        narrow_band (int): optional. If not None, only the pixels at a distance
+        lower than narrow_band pixels from the contour are updated (narrow band
+        level set evolution), see LGIFSolver.run. Default is None (the whole
+        level set is updated at each step).
+        dtype (numpy type): optional. If not None (np.float32 or np.float64),
+        the recurrence is computed by the low-allocation solver
+        LGIFInPlaceSolver, with work buffers of this type. Not compatible
+        with narrow_band. Default is None (LGIFSolver, in float64).
+        areaTol (double): optional. If not None, the recurrence also stops
+        when the relative change of the area inside the contour over ten
+        steps is lower than areaTol (1e-3 is a reasonable value).
+        Default is None.
+        record (bool): optional. If True, the progress of the recurrence is
+        not printed, and the convergence record of the solver (dict with
+        keys 'steps', 'residual', 'time', 'dt' and 'stop', see
+        LGIFSolver.run) is returned as third output. Default is False.
+        backend (string): optional. 'lgif' (default) computes the LGIF
+        recurrence described above. 'morph' (experimental) computes instead
+        the morphological Chan-Vese evolution of MorphACWESolver, on binary
+        masks: much faster, but only driven by the global intensity
+        fitting, so that its contour can differ a lot from the LGIF one on
+        bands of varying intensity (from 34% to 100% of the pixels on the
+        same side of both contours on the bands of the sample images).
+        Then thresh is the number of pixels that may still
+        change at convergence, l1, l2, s, eps, mu, nu and dt are not used,
+        and narrow_band, dtype and areaTol are not available.
+        The output has the same format.
+        smoothing (int): optional. Number of applications of the curvature
+        operator per step of the backend 'morph'. Default is 3.
+        jit (bool): optional. If True, the steps of LGIFSolver are computed
+        with the Numba-compiled kernel _fusedStep when Numba is installed,
+        with NumPy otherwise. Default is False.
 
     Returns:
         array_like: stationary contour represented by pixels = 0.
         The array has the same size than I.
+        int: number of computed steps
+        dict: convergence record, only if record is True
     
     References:
         Li Wang et al., Computerized Medical Imaging and Graphics 33 (2009) 520–531
@@ -212,51 +1124,112 @@ def activeContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt):
         VOL. 17, NO. 6, NOVEMBER 2013. 'Automatic Tracking of Aponeuroses and 
         Estimation of Muscle Thickness in Ultrasonography: A Feasibility Study'
     """
-    
+    # constant weight for local and global intensity forces
+    # SHOULD BE MODIFIED IN THE FUTURE TO ADAPT EACH IMAGE
+    w = 0.01
+
+    if backend == 'morph':
+        if narrow_band is not None or dtype is not None or areaTol is not None:
+            raise ValueError('narrow_band, dtype and areaTol are not available with backend morph.')
+        solver = MorphACWESolver(I, smoothing = smoothing)
+        phi, n = solver.run(contourIni, thresh, verbose = not record)
+        if record:
+            return phi, n, solver.record
+        return phi, n
+    elif backend != 'lgif':
+        raise ValueError('Unknown backend: ' + str(backend))
+
+    if dtype is None:
+        solver = LGIFSolver(I, s, l1, l2, eps, mu, nu, dt, w, jit)
+    else:
+        solver = LGIFInPlaceSolver(I, s, l1, l2, eps, mu, nu, dt, w, dtype)
+    phi, n = solver.run(contourIni, thresh, narrow_band = narrow_band, areaTol = areaTol,\
+                        verbose = not record)
+    if record:
+        return phi, n, solver.record
+    return phi, n
+
+def activeContourBatch(Is, contoursIni, thresh, l1, l2, s, eps, mu, nu, dt):
+    """Same as activeContour, for a stack of images of same size (for example
+    the sub-images of the bands of a panoramic image). All contours are
+    evolved simultaneously by an LGIFBatchSolver object; a contour is not
+    updated anymore once its own stopping condition is reached.
+
+    Args:
+        Is (array or list): stack of images of same size, along the first axis
+        contoursIni (array or list): stack of initial level sets, along the
+        first axis, as output by initiateContour
+        other arguments: same as activeContour
+
+    Returns:
+        array: stack of stationary contours, along the first axis
+        array: number of computed steps for each contour
+    """
+    w = 0.01
+    solver = LGIFBatchSolver(Is, s, l1, l2, eps, mu, nu, dt, w)
+    return solver.run(contoursIni, thresh)
+
+def pyramidContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt, levels = 1, maxIterFine = 50, dtype = None):
+    """Coarse-to-fine version of activeContour. The contour is first evolved
+    on an image pyramid of I (each level is downsampled by 2 with cv2.pyrDown),
+    from the coarsest level to the finest one. The level set obtained at each
+    level, upsampled (and its values doubled, since they are distances in
+    pixels), is the initial contour of the next level. At full resolution,
+    only a few refinement steps are computed (maxIterFine).
+    The standard deviation s of the gaussian kernels is divided by 2 at each
+    level (with a minimum of 1 pixel); the other parameters are unchanged.
+    If the contour disappears at a coarse level, the next level starts
+    again from contourIni.
+
+    Args:
+        same as activeContour
+        levels (int): number of downsampled levels of the pyramid. Default is 1.
+        maxIterFine (int): maximal number of steps at full resolution
+        dtype (numpy type): optional, see activeContour
+
+    Returns:
+        array_like: stationary contour represented by pixels = 0.
+        The array has the same size than I.
+        list: number of computed steps at each level, from the coarsest
+        level to full resolution
+
+    Example:
+        > contour, steps = pyramidContour(I, contourIni, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+        > print('steps per level: ', steps)
+    """
     if len(I.shape) > 2:
         I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
-        
-    'Initialization'
-    previousPhi = contourIni
-    
-    'recurrence'
-    step = 1
-    stop_criterion = thresh + 1.
-    while stop_criterion > thresh and step <= 10000:
-        if step%10 == 0:
-            print('Current tens for step : ', step)
-        
-        #compute global and local intensity forces at step n
-        c1, c2, f1, f2, GIF, LIF = intensities(I, previousPhi, eps, s, l1, l2)
+    w = 0.01
 
-        # constant weight for local and global intensity forces
-        # SHOULD BE MODIFIED IN THE FUTURE TO ADAPT EACH IMAGE
-        w = 0.01
+    #image pyramid and initial contour at each level
+    images = [np.float64(I)]
+    inis = [np.float64(contourIni)]
+    for k in range(levels):
+        images.append(cv2.pyrDown(images[-1]))
+        inis.append(cv2.resize(inis[-1], (images[-1].shape[1], images[-1].shape[0]),\
+                               interpolation = cv2.INTER_AREA) / 2.)
 
-        # compute mathematical operators at step n
-        dirac = eps/(math.pi*(eps*eps+previousPhi*previousPhi))        
-        grad = np.gradient(previousPhi)
-        normgrad = np.sqrt(grad[0]*grad[0] + grad[1]*grad[1])
-        normgrad = normgrad + (normgrad == 0)*1.
-        div = np.gradient(grad[0]/normgrad, axis = 0) + np.gradient(grad[1]/normgrad, axis = 1)
-        lap = cv2.Laplacian(previousPhi, cv2.CV_64F)
-        
-        # compute derivative of contour
-        dPhi = dirac * ((1-w)*LIF + w*GIF)\
-                + nu * dirac * div\
-                + mu * (lap - div)
-        
-        # compute new contour
-        newPhi = previousPhi + dt * dPhi
-        
-        # check the stopping criterion
-        stop_criterion = np.max(abs(dPhi * dt))
-
-        # go to next step n
-        previousPhi = newPhi
-        step = step+1
+    steps = []
+    phi = inis[-1]
+    for k in range(levels, -1, -1):
+        if k < levels:
+            if np.min(phi) > 0: #the contour disappeared at the previous level
+                phi = inis[k]
+            else:
+                phi = cv2.resize(phi, (images[k].shape[1], images[k].shape[0]),\
+                                 interpolation = cv2.INTER_LINEAR) * 2.
+        sk = max(1., s / 2**k)
+        if dtype is None:
+            solver = LGIFSolver(images[k], sk, l1, l2, eps, mu, nu, dt, w)
+        else:
+            solver = LGIFInPlaceSolver(images[k], sk, l1, l2, eps, mu, nu, dt, w, dtype)
+        if k == 0:
+            phi, n = solver.run(phi, thresh, maxIterFine)
+        else:
+            phi, n = solver.run(phi, thresh)
+        steps.append(n)
 
-    return previousPhi, step-1
+    return phi, steps
 
 def extractContour(levelSet, image, offSetX = 0, offSetY = 0):
     """
@@ -265,6 +1238,8 @@ def extractContour(levelSet, image, offSetX = 0, offSetY = 0):
     This border represents the contour of an object in image I.
     The function returns a list containing the points of the contour and
     an image similar to I with the contour is green-lighted. 
+    See contourPoints, which returns the points as an array and does not
+    copy the image.
     
     Args:
         image (array): 3-canal image
@@ -278,10 +1253,32 @@ def extractContour(levelSet, image, offSetX = 0, offSetY = 0):
         the contour which is green
         listC (list): list of all pixels contained in the detected contour
     """
-    
-    listC=[]
-    I = np.copy(image) 
-      
+    I = np.copy(image)
+    points = contourPoints(levelSet, offSetX = offSetX, offSetY = offSetY, overlay = I)
+    listC = [tuple(point) for point in points.tolist()]
+    return I, listC
+
+def contourPoints(levelSet, offSetX = 0, offSetY = 0, overlay = None):
+    """Same as extractContour, with the points of the contour returned as
+    an array. The contour is painted in green on overlay only if overlay is
+    given (in place).
+
+    Args:
+        levelSet (array): zero level set function (same format as output
+        by activeContour function)
+        offSetX: add an vertical offset (changes rows)
+        offSetY: add an horizontal offSet (changes columns)
+        overlay (array): 3-canal image, of same size as levelSet, on which
+        the contour is drawn. Can be a view on a bigger image.
+
+    Returns:
+        array of size (number of points, 2), of integers: (row, column) of
+        the pixels of the detected contour
+
+    Example:
+        > visu = np.copy(USimage)
+        > points = contourPoints(contourSup, offSetX = locSup[0], overlay = visu[locSup[0]:locSup[1], :])
+    """
     # binarization of the levelset image to separate positive from negative values
     binar = np.uint8((levelSet>=0)*0. + (levelSet<0)*255.)
     #find contours
@@ -290,16 +1287,16 @@ def extractContour(levelSet, image, offSetX = 0, offSetY = 0):
     if len(objects) == 0 :
         raise ValueError('No contour has been found. Please check: 1) that aponeuroses\
                         have been correctly located. 2) that initial contour is correct')
-    # If several contours detected in levelSet, keep only the biggest
-    objects_size = [(i,objects[i].size) for i in range (len(objects))]
-    objects_size.sort(key=lambda x:x[1]) 
-    biggest = objects_size[-1][0]
-    # verify that the points in the detected contours are within I's dimensions
-    for point in objects[biggest]:
-        if point[0][0] < I.shape[1] and point[0][1] < I.shape[0]:
-            listC.append((point[0][1] + offSetX, point[0][0] + offSetY))
-            I[point[0][1],point[0][0],:] = [0,255,0]
-    return I, listC
+    # If several contours detected in levelSet, keep only the biggest (the last one if equal sizes)
+    sizes = np.array([obj.size for obj in objects])
+    biggest = sizes.size - 1 - np.argmax(sizes[::-1])
+    # (column, row) points within the dimensions of the level set
+    points = objects[biggest].reshape(-1, 2)
+    shape = levelSet.shape if overlay is None else overlay.shape
+    points = points[(points[:, 0] < shape[1]) & (points[:, 1] < shape[0])]
+    if overlay is not None:
+        overlay[points[:, 1], points[:, 0], :] = [0,255,0]
+    return np.stack([points[:, 1] + offSetX, points[:, 0] + offSetY], axis = 1).astype(int)
 
 def approximateApo(p, apoType, I, typeapprox, d):
     """Function that approximates an aponeurosis shape.
@@ -312,7 +1309,8 @@ def approximateApo(p, apoType, I, typeapprox, d):
     The function returns the spline that approximates the aponeurosis.
 
     Args:
-        p (list): list containing the points of the aponeurosis' contour
+        p (list or array): points (row, column) of the aponeurosis' contour,
+        as output by extractContour or contourPoints
         apoType (string): aponeurosis type ('upper' or 'lower')
         I (array) : image to which the processed aponeurosis belongs. It
         can either have one canal or three canals.
@@ -324,32 +1322,17 @@ def approximateApo(p, apoType, I, typeapprox, d):
         spline modeling aponeurosis.
     """
 
-    p.sort(key=lambda x:x[0]) #x-coord sort
-    p.sort(key=lambda x:x[1]) #y-coord sort
+    p = np.asarray(p)
 
-    # retrieve points from the contour depending on the type of aponeurosis
+    # retrieve points from the contour depending on the type of aponeurosis:
+    # sort points by column, then by row from top to bottom ('lower') or
+    # from bottom to top ('upper'), and keep the first contour pixel of each column
     if apoType == 'lower':
-        #from top to bottom, keep the first contour pixel of each column 
-        comparator = -1
-        line = []
-        for pt in p:
-            if pt[1] != comparator:
-                line.append(pt)
-                comparator = pt[1]
-        
+        order = np.lexsort((p[:, 0], p[:, 1]))
     elif apoType == 'upper':
-        #from bottom to top, keep the first contour pixel of each column 
-        comparator = -1
-        line = []
-        for pt in reversed(p):
-            if pt[1] != comparator:
-                line.append(pt)
-                comparator = pt[1]
-
-    # sort aponeurosis' points (necessary for interpolation)
-    line.sort(key=lambda x:x[1]) #y-coord sort
-    ycoord = [line[i][1] for i in range(len(line))]
-    xcoord = [line[i][0] for i in range(len(line))]
+        order = np.lexsort((-p[:, 0], p[:, 1]))
+    ycoord, first = np.unique(p[order, 1], return_index = True)
+    xcoord = p[order[first], 0]
 
     # approximate by a spline, depending on the chosen type of interpolation
     if typeapprox == 'Bspline':
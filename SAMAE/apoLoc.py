@@ -6,13 +6,590 @@
 
 import cv2
 import numpy as np
+from collections import OrderedDict
 from skimage.transform import radon, iradon
 
 "*****************************************************************************"
 "*********************************FUNCTIONS***********************************"
 "*****************************************************************************"
 
-def twoApoLocation(I, calibV, angle1, angle2,thresh = None):
+class RadonCache(object):
+    """Cache of radon transform operators. For a square image of size n and
+    a set of angles theta, the radon transform computed by
+    skimage.transform.radon(I, theta, circle = True) is linear in I: it is
+    stored as a sparse matrix M of size (n*len(theta), n*n), so that the
+    transform of an image is the product M * I.ravel(), and the transform
+    of a stack of images the product of M by the matrix of their columns.
+    Building M costs about fifteen radon transforms, so that it is only
+    built for a stack of at least minImages images projected at once (a
+    smaller stack, or a single image, is projected by
+    skimage.transform.radon); it is then reused for all the next images of
+    this size.
+    The matrices are kept in a least recently used order: when the cache
+    holds more than maxEntries matrices or more than maxBytes bytes, the
+    least recently used ones are removed. An operator whose estimated size
+    (about 24*n*n*len(theta) bytes) is larger than maxBytes is not built:
+    the transform is then computed by skimage.transform.radon.
+
+    Args:
+        maxEntries (int): maximal number of matrices
+        maxBytes (int): maximal memory used by the matrices, in bytes
+        (128 MB by default, the size of the operator of images of size
+        480 for 21 angles)
+        minImages (int): minimal number of images of a stack for which the
+        matrix is built
+
+    Example:
+        > cache = RadonCache()
+        > sinogram = cache.project(I, np.arange(80., 101.))
+        > cache.report()
+    """
+
+    def __init__(self, maxEntries = 4, maxBytes = 2**27, minImages = 16):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.minImages = minImages
+        self.matrices = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, n, theta):
+        """Sparse matrix of the radon transform of the square images of size
+        n, with the interpolation of skimage.transform.radon: each pixel
+        (r, c) of the image rotated by angle is bilinearly interpolated
+        from the image, then the rotated image is summed along axis 0.
+        Row k*n + c of the matrix gives the value of the transform at
+        offset c and angle theta[k]. The matrix is built angle by angle,
+        to bound the memory used by the construction.
+        """
+        import scipy.sparse as sparse
+
+        center = n//2
+        r, c = np.mgrid[0:n, 0:n]
+        outCol = c.ravel()
+        r = np.float64(r.ravel())
+        c = np.float64(c.ravel())
+        blocks = []
+        for angle in np.deg2rad(theta):
+            cos_a, sin_a = np.cos(angle), np.sin(angle)
+            #coordinates in the image of the pixels of the rotated image
+            x = cos_a*c + sin_a*r + (-center*(cos_a + sin_a - 1))
+            y = -sin_a*c + cos_a*r + (-center*(cos_a - sin_a - 1))
+            x0 = np.floor(x)
+            y0 = np.floor(y)
+            x1 = np.ceil(x)
+            y1 = np.ceil(y)
+            dx = x - x0
+            dy = y - y0
+            rows = []
+            cols = []
+            values = []
+            for yy, xx, weight in [(y0, x0, (1-dy)*(1-dx)), (y0, x1, (1-dy)*dx),\
+                                   (y1, x0, dy*(1-dx)), (y1, x1, dy*dx)]:
+                #pixels outside the image are 0
+                ok = (yy >= 0) & (yy <= n-1) & (xx >= 0) & (xx <= n-1) & (weight != 0)
+                rows.append(outCol[ok])
+                cols.append(np.int64(yy[ok])*n + np.int64(xx[ok]))
+                values.append(weight[ok])
+            blocks.append(sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),\
+                                            shape = (n, n*n)))
+        return sparse.vstack(blocks, format = 'csr')
+
+    def matrix(self, n, theta, count = 1):
+        """Returns the sparse matrix of the radon transform for square images
+        of size n and angles theta (in degrees), from the cache if possible.
+        count is the number of images to project. Returns None if the matrix
+        is not cached and would be larger than maxBytes, or if count is less
+        than minImages.
+        """
+        key = (n, tuple(np.round(np.float64(theta), 6)))
+        if key in self.matrices:
+            self.hits = self.hits + 1
+            self.matrices.move_to_end(key)
+            return self.matrices[key]
+        self.misses = self.misses + 1
+        if 24*n*n*len(theta) > self.maxBytes or count < self.minImages:
+            return None
+        M = self._build(n, theta)
+        self.matrices[key] = M
+        while len(self.matrices) > 1 and\
+              (len(self.matrices) > self.maxEntries or self.nbytes() > self.maxBytes):
+            self.matrices.popitem(last = False)
+        return M
+
+    def project(self, images, theta):
+        """Radon transform of a square image, or of a stack of square images
+        of same size (along the first axis), for the angles theta (in
+        degrees). Same output as skimage.transform.radon(I, theta, circle = True)
+        for each image.
+
+        Returns:
+            array of size (n, len(theta)), or (number of images, n, len(theta))
+        """
+        from skimage.util import img_as_float
+
+        images = img_as_float(np.asarray(images))
+        n = images.shape[-1]
+        M = self.matrix(n, theta, 1 if images.ndim == 2 else images.shape[0])
+        if M is None:
+            if images.ndim == 2:
+                return radon(images, theta = theta, circle = True)
+            return np.stack([radon(I, theta = theta, circle = True) for I in images])
+        if images.ndim == 2:
+            return (M @ images.ravel()).reshape(len(theta), n).T
+        R = M @ images.reshape(images.shape[0], n*n).T
+        return np.transpose(R.reshape(len(theta), n, images.shape[0]), (2, 1, 0))
+
+    def nbytes(self):
+        """Memory used by the cached matrices, in bytes"""
+        return sum(M.data.nbytes + M.indices.nbytes + M.indptr.nbytes for M in self.matrices.values())
+
+    def report(self):
+        """Returns a dict with the number of hits and misses of the cache,
+        the number of cached matrices and the memory they use (bytes).
+        """
+        return {'hits': self.hits, 'misses': self.misses,\
+                'entries': len(self.matrices), 'bytes': self.nbytes()}
+
+#cache shared by the location functions
+radonCache = RadonCache()
+
+def _radonWindow(I, angle1, angle2, resolution = 1., full = False, cache = None):
+    """Computes the radon transform of the square image I for the angles
+    np.arange(0, 180, resolution) (in degrees), and sets to 0 the projections
+    whose angle is not in [angle1, angle2[.
+    
+    Args:
+        I (array): one canal square image
+        angle1, angle2 (floats, in degrees): angles interval of the kept projections
+        resolution (float): step between two angles, in degrees. Each column
+        of the transform corresponds to one angle.
+        full (bool): if False, only the projections in [angle1, angle2[ are
+        computed. If True, all the projections are computed before the others
+        are set to 0, as in the first versions of the location functions
+        (slower, for debugging).
+        cache (RadonCache): if not None (and full is False), the projections
+        are computed as a sparse matrix product, with the operator stored
+        in cache.
+        
+    Returns:
+        I_radon (array): radon transform, of size (I.shape[0], number of angles)
+        theta (array): angles of the columns of I_radon
+    """
+    theta = np.arange(0., 180., resolution)
+    window = (theta >= angle1) & (theta < angle2)
+    if full:
+        I_radon = radon(I, theta = theta, circle = True)
+        I_radon[:, np.logical_not(window)] = 0.
+    elif cache is not None:
+        I_radon = np.zeros((I.shape[0], theta.size))
+        I_radon[:, window] = cache.project(I, theta[window])
+    else:
+        I_radon = np.zeros((I.shape[0], theta.size))
+        I_radon[:, window] = radon(I, theta = theta[window], circle = True)
+    return I_radon, theta
+
+def _radonLine(peak, theta, n):
+    """Computes the line of a square image of size n that corresponds to
+    the point peak of its radon transform, as computed by _radonWindow.
+    The projection at offset p and angle theta[k] sums the pixels (x, y)
+    (x along axis 0, y along axis 1) such that
+    cos(theta[k])*(y - n//2) - sin(theta[k])*(x - n//2) = p - n//2.
+
+    Args:
+        peak (tuple): (column, row) of the point in the radon transform, as
+        output by cv2.minEnclosingCircle; coordinates are truncated to
+        integers.
+        theta (array): angles of the columns of the radon transform (degrees)
+        n (int): size of the image
+
+    Returns:
+        (a, b): parameters of the line equation x = a * y + b, or
+        ('error', 'error') for a vertical line
+    """
+    angle = np.deg2rad(theta[int(peak[0])])
+    p = int(peak[1])
+    m = n//2
+    if abs(np.sin(angle)) < 1e-12:
+        return 'error', 'error'
+    a = float(np.cos(angle) / np.sin(angle))
+    b = float(m - a * m - (p - m) / np.sin(angle))
+    return a, b
+
+def _radonPeak(line, n):
+    """Inverse of _radonLine: computes the angle (in degrees) and the
+    offset p of the projection of the radon transform of a square image of
+    size n that corresponds to the line x = a * y + b of the image.
+    """
+    a, b = line
+    angle = np.arctan2(1., a)
+    m = n//2
+    p = m + (m - a * m - b) * np.sin(angle)
+    return float(np.rad2deg(angle)), float(p)
+
+def radonBands(bands, angle1, angle2, resolution = 1., cache = None):
+    """Computes at once the radon transforms of square bands of same size,
+    as _radonWindow, with one sparse matrix product. The output can be
+    given to twoApoLocation and oneApoLocation (argument sinogram).
+
+    Args:
+        bands (list or array): one canal square images of same size
+        angle1, angle2 (floats, in degrees): angles interval of the kept projections
+        resolution (float): step between two angles, in degrees
+        cache (RadonCache): cache of radon operators. If None, the module
+        cache radonCache is used.
+
+    Returns:
+        array of size (number of bands, band size, number of angles): radon
+        transform of each band
+    """
+    if cache is None:
+        cache = radonCache
+    theta = np.arange(0., 180., resolution)
+    window = (theta >= angle1) & (theta < angle2)
+    bands = np.asarray(bands)
+    sinograms = np.zeros((bands.shape[0], bands.shape[1], theta.size))
+    sinograms[:, :, window] = cache.project(bands, theta[window])
+    return sinograms
+
+def _candidateRegions(R, I_radon):
+    """Labels the white regions (8-connectivity) of the segmented radon
+    transform R and computes the features of all of them at once.
+
+    Args:
+        R (array of uint8): segmented radon transform (0 or 255)
+        I_radon (array): radon transform, of same shape as R
+
+    Returns:
+        labels (array): label of each pixel of R, 0 for the background
+        regions (dict of arrays): for each region, in the order of
+        cv2.findContours (decreasing order of their first pixel): 'label',
+        'top' and 'bottom' (first and last rows of the region), 'left' and
+        'right' (first and last columns), 'size'
+        (number of points of its contour, as given by cv2.findContours
+        with CHAIN_APPROX_NONE) and 'maximum' (maximal value of I_radon in
+        the region)
+    """
+    from scipy import ndimage
+
+    labels = np.zeros(R.shape, np.int32)
+    if not R.any():
+        return labels, {key: np.zeros(0, int) for key in ['label', 'top', 'bottom', 'left', 'right',\
+                                                          'size', 'maximum']}
+    
+    #work in the bounding box of the white pixels
+    x, y, w, h = cv2.boundingRect(R)
+    nbLabels, labelsB, stats = cv2.connectedComponentsWithStats(R[y:y+h, x:x+w], connectivity = 8)[:3]
+    labels[y:y+h, x:x+w] = labelsB
+    white = labelsB > 0
+    #regions in the holes of other regions have no external contour:
+    #holes are the black regions (4-connectivity) that do not touch the border
+    black = cv2.connectedComponents(np.uint8(np.pad(~white, 1, constant_values = True)), connectivity = 4)[1]
+    filled = black[1:-1, 1:-1] != black[0, 0]
+    outer = cv2.connectedComponents(np.uint8(filled), connectivity = 8)[1]
+    
+    #order of the regions: decreasing position of their first pixel
+    position = np.flatnonzero(white)
+    label, first = np.unique(labelsB.ravel()[position], return_index = True)
+    first = position[first]
+    outerPosition = np.flatnonzero(filled)
+    outerFirst = outerPosition[np.unique(outer.ravel()[outerPosition], return_index = True)[1]]
+    external = outerFirst[outer.ravel()[first] - 1] == first
+    index = label[external][np.argsort(-first[external], kind = 'stable')]
+    
+    #number of times the contour goes through each pixel: number of black
+    #runs in its 8-neighbourhood (N, NE, E, ..., NW) that contain a 4-neighbour
+    W = np.pad(filled, 1).ravel()
+    shifts = np.array([[-1,0], [-1,1], [0,1], [1,1], [1,0], [1,-1], [0,-1], [-1,-1]]) @ [w + 2, 1]
+    rows, cols = np.divmod(position, w)
+    B = ~W[(rows + 1) * (w + 2) + cols + 1 + shifts[:, None]]
+    runs = np.sum(B & ~np.roll(B, 1, axis = 0), axis = 0)
+    runs = runs - np.sum(B[1::2] & ~B[0::2] & ~np.roll(B, -1, axis = 0)[1::2], axis = 0)
+    runs[B.all(axis = 0)] = 1
+    size = np.bincount(labelsB.ravel()[position], weights = runs, minlength = nbLabels)
+    
+    top = y + stats[index, cv2.CC_STAT_TOP]
+    left = x + stats[index, cv2.CC_STAT_LEFT]
+    regions = {'label': index, 'top': top,
+               'bottom': top + stats[index, cv2.CC_STAT_HEIGHT] - 1,
+               'left': left, 'right': left + stats[index, cv2.CC_STAT_WIDTH] - 1,
+               'size': size[index].astype(int),
+               'maximum': np.array(ndimage.maximum(I_radon[y:y+h, x:x+w][white], labelsB[white], index),\
+                                   ndmin = 1)}
+    return labels, regions
+
+def _selectRegion(regions, calibV, fromBottom = False, skin = True):
+    """Selects the region of an aponeurosis among the candidate regions
+    given by _candidateRegions. When there are more than 2 regions, the
+    regions whose contour is too small compared to the others are removed.
+    The two remaining regions closest to the first row of the radon
+    transform (to the last row if fromBottom) are then compared:
+    if they are less than 4 mm from each other, they are the skin and the
+    aponeurosis and the farthest from the row is kept; otherwise the
+    closest is kept. When skin is False, the choices are swapped (as in
+    oneApoLocation).
+
+    Args:
+        regions (dict): output of _candidateRegions
+        calibV: is the calibration factor along axis 0.
+        fromBottom (bool): compare the distances to the last row
+        skin (bool): see above
+
+    Returns:
+        index of the selected region in regions, or None if there is no
+        region
+    """
+    nb = regions['label'].size
+    if nb == 0:
+        return None
+    elif nb == 1:
+        return 0
+
+    #in case there are more than 2 regions,
+    # if a region is too small compared to the others, remove it.
+    kept = np.arange(nb)
+    if nb > 2:
+        marg_size = 5 #margin = 5 points in the contour
+        kept = kept[regions['size'] >= regions['size'].mean() - marg_size]
+        if kept.size == 1:
+            return kept[0]
+
+    #look for the two regions closest to the row, with the same scan of
+    #the regions as in the first versions, to keep the same selections
+    key = -regions['bottom'] if fromBottom else regions['top']
+    first, second = (kept[1], kept[0]) if fromBottom else (kept[0], kept[1])
+    for k in kept[2:]:
+        if key[first] < key[second] and key[k] < key[second]:
+            second = k
+        if key[first] >= key[second] and key[k] < key[first]:
+            first = k
+    close, far = (first, second) if key[first] < key[second] else (second, first)
+    tie = key[first] == key[second]
+    if fromBottom:
+        gap = abs(regions['top'][close] - regions['bottom'][far])
+        other = abs(regions['top'][far] - regions['bottom'][close])
+    else:
+        gap = abs(regions['top'][far] - regions['bottom'][close])
+        other = abs(regions['top'][close] - regions['bottom'][far])
+
+    # if they are less than 4 mm far from each other, then take the 2nd one
+    # if they are more than 4 mm far from each other, it means they are not
+    #  skin and apo, so take the first one.
+    # THIS IS EMPIRICAL, SOMETHING BETTER MUST BE FOUND
+    mini_dist_mm = 4
+    if tie:
+        return 0
+    elif gap * calibV < mini_dist_mm:
+        return far if skin else close
+    elif other * calibV >= mini_dist_mm:
+        return close if skin else far
+    #undecided: first region found
+    return 0
+
+def _regionCenter(labels, regions, k):
+    """Center (column, row) of the smallest circle enclosing the region of
+    index k in regions"""
+    rows, cols = np.nonzero(labels == regions['label'][k])
+    center, radius = cv2.minEnclosingCircle(np.float32(np.stack([cols, rows], axis = 1)))
+    return center
+
+def _twoApoPeaks(I_radon, calibV, thresh = None):
+    """Segments the radon transform I_radon of an image (restricted to the
+    angles of interest) to find the points that correspond to the two
+    aponeuroses, as the two largest white lines of the image.
+
+    Args:
+        I_radon (array): radon transform, as output by _radonWindow
+        calibV: is the calibration factor along axis 0.
+        thresh: threshold used for segmentation, see twoApoLocation
+
+    Returns:
+        center_top, center_inf: (column, row) of the points of I_radon that
+        correspond to the deep and to the superficial aponeurosis, or None
+        if they cannot be found
+    """
+    #cut radon transform in halves
+    R_top = np.copy(I_radon[:int(I_radon.shape[0]/2),:])
+    R_inf = np.copy(I_radon[int(I_radon.shape[0]/2):,:])
+    
+    #erase lines that are too centered in the radon transform to be aponeuroses
+    #SOMETHING BETTER HAS TO BE FOUND
+    fifth_x_half = int(I_radon.shape[0]/2/5)
+    quarter_x_half = int(I_radon.shape[0]/2/4)
+    R_top[3*fifth_x_half:,:]=np.zeros((R_top.shape[0]-3*fifth_x_half, R_top.shape[1]))
+    R_inf[:quarter_x_half,:] = np.zeros((quarter_x_half,R_inf.shape[1]))
+    
+    #threshold to keep whitest regions
+    if thresh is None:
+        thresh = np.percentile(I_radon, 99.2)
+    R_top = cv2.threshold(R_top, thresh, 255, cv2.THRESH_BINARY)[1].astype(np.uint8)
+    R_inf = cv2.threshold(R_inf, thresh, 255, cv2.THRESH_BINARY)[1].astype(np.uint8)
+    
+    #enhance separation between white regions thanks to erosion
+    SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
+    R_top = cv2.erode(src = R_top, kernel = SE)
+    R_inf = cv2.erode(src = R_inf, kernel = SE)
+    
+    #label white regions and select the deep and superficial aponeuroses
+    labels_top, regions_top = _candidateRegions(R_top, I_radon[:R_top.shape[0],:])
+    labels_inf, regions_inf = _candidateRegions(R_inf, I_radon[R_top.shape[0]:,:])
+    k_top = _selectRegion(regions_top, calibV)
+    k_inf = _selectRegion(regions_inf, calibV, fromBottom = True)
+    if k_top is None or k_inf is None:
+        return None
+    
+    center_top = _regionCenter(labels_top, regions_top, k_top)
+    center_inf = _regionCenter(labels_inf, regions_inf, k_inf)
+    #! offset in R_inf when search for regions
+    center_inf = (center_inf[0], center_inf[1] + R_top.shape[0])
+    return center_top, center_inf
+
+def _twoApoBands(line1, line2, n, mid):
+    """Determines the horizontal bands containing the upper and the lower
+    aponeuroses of an image with n lines, from the rows of their lines at
+    the column mid.
+
+    Args:
+        line1, line2 (tuples): parameters (a, b) of the lines x = a * y + b of
+        the upper and of the lower aponeuroses
+
+    Returns:
+        same outputs as twoApoLocation
+    """
+    (a1, b1), (a2, b2) = line1, line2
+    upRow = int(round(a1 * mid + b1))
+    if upRow < 0 or upRow >= n:
+        upRow = n
+        a1, b1 = 'error', 'error'
+    lowRow = int(round(a2 * mid + b2))
+    if lowRow < 0 or lowRow >= n:
+        lowRow = -1
+        a2, b2 = 'error', 'error'
+    upLine = max(0, upRow - 30)
+    lowLine = min(lowRow + 30, n - 1)
+    loc1 = (upLine, min(upLine + 60, n - 1))
+    loc2 = (max(0, lowLine - 60), lowLine)
+    return (a1, b1), (a2, b2), loc1, loc2
+
+def _twoApoStrip(I, calibV, angle1, angle2, thresh, resolution, radonCache, overlap = 0.5):
+    """Strip mode of twoApoLocation for an image I wider than high: I is
+    tiled into squares of side I.shape[0], overlapping by the fraction
+    overlap of their width, the last one being aligned on the right border
+    of I. The radon transforms of all the squares are computed at once
+    (radonBands), the two aponeuroses are located in each square, then the
+    lines of each aponeurosis in the squares are fused into one line for
+    the whole width of I: the reference is the line that the most lines of
+    the other squares stay within 4 mm of (ties are broken in favour of the
+    leftmost square, which is the one analysed by the square mode), the
+    lines that are more than 4 mm away from it are discarded (another
+    structure was detected in these squares), and the points of the
+    remaining lines are fitted by least squares, weighted by the radon
+    transform values of their peaks.
+    """
+    n = I.shape[0]
+    step = max(1, int(n * (1 - overlap)))
+    offsets = list(range(0, I.shape[1] - n + 1, step))
+    if offsets[-1] != I.shape[1] - n:
+        offsets.append(I.shape[1] - n)
+    sinograms = radonBands([I[:, o:o+n] for o in offsets], angle1, angle2, resolution, radonCache)
+    theta = np.arange(0., 180., resolution)
+
+    #points (column in I, row in I, weight) of the upper and lower lines of each square
+    points = [[], []]
+    for o, I_radon in zip(offsets, sinograms):
+        peaks = _twoApoPeaks(I_radon, calibV, thresh)
+        if peaks is None:
+            continue
+        lines = [_radonLine(center, theta, n) + (I_radon[int(center[1]), int(center[0])],)\
+                 for center in peaks]
+        if lines[0][0] == 'error' or lines[1][0] == 'error':
+            continue
+        lines.sort(key = lambda l: l[0] * int(n/2) + l[1])
+        y = np.arange(n)
+        for k in range(2):
+            a, b, weight = lines[k]
+            points[k].append((o + y, a * y + b, np.full(n, weight)))
+
+    if len(points[0]) == 0:
+        return ('error', 'error'), ('error', 'error'), 'error', 'error'
+    mini_dist_mm = 4
+    fused = []
+    for k in range(2):
+        lines = [np.polyfit(p[0], p[1], 1) for p in points[k]]
+        close = [[np.max(np.abs(np.polyval(l, p[0]) - p[1]))*calibV < mini_dist_mm for p in points[k]]\
+                 for l in lines]
+        #max keeps the first maximum: the leftmost square in case of a tie
+        ref = max(range(len(lines)), key = lambda i: sum(close[i]))
+        kept = [p for p, c in zip(points[k], close[ref]) if c]
+        y, x, weight = [np.concatenate(p) for p in zip(*kept)]
+        a, b = np.polyfit(y, x, 1, w = np.sqrt(weight))
+        fused.append((float(a), float(b)))
+    return _twoApoBands(fused[0], fused[1], n, int(I.shape[1]/2))
+
+def _twoApoPrior(I, calibV, angle1, angle2, prior, priorTol, thresh, resolution, radonCache):
+    """Prior mode of twoApoLocation for the square image I: the radon
+    transform is only computed for the angles of the expected lines
+    prior = ((a1, b1), (a2, b2)) +/- priorTol[0] degrees (inside
+    [angle1, angle2[), and each aponeurosis is searched in the window of
+    its expected line (angle +/- priorTol[0] degrees, offset +/- priorTol[1]
+    pixels), as the segmented region with the highest radon transform
+    value in the window.
+
+    Returns:
+        same as twoApoLocation, or None if a peak is weak: no segmented
+        region in its window (with thresh, or by default with the
+        percentile of the computed projections that keeps the same
+        proportion of pixels as the full search), or maximum of the window
+        on its border (the peak is outside the window).
+    """
+    n = I.shape[0]
+    angleTol, offsetTol = priorTol
+    expected = [_radonPeak(line, n) for line in prior]
+    low = max(angle1, min(e[0] for e in expected) - angleTol)
+    high = min(angle2, max(e[0] for e in expected) + angleTol + resolution)
+    if low >= high:
+        return None
+    I_radon, theta = _radonWindow(I, low, high, resolution, cache = radonCache)
+    computed = np.flatnonzero((theta >= low) & (theta < high))
+    allowed = np.flatnonzero((theta >= angle1) & (theta < angle2))
+    if thresh is None:
+        #in the full search, only the angles in [angle1, angle2[ are not 0
+        thresh = np.percentile(I_radon[:, computed], max(0., 100. - 0.8 * theta.size / allowed.size))
+    SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
+
+    lines = []
+    for angle, p in expected:
+        c1 = max(computed[0], int(np.floor((angle - angleTol) / resolution)))
+        c2 = min(computed[-1], int(np.ceil((angle + angleTol) / resolution))) + 1
+        r1, r2 = max(0, int(p - offsetTol)), min(n, int(p + offsetTol) + 1)
+        if c1 >= c2 or r1 >= r2:
+            return None
+        window = I_radon[r1:r2, c1:c2]
+        #the maximum must not be on a border of the window that is not a border of the transform
+        row, column = np.unravel_index(np.argmax(window), window.shape)
+        if (row == 0 and r1 > 0) or (row == r2 - r1 - 1 and r2 < n) or\
+            (column == 0 and c1 > allowed[0]) or (column == c2 - c1 - 1 and c2 - 1 < allowed[-1]):
+            return None
+        R = cv2.threshold(window, thresh, 255, cv2.THRESH_BINARY)[1].astype(np.uint8)
+        R = cv2.erode(src = R, kernel = SE)
+        labels, regions = _candidateRegions(R, window)
+        if regions['label'].size == 0:
+            return None
+        #region closest to the expected peak
+        distance = np.hypot((regions['top'] + regions['bottom'])/2. + r1 - p,\
+                            ((regions['left'] + regions['right'])/2. + c1) * resolution - angle)
+        center = _regionCenter(labels, regions, np.argmin(distance))
+        lines.append(_radonLine((c1 + center[0], r1 + center[1]), theta, n))
+
+    if lines[0][0] == 'error' or lines[1][0] == 'error' or lines[0] == lines[1]:
+        return None
+    mid = int(n/2)
+    line1, line2 = sorted(lines, key = lambda l: l[0] * mid + l[1])
+    return _twoApoBands(line1, line2, n, mid)
+
+def twoApoLocation(I, calibV, angle1, angle2,thresh = None, resolution = 1., fullRadon = False,\
+                   radonCache = None, sinogram = None, backprojection = False, strip = False,\
+                   prior = None, priorTol = (5., 30)):
     """Function that computes the radon transform of image I and segments it
     to detect the two aponeuroses as the two largest white lines.
     It returns the inverse radon transform of the segmented radon transform as
@@ -27,6 +604,35 @@ def twoApoLocation(I, calibV, angle1, angle2,thresh = None):
         calibV: is the calibration factor along axis 0.
         angle1, angle2 (floats, in degrees) are the angles interval in between
         we assume that aponeuroses orientations stand. angle1 < angle2
+        resolution (float): angular step of the radon transform, in degrees.
+        Default is 1.
+        fullRadon (bool): if True, the radon transform is computed for all
+        angles before the projections outside [angle1, angle2[ are erased.
+        Default is False: only the projections in [angle1, angle2[ are computed.
+        radonCache (RadonCache): optional. If not None, the radon transform is
+        computed as a sparse matrix product, with the operator stored in
+        radonCache (faster when many images of same size are processed).
+        sinogram (array): optional. Radon transform of I already computed,
+        as output by radonBands with the same angles and resolution.
+        backprojection (bool): optional. If False (default), the lines are
+        directly computed from the position of the selected points of the
+        radon transform. If True, they are computed from the inverse radon
+        transform of these points, as in the first versions of the function
+        (slower).
+        strip (bool): optional. If False (default), only the left square
+        I[:, :I.shape[0]] of a wide image I is processed. If True, the
+        whole width of I is processed as overlapping squares, whose
+        detections are fused (see _twoApoStrip). Not compatible with
+        backprojection and sinogram.
+        prior (tuple): optional. Expected lines ((a1, b1), (a2, b2)) of the
+        aponeuroses, e.g. found in the previous image of the same muscle
+        (see ApoTracker). If not None, the radon transform is only computed
+        for the angles of these lines +/- priorTol[0] degrees, and each
+        aponeurosis is searched at the offset of its expected line
+        +/- priorTol[1] pixels (see _twoApoPrior). When a peak is too weak
+        in its window, the whole interval [angle1, angle2[ is searched.
+        Not compatible with strip, backprojection and sinogram.
+        priorTol (tuple): tolerances (degrees, pixels) of prior.
         
     Returns:
         (a1, b1), (a2, b2): parameters of the line equation of each
@@ -41,204 +647,53 @@ def twoApoLocation(I, calibV, angle1, angle2,thresh = None):
     if len(I.shape) > 2:
         I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY) 
 
+    if prior is not None and (strip or backprojection or sinogram is not None):
+        raise ValueError('prior is not compatible with strip, backprojection and sinogram')
+
+    #wide image: process the whole width as overlapping squares
+    if strip and I.shape[1] > I.shape[0]:
+        if backprojection or sinogram is not None:
+            raise ValueError('strip mode is not compatible with backprojection and sinogram')
+        return _twoApoStrip(I, calibV, angle1, angle2, thresh, resolution, radonCache)
+
     #working with a square because skimage radon function works on a circle only
     if I.shape[0] != I.shape[1]:
         mini = np.min(I.shape)
         I = I[0:mini,0:mini]
+
+    #search around the expected lines first
+    if prior is not None:
+        result = _twoApoPrior(I, calibV, angle1, angle2, prior, priorTol, thresh, resolution, radonCache)
+        if result is not None:
+            return result
     
-    #Calculate radon transform
+    #Calculate radon transform, for lines with slope between angle1 and angle2
     #! I_radon reverse the lines: upper aponeurosis region in I is in the bottom of
     # I_radon. Similar logic for deep apo
-    I_radon = radon(I, circle = True)
-        
-    #erase lines with slope > angle2 and <angle1
-    I_radon[:, :angle1] = np.zeros((I_radon.shape[0], angle1))
-    I_radon[:, angle2:] = np.zeros((I_radon.shape[0], 180-angle2))
-        
-    #cut radon transform in halves
-    R_top = np.copy(I_radon[:int(I_radon.shape[0]/2),:])
-    R_inf = np.copy(I_radon[int(I_radon.shape[0]/2):,:])
-    
-    #erase lines that are too centered in the radon transform to be aponeuroses
-    #SOMETHING BETTER HAS TO BE FOUND
-    fifth_x_half = int(I_radon.shape[0]/2/5)
-    quarter_x_half = int(I_radon.shape[0]/2/4)
-    R_top[3*fifth_x_half:,:]=np.zeros((R_top.shape[0]-3*fifth_x_half, R_top.shape[1]))
-    R_inf[:quarter_x_half,:] = np.zeros((quarter_x_half,R_inf.shape[1]))
-    
-    #threshold to keep whitest regions
-    if thresh is None:
-        thresh = np.percentile(I_radon, 99.2)
-    R_top = cv2.threshold(R_top, thresh, 255, cv2.THRESH_BINARY)[1].astype(np.uint8)
-    R_inf = cv2.threshold(R_inf, thresh, 255, cv2.THRESH_BINARY)[1].astype(np.uint8)
-    
-    #enhance separation between white regions thanks to erosion
-    SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
-    R_top = cv2.erode(src = R_top, kernel = SE)
-    R_inf = cv2.erode(src = R_inf, kernel = SE)
-    
-    #find where are white regions and find their contour
-    contours_top = cv2.findContours(R_top,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_NONE)[0]
-    contours_inf = cv2.findContours(R_inf,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_NONE)[0]
-    
-    #find deep aponeurosis
-    if len(contours_top) <1:
-        return ('error', 'error'),('error', 'error'),'error','error'
-    elif len(contours_top)>1:
-
-        if len(contours_top) == 2:
-            contours_top2 = contours_top
+    if sinogram is None:
+        I_radon, theta = _radonWindow(I, angle1, angle2, resolution, fullRadon, radonCache)
+    else:
+        I_radon, theta = np.copy(sinogram), np.arange(0., 180., resolution)
         
-        #in case there are more than 2 contours,
-        # if a contour is too small compared to the others, remove it.
-        elif len(contours_top) > 2:
-            mean_size_top = 0
-            to_remove = []
-            maximums = []
-            
-            for cont0 in range(len(contours_top)):
-                mean_size_top = mean_size_top + contours_top[cont0].shape[0]
-                list_radonvalues = [I_radon[contours_top[cont0][ind,0,1],\
-                                            contours_top[cont0][ind,0,0]] for ind in range(contours_top[cont0].shape[0])]
-                maximums.append(max(list_radonvalues))
-                
-            mean_size_top = mean_size_top / len(contours_top)
-            marg_size = 5 #margin = 5 points in the contour 
-            
-            for cont0 in range(len(contours_top)):
-                if contours_top[cont0].shape[0] < mean_size_top - marg_size:
-                    to_remove.append(cont0)
-                #if maximum value of radon transform in the contour is too small compared to the
-                #others
-#                elif contours_top[cont0].shape[0] >= mean_size_top - marg_size and 
-#                    if maximums[cont0] < mean_of_maxRadon - 20/100*mean_of_maxRadon:
-#                        to_remove.append(cont0)
-#                        print('cd on maxi radon value')
-
-
-            contours_top2 = [contours_top[ind] for ind in range(len(contours_top)) if ind not in to_remove]    
-            
-        if len(contours_top2) == 1:
-            contours_top = contours_top2
-        elif len(contours_top2) >= 2:
-            region1 = contours_top2[0]
-            region2 = contours_top2[1]
-            for cont0 in range(2,len(contours_top2)):
-                if np.amin(region1[:,0,1]) < np.amin(region2[:,0,1]):
-                    if np.amin(contours_top2[cont0][:,0,1]) < np.amin(region2[:,0,1]):
-                        region2 = contours_top2[cont0]
-                if np.amin(region1[:,0,1]) >= np.amin(region2[:,0,1]):
-                    if np.amin(contours_top2[cont0][:,0,1]) < np.amin(region1[:,0,1]):
-                        region1 = contours_top2[cont0]                   
-
-
-            # look for the closest first two contours to line 0
-            # if they are less than 4 mm far from each other, then take the 2nd one
-            # if they are more than 4 mm far from each other, it means they are not
-            #  skin and apo, so take the first one.
-            # THIS IS EMPIRICAL, SOMETHING BETTER MUST BE FOUND
-            min1 = np.amin(region1[:,0,1])
-            max1 = np.amax(region1[:,0,1])
-            min2 = np.amin(region2[:,0,1])
-            max2 = np.amax(region2[:,0,1])
-            mini_dist_mm = 4
-            if min1 < min2  and  abs(min2-max1)*calibV < mini_dist_mm:
-                #skin and apo ; take the farthest to line 0
-                #recreate contours_top with only the right region
-                contours_top = [region2]
-            elif min2 < min1 and abs(min1-max2)*calibV < mini_dist_mm:
-                contours_top = [region1]
-            elif abs(min1-max2)*calibV >= mini_dist_mm and abs(min2-max1)*calibV >= mini_dist_mm: 
-                #take the closest to line 0
-                if min1 < min2:
-                    contours_top = [region1]
-                elif min2 < min1:
-                    contours_top = [region2]
-                
-    #find superficial aponeurosis
-    if len(contours_inf) <1:
+    peaks = _twoApoPeaks(I_radon, calibV, thresh)
+    if peaks is None:
         return ('error', 'error'), ('error', 'error'), 'error', 'error'
-    elif len(contours_inf)>1:
-
-        if len(contours_inf) == 2:
-            contours_inf2 = contours_inf
-            
-        #in case there are more than 2 contours,
-        # if a contour is too small compared to the others, remove it.
-        elif len(contours_inf) > 2:
-            mean_size_inf = 0
-            to_remove = []
-            maximums = []
-            
-            for cont0 in range(len(contours_inf)):
-                mean_size_inf = mean_size_inf + contours_inf[cont0].shape[0]
-                list_radonvalues = [I_radon[contours_inf[cont0][ind,0,1], contours_inf[cont0][ind,0,0]] for ind in range(contours_inf[cont0].shape[0])]
-                maximums.append(max(list_radonvalues))
-                
-            mean_size_inf = mean_size_inf / len(contours_inf)
-            marg_size = 5 #margin = 5 points in the contour 
-            
-            
-            for cont0 in range(len(contours_inf)):
-                if contours_inf[cont0].shape[0] < mean_size_inf - marg_size:
-                    to_remove.append(cont0)
-                #if maximum value of radon transform in the contour is too small compared to the
-                #others
-#                else:
-#                    if maximums[cont0] < mean_of_maxRadon - 20/100*mean_of_maxRadon:
-#                        to_remove.append(cont0)
-#                        print('cd on maxi radon value')
-            
-            
-            contours_inf2 = [contours_inf[ind] for ind in range(len(contours_inf)) if ind not in to_remove]    
-            
-            
-        #find regions closest to last line of I
-        if len(contours_inf2) ==1:
-            contours_inf = contours_inf2
-        elif len(contours_inf2) >= 2:
-            region1 = contours_inf2[0]
-            region2 = contours_inf2[1]
-            for cont0 in range(2,len(contours_inf2)):
-                if np.amax(region1[:,0,1]) < np.amax(region2[:,0,1]):
-                    if np.amax(contours_inf2[cont0][:,0,1]) > np.amax(region1[:,0,1]):
-                        region1 = contours_inf2[cont0]
-                if np.amax(region1[:,0,1]) >= np.amax(region2[:,0,1]):
-                    if np.amax(contours_inf2[cont0][:,0,1]) > np.amax(region2[:,0,1]):
-                        region2 = contours_inf2[cont0]                   
-
-            # look for the closest first two contours to line 0
-            # if they are less than 4 mm far from each other, then take the 2nd one
-            # if they are more than 4 mm far from each other, it means they are not
-            #  skin and apo, so take the first one.
-            #EMPIRICAL
-            min1 = np.amin(region1[:,0,1])
-            max1 = np.amax(region1[:,0,1])
-            min2 = np.amin(region2[:,0,1])
-            max2 = np.amax(region2[:,0,1])
-            mini_dist_mm = 4
-            if max1 < max2  and  abs(min2-max1)*calibV < mini_dist_mm:
-                #skin and apo ; take the farthest to line 0
-                #recreate contours_inf with only the right region
-                contours_inf = [region1]
-            elif max2 < max1 and abs(min1-max2)*calibV < mini_dist_mm:
-                contours_inf = [region2]
-            elif abs(min1-max2)*calibV >= mini_dist_mm and abs(min2-max1)*calibV >= mini_dist_mm: 
-                #take the closest to line 0
-                if max1 < max2:
-                    contours_inf = [region2]
-                elif max2 < max1:
-                    contours_inf = [region1]
-        
-    #! offset in R_inf when search for contours
-    contours_inf[0][:,0,1] = int(I_radon.shape[0]/2) + contours_inf[0][:,0,1]
-    
+    center_top, center_inf = peaks
+
+    if not backprojection:
+        #lines corresponding to both points, from top to bottom of I
+        n = I.shape[0]
+        mid = int(n/2)
+        lines = [_radonLine(center_top, theta, n), _radonLine(center_inf, theta, n)]
+        if lines[0][0] == 'error' or lines[1][0] == 'error':
+            return ('error', 'error'), ('error', 'error'), 'error', 'error'
+        line1, line2 = sorted(lines, key = lambda l: l[0] * mid + l[1])
+        return _twoApoBands(line1, line2, n, mid)
+
     I_radonF = np.zeros(I_radon.shape)
-    center_top, radius_top = cv2.minEnclosingCircle(contours_top[0][:,0,:])
-    center_inf, radius_inf = cv2.minEnclosingCircle(contours_inf[0][:,0,:])
     I_radonF[int(center_top[1]), int(center_top[0])] = 255
     I_radonF[int(center_inf[1]), int(center_inf[0])] = 255
-    linearApo = (iradon(I_radonF)>0)*255.
+    linearApo = (iradon(I_radonF, theta = theta)>0)*255.
     
     
 
@@ -299,7 +754,8 @@ def twoApoLocation(I, calibV, angle1, angle2,thresh = None):
 
 
 
-def oneApoLocation(I, calibV, angle1, angle2, thresh = None):
+def oneApoLocation(I, calibV, angle1, angle2, thresh = None, resolution = 1., fullRadon = False,\
+                   radonCache = None, sinogram = None, backprojection = False):
     """
     Function that detects the most proeminant white line in I
     (that should be aponeurosis).
@@ -313,6 +769,21 @@ def oneApoLocation(I, calibV, angle1, angle2, thresh = None):
         calibV: is the calibration factor along axis 0.
         angle1, angle2 (floats, in degrees) are the angles interval in between
         we assume that aponeuroses orientations stand. angle1 < angle2   
+        resolution (float): angular step of the radon transform, in degrees.
+        Default is 1.
+        fullRadon (bool): if True, the radon transform is computed for all
+        angles before the projections outside [angle1, angle2[ are erased.
+        Default is False: only the projections in [angle1, angle2[ are computed.
+        radonCache (RadonCache): optional. If not None, the radon transform is
+        computed as a sparse matrix product, with the operator stored in
+        radonCache (faster when many images of same size are processed).
+        sinogram (array): optional. Radon transform of I already computed,
+        as output by radonBands with the same angles and resolution.
+        backprojection (bool): optional. If False (default), the lines are
+        directly computed from the position of the selected points of the
+        radon transform. If True, they are computed from the inverse radon
+        transform of these points, as in the first versions of the function
+        (slower).
 
 
     Returns
@@ -331,12 +802,11 @@ def oneApoLocation(I, calibV, angle1, angle2, thresh = None):
         mini = np.min(I.shape)
         I = I[0:mini,0:mini]
     
-    #Calculate radon transform
-    I_radon = radon(I, circle = True)
-     
-    #erase lines with slope > angle2 and <angle1
-    I_radon[:, :angle1] = np.zeros((I_radon.shape[0], angle1))
-    I_radon[:, angle2:] = np.zeros((I_radon.shape[0], 180 - angle2))
+    #Calculate radon transform, for lines with slope between angle1 and angle2
+    if sinogram is None:
+        I_radon, theta = _radonWindow(I, angle1, angle2, resolution, fullRadon, radonCache)
+    else:
+        I_radon, theta = np.copy(sinogram), np.arange(0., 180., resolution)
 
     #threshold to keep whitest regions
     if thresh is None:
@@ -347,78 +817,31 @@ def oneApoLocation(I, calibV, angle1, angle2, thresh = None):
     SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
     I_radon3 = cv2.erode(src = I_radon2, kernel = SE)
 
-    #find where are white regions and contour them
-    contours = cv2.findContours(I_radon3, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[0]
-
-    
-    #find  aponeurosis
-    if len(contours) <1:
+    #label white regions and select the aponeurosis
+    labels, regions = _candidateRegions(I_radon3, I_radon)
+    k = _selectRegion(regions, calibV, skin = False)
+    if k is None:
         return ('error', 'error'), 'error'
-    elif len(contours)>1:
-        
-        if len(contours) == 2:
-            contours2 = contours
-        
-        #in case there are more than 2 contours,
-        # if a contour is too small compared to the others, remove it.
-        elif len(contours) > 2:
-            mean_size = 0
-            to_remove = []
-            
-            for cont0 in range(len(contours)):
-                mean_size = mean_size + contours[cont0].shape[0]
-                
-            mean_size = mean_size / len(contours)
-            marg_size = 5 #margin = 5 points in the contour 
-            
-            for cont0 in range(len(contours)):
-                if contours[cont0].shape[0] < mean_size - marg_size:
-                    to_remove.append(cont0)
-
-
-            contours2 = [contours[ind] for ind in range(len(contours)) if ind not in to_remove]    
-            
-        if len(contours2) == 1:
-            contours = contours2
-        elif len(contours2) >= 2:
-            region1 = contours2[0]
-            region2 = contours2[1]
-            for cont0 in range(2,len(contours2)):
-                if np.amin(region1[:,0,1]) < np.amin(region2[:,0,1]):
-                    if np.amin(contours2[cont0][:,0,1]) < np.amin(region2[:,0,1]):
-                        region2 = contours2[cont0]
-                if np.amin(region1[:,0,1]) >= np.amin(region2[:,0,1]):
-                    if np.amin(contours2[cont0][:,0,1]) < np.amin(region1[:,0,1]):
-                        region1 = contours2[cont0]                   
-
-
-            # look for the closest first two contours to line 0
-            # if they are less than 4 mm far from each other, then take the 2nd one
-            # if they are more than 4 mm far from each other, it means they are not
-            #  skin and apo, so take the first one.
-            min1 = np.amin(region1[:,0,1])
-            max1 = np.amax(region1[:,0,1])
-            min2 = np.amin(region2[:,0,1])
-            max2 = np.amax(region2[:,0,1])
-            mini_dist_mm = 4
-            if min1 < min2  and  abs(min2-max1)*calibV < mini_dist_mm:
-                #skin and apo ; take the farthest to line 0
-                #recreate contours with only the right region
-                contours = [region1]
-            elif min2 < min1 and abs(min1-max2)*calibV < mini_dist_mm:
-                contours = [region2]
-            elif abs(min1-max2)*calibV >= mini_dist_mm and abs(min2-max1)*calibV >= mini_dist_mm: 
-                #take the closest to line 0
-                if min1 < min2:
-                    contours = [region2]
-                elif min2 < min1:
-                    contours = [region1]
-                    
-                    
+    center = _regionCenter(labels, regions, k)
+
+    if not backprojection:
+        #line corresponding to the point, and horizontal band containing it,
+        #from the row of the line at the middle column of I
+        n = I.shape[0]
+        a, b = _radonLine(center, theta, n)
+        if a == 'error':
+            return ('error', 'error'), 'error'
+        upRow = int(round(a * int(n/2) + b))
+        if upRow < 0 or upRow >= n:
+            upRow = n
+            a, b = 'error', 'error'
+        upLine = max(0, upRow - 30)
+        loc = (upLine, min(upLine + 60, n - 1))
+        return (a, b), loc
+
     I_radonF = np.zeros(I_radon.shape)
-    center, radius = cv2.minEnclosingCircle(contours[0][:,0,:])
     I_radonF[int(center[1]), int(center[0])] = 255
-    linearApo = (iradon(I_radonF)>0)*255.
+    linearApo = (iradon(I_radonF, theta = theta)>0)*255.
 
     #Determine horizontal band containing aponeurosis
     j=0
@@ -443,4 +866,73 @@ def oneApoLocation(I, calibV, angle1, angle2, thresh = None):
         a = 'error'
         b = 'error'
     
-    return (a, b), loc
\ No newline at end of file
+    return (a, b), loc
+
+class ApoTracker(object):
+    """Locates the aponeuroses in successive images of the same muscle
+    (same participant and session), whose aponeuroses depth and orientation
+    barely change: the lines found in an image are the prior of
+    twoApoLocation for the next one, so that the radon transform is only
+    computed and segmented around them, with the segmentation threshold of
+    the last full search. When the peaks are too weak around
+    the prior, or when there is no prior (first image, or aponeuroses not
+    found in the previous image), the whole angle interval is searched.
+
+    Args:
+        angleTol (float): tolerance on the angle of the lines, in degrees
+        offsetTol (int): tolerance on the offset of the lines in the radon
+        transform, in pixels
+
+    Example:
+        > tracker = ApoTracker()
+        > for I in images:
+        >     paramSup, paramInf, locSup, locInf = tracker.locate(I, 0.1, 80, 100)
+        > tracker.report()
+    """
+    def __init__(self, angleTol = 5., offsetTol = 30):
+        self.priorTol = (angleTol, offsetTol)
+        self.prior = None
+        self.thresh = None
+        self.windowed = 0
+        self.full = 0
+
+    def reset(self):
+        """Forgets the prior (e.g. before the images of another muscle)"""
+        self.prior = None
+        self.thresh = None
+
+    def locate(self, I, calibV, angle1, angle2, thresh = None, resolution = 1., radonCache = None):
+        """Same as twoApoLocation(I, calibV, angle1, angle2, thresh,
+        resolution, radonCache = radonCache), with the lines found in the
+        previous image as prior. The lines found in I are the next prior.
+        """
+        if len(I.shape) > 2:
+            I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
+        mini = np.min(I.shape)
+        I = I[0:mini,0:mini]
+
+        result = None
+        if self.prior is not None:
+            result = _twoApoPrior(I, calibV, angle1, angle2, self.prior, self.priorTol,\
+                                  self.thresh if thresh is None else thresh, resolution, radonCache)
+        if result is None:
+            #full search, whose threshold is kept for the next images
+            self.full = self.full + 1
+            I_radon, theta = _radonWindow(I, angle1, angle2, resolution, cache = radonCache)
+            if thresh is None:
+                self.thresh = np.percentile(I_radon, 99.2)
+            result = twoApoLocation(I, calibV, angle1, angle2, self.thresh if thresh is None else thresh,\
+                                    resolution, sinogram = I_radon)
+        else:
+            self.windowed = self.windowed + 1
+
+        if result[0][0] == 'error' or result[1][0] == 'error':
+            self.prior = None
+        else:
+            self.prior = (result[0], result[1])
+        return result
+
+    def report(self):
+        """Returns a dict with the number of images located around the
+        prior ('windowed') and with the whole angle interval ('full')."""
+        return {'windowed': self.windowed, 'full': self.full}
@@ -89,6 +89,7 @@ def _calcula_arch(data):
     """
 
     import numpy as np
+    import apoLoc as apoL
     import autoP as autoP
     import autoS as autoS
     import manuP as manuP
@@ -97,6 +98,9 @@ def _calcula_arch(data):
     for part in data.keys():
         for ntest in data[part].keys():
             for msc in data[part][ntest].keys():
+                #aponeuroses of the simple images of a muscle are searched
+                #around the ones found in the previous image
+                tracker = apoL.ApoTracker()
                 for echo in data[part][ntest][msc].keys():
 
                     if echo == 'landmark':
@@ -145,7 +149,7 @@ def _calcula_arch(data):
                             architecture1 = manuS.simpleManu(architecture1)
                             data[part][ntest][msc]['simple'][img]['architecture manual'] = architecture1
                             #automatic processing
-                            architecture2 = autoS.simpleprocessing(path_to_jpg)
+                            architecture2 = autoS.simpleprocessing(path_to_jpg, tracker = tracker)
                             if architecture2:
                                 points_sup_a = architecture2['aposup']['coords']
                                 points_inf_a = architecture2['apoinf'] ['coords']                           
@@ -270,34 +274,41 @@ def forMTcomparison(ptsSup_m, ptsInf_m, ptsSup_a, ptsInf_a, calibV_m, calibV_a):
         ptsSup_m: list of points of superficial aponeurosis, manual labelling
         ptsInf_m: list of points of deep aponeurosis manual labelling
         ptsSup_a: list of continuous points of superficial aponeurosis, automatic processing, all along the US image
+            (or curveFit.ColumnCurve)
         ptsInf_a: list of continuous points of deep aponeurosis, automatic processing, all along the US image
+            (or curveFit.ColumnCurve)
         calibV_m (float): vertical calibration factor computed with manual labelling
         calibV_a (float): vertical calibration factor computed from automatic processing
     Outputs:
         2 lists of same length, that contains MT from manual data, and MT from 
             automatic processing at the same columns as for manual MT
     """
+    from curveFit import ColumnCurve
+
     MT_m = []
     MT_a = []
     
+    automatic = not isinstance(ptsSup_a, str) and not isinstance(ptsInf_a, str)
+    if automatic:
+        # automatic points indexed by column (the last point of a column is used)
+        if not isinstance(ptsSup_a, ColumnCurve):
+            ptsSup_a = ColumnCurve.fromPoints(ptsSup_a, keep = 'last')
+        if not isinstance(ptsInf_a, ColumnCurve):
+            ptsInf_a = ColumnCurve.fromPoints(ptsInf_a, keep = 'last')
+    
     for ind in range(len(ptsSup_m)):
         # extract column and rows of manual points
         col_1 = ptsSup_m[ind][1]
         col_2 = ptsInf_m[ind][1]
         lig_1 = ptsSup_m[ind][0]
         lig_2 = ptsInf_m[ind][0]
-        lig_3 = -1
-        lig_4 = -1
         # compute manual MT
         MT_m.append(abs(lig_2 - lig_1)*calibV_m)
             
-        if ptsSup_a != 'error' and ptsInf_a != 'error':
+        if automatic:
             # look for automatic points that have the same column as manual points
-            for ind2 in range(len(ptsSup_a)):
-                if int(ptsSup_a[ind2][1]) == int(col_1):
-                    lig_3 = ptsSup_a[ind2][0]
-                if int(ptsInf_a[ind2][1]) == int(col_2):
-                    lig_4 = ptsInf_a[ind2][0]
+            lig_3 = ptsSup_a.at(int(col_1))
+            lig_4 = ptsInf_a.at(int(col_2))
             
             #compute automatic MT if the previous automatic points were found
             if lig_3>= 0 and lig_4 >=0:
@@ -1,12 +1,14 @@
 """ automatic analysis of panoramic images """
 
-def panoprocessing(path_to_image, path_to_txtfile):
+def panoprocessing(path_to_image, path_to_txtfile, workers = None):
     """
     Function that realizes the (semi) automatic processing of panoramic US images of muscles
 
     inputs
         path_to_image (string): path to the image + name image + extension
         path_to_txtfile (string): path to the txt file + name file + extension
+        workers (int): number of processes used to detect the aponeuroses
+        in the bands of the image (see detectBands). Default is the number of CPUs.
 
     outputs:
         a dictionary containing the analyzed architecture of the image.
@@ -18,6 +20,7 @@ def panoprocessing(path_to_image, path_to_txtfile):
     import apoCont as apoC
     import MUFeaM as MUFeaM
     import FaDe as FaDe
+    from curveFit import ColumnCurve
 
     import cv2
     import numpy as np
@@ -70,13 +73,8 @@ def panoprocessing(path_to_image, path_to_txtfile):
         
         #Sample to analyze band-by-band the image
         #NBANDS: number of bands used to sample the image
-        #MAXBAND: limit below which both aponeuroses are analysed (beyond, only upper apo is looked for)
         sampleSize = USimageP.shape[0]
         NBANDS = int(USimageP.shape[1]/sampleSize)
-        if NBANDS%2 == 0:
-            MAXBAND = int(NBANDS / 2) 
-        else:
-            MAXBAND = int(NBANDS / 2) + 1
                 # sample1 = USimageP[:,:sampleSize]
                 # sample2 = USimageP[:,sampleSize:2*sampleSize]
                 # etc
@@ -97,179 +95,74 @@ def panoprocessing(path_to_image, path_to_txtfile):
         print('Detecting aponeuroses')
         contoursSup = []
         contoursInf = []
+        #number of active contour steps of the evolutions initiated from the
+        #previous band (warm) and from the linear approximations (cold)
+        steps = {'warm': [], 'cold': []}
+        #localisation and contour evolution of all bands, run in parallel
+        #by worker processes; the contours are then validated band by band
+        bands = detectBands(USimageP_pp, calibV = calibX, insertion = insertion, workers = workers)
         
-        for i in range(NBANDS):
-            #
-            #
-            if i < MAXBAND: #look for both deep and superficial aponeuroses
+        for band in bands:
+            i = band['index']
+            for apo in ['sup', 'inf']:
+                result = band[apo]
+                if result is None:
+                    continue
+                name = 'Upper' if apo == 'sup' else 'Deep'
+                for n in result['steps']:
+                    print(name + ' aponeurosis contour found in ', n, ' steps')
+                steps['warm' if result['warm'] else 'cold'].append(result['steps'][0])
                 
+                #sub-images of the aponeurosis in sample i
+                r1, r2 = result['rows']
+                col1, col2 = result['columns']
+                Apo_i_pp = np.copy(USimageP_pp[r1:r2, col1:col2])
+                contour_i = result['contour']
                 
-                #find approximate locations and linear approximations
-                paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(USimageP_pp[:, i*sampleSize:(i+1)*sampleSize], angle1 = 80, angle2 = 101, thresh = None, calibV = calibX)
-                
-                if paramSup[0] != 'error':
-
-                    #######################
-                    #######################
-                    ### upper apo processing
-                    #sub-images of superficial aponeurosis
-                    Sup_i = np.copy(USimageP[locSup[0]:locSup[1], i*sampleSize:(i+1)*sampleSize])
-                    Sup_i_pp = np.copy(USimageP_pp[locSup[0]:locSup[1], i*sampleSize:(i+1)*sampleSize]) #upper aponeurosis in sample i
-            
-                    #Initiate contour: create quadrangle around linear approximation 
-                    iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'quadrangle_param', param = [paramSup[0], paramSup[1]-locSup[0], 10])       
-                    
-                    #Evolve contour with active contour model
-                    contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                    print('Upper aponeurosis contour found in ', nSup_i, ' steps')
-        
-                    #verify contour has been detected and ask for MANUAL validation
-                    if np.amin(contourSup_i) > 0: #try a second time with a bigger initial contour if no contour has been found
-                        iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'quadrangle_param', param = [paramSup[0], paramSup[1] - locSup[0], 40])
-                        contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                        print('Upper aponeurosis contour found in ', nSup_i, ' steps')
-        
-                    if np.amin(contourSup_i)<=0: #if the contour exists, extract it
-                        contourSup_image_i, contourSup_points_i = apoC.extractContour(contourSup_i, Sup_i, offSetX = locSup[0], offSetY = i * sampleSize)
-                        visu = np.copy(USimageP[:, i*sampleSize:(i+1)*sampleSize])
-                        visu[locSup[0]:locSup[1],:] = contourSup_image_i
-                        #ask for manual validation of the contour
-                        cv2.imshow('Sample i', visu)
-                        valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                        cv2.waitKey(0) & 0xFF
-                        cv2.destroyAllWindows()
-                        
-                        if valid == False:
-                            #try a second time with a new initial contour
-                            points = np.array([[0, 0], [int(Sup_i_pp.shape[0]/2), 0], [int(Sup_i_pp.shape[0]/2), Sup_i_pp.shape[1]], [0, Sup_i_pp.shape[1]]])
-                            iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'set_of_points', setPoints = points)
-                            contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                            print('Upper aponeurosis contour found in ', nSup_i, ' steps')
-                            if np.amin(contourSup_i) <= 0 :
-                                contourSup_image_i, contourSup_points_i = apoC.extractContour(contourSup_i, Sup_i, offSetX = locSup[0], offSetY = i * sampleSize)
-                                visu = np.copy(USimageP[:, i*sampleSize:(i+1)*sampleSize])
-                                visu[locSup[0]:locSup[1],:] = contourSup_image_i
-                                #ask for manual validation of the contour
-                                cv2.imshow('Sample i', visu)
-                                valid = tkbox.askyesno('Need user validation', 'Do you validate the contour ? If no, this section will be ignored in the interpolation process. After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                                cv2.waitKey(0) & 0xFF
-                                cv2.destroyAllWindows()                
-                        
-                        
-                        if valid == True:
-                            #add contour_i to list 'contoursSup'
-                            for elem in contourSup_points_i:
-                                contoursSup.append(elem)
-                    
+                if np.amin(contour_i) <= 0: #if the contour exists, extract it
+                    visu = np.copy(USimageP[:, col1:col2])
+                    contour_points_i = apoC.contourPoints(contour_i, offSetX = r1, offSetY = col1, overlay = visu[r1:r2,:])
+                    #ask for manual validation of the contour
+                    cv2.imshow('Sample i', visu)
+                    valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
+                    cv2.waitKey(0) & 0xFF
+                    cv2.destroyAllWindows()
                     
-                    ####################
-                    ####################
-                    ### deep apo
-                    #sub-images of deep aponeurosis
-                    Inf_i = np.copy(USimageP[locInf[0]:locInf[1], i*sampleSize:(i+1)*sampleSize])
-                    Inf_i_pp = np.copy(USimageP_pp[locInf[0]:locInf[1], i*sampleSize:(i+1)*sampleSize]) #deep aponeurosis in sample i
-                    
-                    #Initiate contour with linear approximation
-                    iniInf_i = apoC.initiateContour(Inf_i_pp, typeC = 'quadrangle_param', param = [paramInf[0], paramInf[1]-locInf[0], 10])
-        
-                    #Evolve contour with active contour model
-                    contourInf_i, nInf_i = apoC.activeContour(Inf_i_pp, iniInf_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                    print('Deep aponeurosis contour found in ', nInf_i, ' steps')
-                    
-                    #Verify contour has been detected and ask for MANUAL validation
-                    if np.amin(contourInf_i) > 0: #try a second time with a bigger initial contour if no contour has been found
-                        iniInf_i = apoC.initiateContour(Inf_i_pp, typeC = 'quadrangle_param', param = [paramInf[0], paramInf[1] - locInf[0], 40])
-                        contourInf_i, nInf_i = apoC.activeContour(Inf_i_pp, iniInf_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                        print('Deep aponeurosis contour found in ', nInf_i, ' steps')
-        
-                    if np.amin(contourInf_i)<=0: #if the contour exists, extract it
-                        contourInf_image_i, contourInf_points_i = apoC.extractContour(contourInf_i, Inf_i, offSetX = locInf[0], offSetY = i * sampleSize)
-                        visu = np.copy(USimageP[:, i*sampleSize:(i+1)*sampleSize])
-                        visu[locInf[0]:locInf[1],:] = contourInf_image_i
-                        #ask for manual validation of the contour
-                        cv2.imshow('Sample i', visu)
-                        valid = tkbox.askyesno('Need user validation', 'Do you validate the contours? After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                        cv2.waitKey(0) & 0xFF
-                        cv2.destroyAllWindows()
-                        
-                        if valid == False:
-                            #try a second time with a new initial contour
-                            points = np.array([[int(Inf_i_pp.shape[0]/2), 0], [Inf_i_pp.shape[0], 0], [Inf_i_pp.shape[0],Inf_i_pp.shape[1]], [int(Inf_i_pp.shape[0]/2), Inf_i_pp.shape[1]]])
-                            iniInf_i = apoC.initiateContour(Inf_i_pp, typeC = 'set_of_points', setPoints = points)
-                            contourInf_i, nInf_i = apoC.activeContour(Inf_i_pp, iniInf_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                            print('Deep aponeurosis contour found in ', nInf_i, ' steps')
-                            if np.amin(contourInf_i) <= 0 :
-                                contourInf_image_i, contourInf_points_i = apoC.extractContour(contourInf_i, Inf_i, offSetX = locInf[0], offSetY = i * sampleSize)
-                                visu = np.copy(USimageP[:, i*sampleSize:(i+1)*sampleSize])
-                                visu[locInf[0]:locInf[1],:] = contourInf_image_i
-                                #ask for manual validation of the contour
-                                cv2.imshow('Sample i', visu)
-                                valid = tkbox.askyesno('Need user validation', 'Do you validate the contour ? If no, this section will be ignored in the interpolation process. After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                                cv2.waitKey(0) & 0xFF
-                                cv2.destroyAllWindows()                
-                        
-                        if valid == True:
-                            #add contour_i to contourInf
-                            for elem in contourInf_points_i:
-                                contoursInf.append(elem)
-                
-            
-            ##################
-            ##################
-            #look for superficial aponeurosis only
-            elif i > MAXBAND and abs(i*sampleSize-min((i+1)*sampleSize, int(insertion[1])))>USimageP.shape[0]/2:
-                
-                offS = 0
-                offS2 = USimageP.shape[0]
-                Sup_i = np.copy(USimageP[offS:offS2, i*sampleSize:min((i+1)*sampleSize, int(insertion[1]))])
-                Sup_i_pp = np.copy(USimageP_pp[offS:offS2, i*sampleSize:min((i+1)*sampleSize, int(insertion[1]))])
-    
-                # Approximate location of aponeurosis
-                param, loc = apoL.oneApoLocation(Sup_i_pp, thresh = None, calibV = calibX, angle1 = int(50), angle2 = int(90))
-                
-                if param[0] != 'error':
-                    #Initiate contour
-                    iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'quadrangle_param', param = [param[0], param[1] - offS, 10])
-        
-                    #Evolve contour with active contour model
-                    contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                    print('Upper aponeurosis contour found in ', nSup_i, ' steps')
+                    if valid == False:
+                        #try a second time with a new initial contour, in the
+                        #upper (superficial apo) or lower (deep apo) half of the sub-image
+                        h, w = Apo_i_pp.shape
+                        if apo == 'sup':
+                            points = np.array([[0, 0], [int(h/2), 0], [int(h/2), w], [0, w]])
+                        else:
+                            points = np.array([[int(h/2), 0], [h, 0], [h, w], [int(h/2), w]])
+                        ini_i = apoC.initiateContour(Apo_i_pp, typeC = 'set_of_points', setPoints = points)
+                        contour_i, n_i = apoC.activeContour(Apo_i_pp, ini_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+                        print(name + ' aponeurosis contour found in ', n_i, ' steps')
+                        if np.amin(contour_i) <= 0 :
+                            visu = np.copy(USimageP[:, col1:col2])
+                            contour_points_i = apoC.contourPoints(contour_i, offSetX = r1, offSetY = col1, overlay = visu[r1:r2,:])
+                            #ask for manual validation of the contour
+                            cv2.imshow('Sample i', visu)
+                            valid = tkbox.askyesno('Need user validation', 'Do you validate the contour ? If no, this section will be ignored in the interpolation process. After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
+                            cv2.waitKey(0) & 0xFF
+                            cv2.destroyAllWindows()
                     
-                    if np.amin(contourSup_i) > 0: #try a second time with a bigger initial contour if no contour has been found
-                        iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'quadrangle_param', param = [param[0], param[1] - offS, 40])
-                        contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                        print('Upper aponeurosis contour found in ', nSup_i, ' steps')
-                          
-                    if np.amin(contourSup_i) <= 0:
-                        contourSup_image_i, contourSup_points_i = apoC.extractContour(contourSup_i, Sup_i, offSetX = offS, offSetY = i * sampleSize)
-                        #ask for manual validation of the contour
-                        cv2.imshow('Upper aponeurosis contour on sample i', contourSup_image_i)
-                        valid = tkbox.askyesno('Need user validation', 'Do you validate the contour ? If no, this section will be ignored in the interpolation process. After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                        cv2.waitKey(0) & 0xFF
-                        cv2.destroyAllWindows()
-                        
-                        if valid == False:
-                            #try a second time with a new initial contour
-                            points = np.array([[0, 0], [int(Sup_i_pp.shape[0]/2), 0],[int(Sup_i_pp.shape[0]/2), Sup_i_pp.shape[1]], [0, Sup_i_pp.shape[1]]])
-                            iniSup_i = apoC.initiateContour(Sup_i_pp, typeC = 'set_of_points', setPoints = points)
-                            contourSup_i, nSup_i = apoC.activeContour(Sup_i_pp, iniSup_i, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
-                            print('Upper aponeurosis contour found in ', nSup_i, ' steps')
-                            if np.amin(contourSup_i) <= 0 :
-                                contourSup_image_i, contourSup_points_i = apoC.extractContour(contourSup_i, Sup_i, offSetX = offS, offSetY = i * sampleSize)
-                                #ask for manual validation of the contour
-                                cv2.imshow('Upper aponeurosis contour on sample i', contourSup_image_i)
-                                valid = tkbox.askyesno('Need user validation', 'Do you validate the contour ? If no, this section will be ignored in the interpolation process. After clicking yes or no, please close the image windows to continue.', default = 'yes', icon='question')
-                                cv2.waitKey(0) & 0xFF
-                                cv2.destroyAllWindows()
-                            
-                        if valid == True:
-                            #add contour_i to list 'contoursSup'
-                            for elem in contourSup_points_i:
-                                contoursSup.append(elem)
+                    if valid == True:
+                        #add contour_i to list 'contoursSup' or 'contoursInf'
+                        (contoursSup if apo == 'sup' else contoursInf).append(contour_points_i)
         
-        contoursSup.append(insertion)
-        contoursInf.append(insertion)
+        #points (row, column) of the validated contours, and insertion point
+        contoursSup = np.vstack(contoursSup + [np.array([insertion])])
+        contoursInf = np.vstack(contoursInf + [np.array([insertion])])
         print('The detection of aponeuroses is over')
+        print('Radon operators cache: ', apoL.radonCache.report())
+        #steps saved by the warm starts, compared to the mean number of steps of the cold starts
+        if len(steps['warm']) > 0 and len(steps['cold']) > 0:
+            saved = len(steps['warm']) * np.mean(steps['cold']) - np.sum(steps['warm'])
+            print('Active contour: ', len(steps['warm']), ' warm-started bands in ', np.sum(steps['warm']),\
+                  ' steps, ', len(steps['cold']), ' cold-started in ', np.sum(steps['cold']),\
+                  ' steps. Estimated steps saved: ', int(saved))
 
         # if no portion of an aponeurosis has been detected, stop analysis
         if len(contoursSup) <=1 or len(contoursInf) <= 1:
@@ -342,15 +235,9 @@ def panoprocessing(path_to_image, path_to_txtfile):
                     maxiI = np.amax(coordInf[:,1])
                     mini = max(miniS, miniI)
                     maxi = min(maxiS, maxiI)
-                    coordS = np.zeros((maxi-mini+1,2))
-                    coordI = np.zeros((maxi-mini+1,2))
-                    for index1 in range(mini, maxi+1):
-                        pixelS = [coordSup[i,0] for i in range(coordSup.shape[0]) if coordSup[i,1] == index1]
-                        pixelI = [coordInf[i,0] for i in range(coordInf.shape[0]) if coordInf[i,1] == index1]
-                        coordS[index1-mini,0] = np.mean(pixelS)
-                        coordS[index1-mini,1] = index1
-                        coordI[index1-mini,0] = np.mean(pixelI)
-                        coordI[index1-mini,1] = index1
+                    #mean row of each aponeurosis at each column in [mini, maxi]
+                    coordS = ColumnCurve.fromPoints(coordSup, keep = 'mean').toPoints(np.arange(mini, maxi+1))
+                    coordI = ColumnCurve.fromPoints(coordInf, keep = 'mean').toPoints(np.arange(mini, maxi+1))
                     archi_auto = dict()
                     archi_auto['crop'] = {'lines': [l1,l2], 'columns': [c1,c2]}
                     archi_auto['calfct_to_mm before resize'] = {'vertical axis': calibX * PERCENTAGE/100, 'horizontal axis': calibY*PERCENTAGE/100}
@@ -430,15 +317,9 @@ def panoprocessing(path_to_image, path_to_txtfile):
         maxiI = np.amax(coordI[:,1])
         mini = int(max(miniS, miniI))
         maxi = int(min(maxiS, maxiI))
-        coordS2 = np.zeros((maxi-mini+1,2))
-        coordI2 = np.zeros((maxi-mini+1,2))
-        for index1 in range(mini, maxi+1):
-            pixelS = [coordS[i,0] for i in range(coordS.shape[0]) if coordS[i,1] == index1]
-            pixelI = [coordI[i,0] for i in range(coordI.shape[0]) if coordI[i,1] == index1]
-            coordS2[index1-mini,0] = np.mean(pixelS)
-            coordS2[index1-mini,1] = index1
-            coordI2[index1-mini,0] = np.mean(pixelI)
-            coordI2[index1-mini,1] = index1       
+        #mean row of each aponeurosis at each column in [mini, maxi]
+        coordS2 = ColumnCurve.fromPoints(coordS, keep = 'mean').toPoints(np.arange(mini, maxi+1))
+        coordI2 = ColumnCurve.fromPoints(coordI, keep = 'mean').toPoints(np.arange(mini, maxi+1))
         archi_auto = dict()
         archi_auto['crop'] = {'lines': [l1,l2], 'columns': [c1,c2]}
         archi_auto['calfct_to_mm before resize'] = {'vertical axis': calibX * PERCENTAGE / 100, 'horizontal axis': calibY* PERCENTAGE / 100}
@@ -548,4 +429,197 @@ def panoprocessing(path_to_image, path_to_txtfile):
         cv2.waitKey(0) & 0xFF
         cv2.destroyAllWindows()
 
-        return archi_auto
\ No newline at end of file
+        return archi_auto
+
+def _evolveApo(I_pp, param, offset, previous = None):
+    """Evolves the contour of one aponeurosis in the sub-image I_pp of a band.
+    The contour is initiated from the contour of the previous band if it
+    reaches the border between both bands (warm start), otherwise from the
+    linear approximation param of the aponeurosis (cold start).
+
+    Args:
+        I_pp (array): preprocessed sub-image of the band containing the aponeurosis
+        param (tuple): linear approximation (a, b) of the aponeurosis in the band
+        offset (int): first row of I_pp in the band
+        previous (tuple): (level set, first row in the band) of the contour
+        found in the previous band, or None
+
+    Returns:
+        dict with keys 'contour' (level set), 'steps' (list of the numbers of
+        steps of the evolutions) and 'warm' (True if warm started)
+    """
+    try:
+        from . import apoCont as apoC
+    except ImportError:
+        import apoCont as apoC
+    import numpy as np
+
+    ini = None
+    if previous is not None:
+        ini = apoC.extendContour(previous[0], I_pp.shape, rowOffset = offset - previous[1])
+    warm = ini is not None
+    if not warm:
+        ini = apoC.initiateContour(I_pp, typeC = 'quadrangle_param', param = [param[0], param[1] - offset, 10])
+    contour, n = apoC.activeContour(I_pp, ini, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+    steps = [n]
+    if np.amin(contour) > 0: #try a second time with a bigger initial contour if no contour has been found
+        ini = apoC.initiateContour(I_pp, typeC = 'quadrangle_param', param = [param[0], param[1] - offset, 40])
+        contour, n = apoC.activeContour(I_pp, ini, 0.5, 0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+        steps.append(n)
+    return {'contour': contour, 'steps': steps, 'warm': warm}
+
+
+def _detectBandRange(I_pp, sinograms, indices, calibV, insertion, MAXBAND):
+    """Locates the aponeuroses and evolves their contours in the bands of
+    indices, one after the other, so that the contour of a band is the warm
+    start of the next band. See detectBands.
+    """
+    try:
+        from . import apoLoc as apoL
+    except ImportError:
+        import apoLoc as apoL
+    import numpy as np
+
+    sampleSize = I_pp.shape[0]
+    results = []
+    #contours found in the previous band (band index, level set, first row)
+    previous = {'sup': None, 'inf': None}
+    for i in indices:
+        band = {'index': int(i), 'sup': None, 'inf': None}
+        apos = []
+        if i < MAXBAND: #look for both deep and superficial aponeuroses
+            columns = (i*sampleSize, (i+1)*sampleSize)
+            paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(I_pp[:, columns[0]:columns[1]], angle1 = 80, angle2 = 101, thresh = None, calibV = calibV, sinogram = sinograms[i])
+            if paramSup[0] != 'error':
+                apos = [('sup', paramSup, locSup), ('inf', paramInf, locInf)]
+        #look for superficial aponeurosis only
+        elif i > MAXBAND and abs(i*sampleSize-min((i+1)*sampleSize, int(insertion[1])))>sampleSize/2:
+            columns = (i*sampleSize, min((i+1)*sampleSize, int(insertion[1])))
+            param, loc = apoL.oneApoLocation(I_pp[:, columns[0]:columns[1]], thresh = None, calibV = calibV, angle1 = int(50), angle2 = int(90))
+            if param[0] != 'error':
+                apos = [('sup', param, (0, sampleSize))]
+
+        for apo, param, loc in apos:
+            prev = previous[apo]
+            result = _evolveApo(I_pp[loc[0]:loc[1], columns[0]:columns[1]], param, loc[0],\
+                                previous = prev[1:] if prev is not None and prev[0] == i-1 else None)
+            result['rows'] = (int(loc[0]), int(loc[1]))
+            result['columns'] = columns
+            band[apo] = result
+            if np.amin(result['contour']) <= 0:
+                previous[apo] = (i, result['contour'], loc[0])
+        results.append(band)
+    return results
+
+
+def _shareArray(A, blocks):
+    """Copies A in a new shared memory block, appended to the list blocks.
+    Returns the (name, shape, dtype) description used by _bandsTask.
+    """
+    from multiprocessing import shared_memory
+    import numpy as np
+
+    shm = shared_memory.SharedMemory(create = True, size = max(A.nbytes, 1))
+    blocks.append(shm)
+    np.ndarray(A.shape, dtype = A.dtype, buffer = shm.buf)[...] = A
+    return (shm.name, A.shape, A.dtype.str)
+
+
+def _bandsTask(image, sinograms, indices, calibV, insertion, MAXBAND):
+    """Task of a worker process of detectBands: the preprocessed image and
+    the radon transforms of the bands are read from shared memory
+    (descriptions output by _shareArray), without copy.
+    """
+    from multiprocessing import shared_memory
+    import numpy as np
+
+    blocks = [shared_memory.SharedMemory(name = desc[0]) for desc in [image, sinograms]]
+    try:
+        arrays = [np.ndarray(desc[1], dtype = desc[2], buffer = shm.buf) for desc, shm in zip([image, sinograms], blocks)]
+        results = _detectBandRange(arrays[0], arrays[1], indices, calibV, insertion, MAXBAND)
+        del arrays
+    finally:
+        for shm in blocks:
+            shm.close()
+    return results
+
+
+def detectBands(I_pp, calibV, insertion, workers = None, chainLength = 2):
+    """Locates the aponeuroses (apoLoc.twoApoLocation or oneApoLocation)
+    and evolves their contours (apoCont.activeContour) in the square bands
+    of the preprocessed panoramic image I_pp, as in panoprocessing.
+    The bands are split in chains of chainLength consecutive bands: inside
+    a chain, the contour of a band is the warm start of the next band, and
+    the first band of a chain is cold started. The chains are independent,
+    and are processed in parallel by worker processes that read the image
+    from shared memory. The chains do not depend on the number of workers,
+    so that neither do the results.
+
+    Args:
+        I_pp (array): preprocessed panoramic image (one canal)
+        calibV (float): calibration factor along axis 0
+        insertion (tuple): (row, column) of the insertion point
+        workers (int): number of worker processes. If None, the number of
+        CPUs is used. With 1 worker, or when multiprocessing.shared_memory
+        is not available (Python < 3.8), the chains are processed in the
+        calling process.
+        chainLength (int): number of bands of a chain. If None, all bands
+        form one chain (as the sequential loop of the first versions, but
+        without parallelism).
+
+    Returns:
+        list of dict, one per band in band order, with keys 'index', 'sup'
+        and 'inf'. 'sup' and 'inf' are None if the aponeurosis has not been
+        looked for or located, otherwise a dict with keys 'contour' (level
+        set), 'steps', 'warm', 'rows' and 'columns' (limits of the sub-image
+        of the contour in I_pp). The list is empty if I_pp is narrower than
+        one band.
+
+    Example:
+        > bands = detectBands(USimageP_pp, calibV = calibX, insertion = insertion, workers = 4)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        from . import apoLoc as apoL
+    except ImportError:
+        import apoLoc as apoL
+    import numpy as np
+    import os
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        shared_memory = None
+
+    sampleSize = I_pp.shape[0]
+    NBANDS = int(I_pp.shape[1]/sampleSize)
+    if NBANDS == 0:
+        return []
+    if NBANDS%2 == 0:
+        MAXBAND = int(NBANDS / 2)
+    else:
+        MAXBAND = int(NBANDS / 2) + 1
+    #radon transforms of the bands where both aponeuroses are looked for,
+    #computed at once (with a cached radon operator if there are enough bands)
+    sinograms = apoL.radonBands([I_pp[:, i*sampleSize:(i+1)*sampleSize] for i in range(MAXBAND)], angle1 = 80, angle2 = 101)
+
+    if chainLength is None:
+        chainLength = NBANDS
+    chains = [list(range(i, min(i + chainLength, NBANDS))) for i in range(0, NBANDS, chainLength)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chains))
+    if workers <= 1 or shared_memory is None:
+        return [band for c in chains for band in _detectBandRange(I_pp, sinograms, c, calibV, insertion, MAXBAND)]
+
+    blocks = []
+    try:
+        image = _shareArray(np.ascontiguousarray(I_pp), blocks)
+        shared = _shareArray(sinograms, blocks)
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            futures = [executor.submit(_bandsTask, image, shared, c, calibV, insertion, MAXBAND) for c in chains]
+            #results reassembled in band order
+            return [band for future in futures for band in future.result()]
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
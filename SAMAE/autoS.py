@@ -1,11 +1,14 @@
 """Auto processing of simple/standard images"""
 
-def simpleprocessing(path_to_img):
+def simpleprocessing(path_to_img, tracker = None):
     """
     Function that realizes the (semi) automatic processing of simple/standard US images of muscles
 
     inputs
         path_to_image (string): path to the image + name image + extension
+        tracker (apoLoc.ApoTracker): optional. If not None, the aponeuroses
+            are located with tracker, around the aponeuroses found in the
+            previous image processed with the same tracker.
 
     outputs:
         a dictionary containing the analyzed architecture of the image.
@@ -104,7 +107,10 @@ def simpleprocessing(path_to_img):
         USimage_pp = preprocessingApo(I = USimage, typeI = 'simple', mode = 'localmean', margin = 0, sizeContrast = 41) #pre_processing
         #locate both aponeuroses in image + linear modeling of aponeuroses
         print('Looking for aponeuroses')
-        paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(USimage_pp, angle1 = 80, angle2 = 100, thresh = None, calibV = calibX)
+        if tracker is None:
+            paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(USimage_pp, angle1 = 80, angle2 = 100, thresh = None, calibV = calibX)
+        else:
+            paramSup, paramInf, locSup, locInf = tracker.locate(USimage_pp, angle1 = 80, angle2 = 100, thresh = None, calibV = calibX)
         
         ##########################################
         #for visualization
@@ -176,9 +182,8 @@ def simpleprocessing(path_to_img):
             #use linear approximation because it means active contour model failed again
             type_approx_UA = 'linear'
         if np.min(contourSup)<=0: #ask for validation of the contour
-            contourSup_image, contourSup_points = apoC.extractContour(contourSup, SupApo, offSetX = locSup[0], offSetY = 0)
             visu = np.copy(USimage)
-            visu[locSup[0]:locSup[1],:] = contourSup_image
+            contourSup_points = apoC.contourPoints(contourSup, offSetX = locSup[0], offSetY = 0, overlay = visu[locSup[0]:locSup[1],:])
             cv2.imshow('Upper aponeurosis contour', visu)
             valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? If no, linear approximation will be used in the rest of the process. After clicking yes or no, please close the image windows to continue.', default = 'no', icon='question')
             cv2.waitKey(0) & 0xFF
@@ -188,9 +193,8 @@ def simpleprocessing(path_to_img):
                 contourSup, nSup = apoC.activeContour(SupApo_pp, iniSupApo, 0.3,0.01,0.02,3.0, 1.0, 1.0, 65.025, 0.10)
                 print('Upper aponeurosis contour found in ', nSup, ' steps')
                 if np.min(contourSup)<=0:
-                    contourSup_image, contourSup_points = apoC.extractContour(contourSup, SupApo, offSetX = locSup[0], offSetY = 0)
                     visu = np.copy(USimage)
-                    visu[locSup[0]:locSup[1],:] = contourSup_image
+                    contourSup_points = apoC.contourPoints(contourSup, offSetX = locSup[0], offSetY = 0, overlay = visu[locSup[0]:locSup[1],:])
                     cv2.imshow('Upper aponeurosis contour', visu)
                     valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? If no, linear approximation will be used in the rest of the process. After clicking yes or no, please close the image windows to continue.', default = 'no', icon='question')
                     cv2.waitKey(0) & 0xFF
@@ -221,9 +225,8 @@ def simpleprocessing(path_to_img):
             #use linear approximation because it means active contour model failed again
             type_approx_LA = 'linear'
         if np.min(contourInf)<=0: #ask for validation of the contour
-            contourInf_image, contourInf_Points = apoC.extractContour(contourInf, InfApo, offSetX = locInf[0], offSetY = 0)
             visu = np.copy(USimage)
-            visu[locInf[0]:locInf[1],:] = contourInf_image
+            contourInf_Points = apoC.contourPoints(contourInf, offSetX = locInf[0], offSetY = 0, overlay = visu[locInf[0]:locInf[1],:])
             cv2.imshow('Lower aponeurosis contour', visu)
             valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? If no, linear approximation will be used in the rest of the process. After clicking yes or no, please close the image windows to continue.', default = 'no', icon='question')
             cv2.waitKey(0) & 0xFF
@@ -233,9 +236,8 @@ def simpleprocessing(path_to_img):
                 contourInf, nInf = apoC.activeContour(InfApo_pp, ini_InfApo, 0.3,0.01,0.02,3.0, 1.0, 1.0, 65.025, 0.10)
                 print('Lower aponeurosis contour found in ', nInf, ' steps')
                 if np.min(contourInf)<=0:
-                    contourInf_image, contourInf_Points = apoC.extractContour(contourInf, InfApo, offSetX = locInf[0], offSetY = 0)
                     visu = np.copy(USimage)
-                    visu[locInf[0]:locInf[1],:] = contourInf_image
+                    contourInf_Points = apoC.contourPoints(contourInf, offSetX = locInf[0], offSetY = 0, overlay = visu[locInf[0]:locInf[1],:])
                     cv2.imshow('Lower aponeurosis contour', visu)
                     valid = tkbox.askyesno('Need user validation', 'Do you validate the contour? If no, linear approximation will be used in the rest of the process. After clicking yes or no, please close the image windows to continue.', default = 'no', icon='question')
                     cv2.waitKey(0) & 0xFF
@@ -287,7 +289,8 @@ def simpleprocessing(path_to_img):
         #let's consider that fascicle diameter is between 0.3 mm and 0.5 mm,
         #the following list is the equivalent interval in pixels, with a step of 0.5 pixel
         sca = np.arange(round(0.3/calibX), round(0.5/calibX), 0.5)
-        MVEF_image = FaDe.MVEF_2D(255-ROI, sca, [0.5, 0])
+        #by tiles, on a thread pool (same output as on the whole ROI)
+        MVEF_image = FaDe.MVEF_2D(255-ROI, sca, [0.5, 0], tile = 256)
         cv2.imwrite(path_to_img[:-8]+'_MVEF.jpg', MVEF_image)
 
         #threshold to binarize filtered image
@@ -0,0 +1,304 @@
+"""Benchmarks of the processing steps on the sample images of SAMAE.data"""
+
+def _bands(height = 60):
+    """Returns a list of (name, band) where band is a horizontal band of
+    a sample image, of height 'height' rows, converted to grayscale. These
+    bands have the size of the sub-images given to the active contour model
+    in autoS and autoP.
+    """
+    import cv2
+    import SAMAE.data as dt
+
+    bands = []
+    for name, load in [('skmuscle', dt.skmuscimg), ('simple_echo', dt.simpleimg),\
+                       ('panoramic_echo', dt.panoimg)]:
+        I = load()
+        if len(I.shape) > 2:
+            I = cv2.cvtColor(I, cv2.COLOR_RGB2GRAY)
+        mid = int(I.shape[0]/2)
+        bands.append((name, I[mid - int(height/2):mid + int(height/2), :]))
+    return bands
+
+
+def benchInitiateContour(height = 60):
+    """Compares the computational time of apoCont.initiateContour with
+    method = 'loop' and method = 'vectorized', on bands of the sample images,
+    for the three types of initial contours.
+
+    Args:
+        height (int): number of rows of the bands
+
+    Returns:
+        list of tuples (image name, typeC, time loop (s), time vectorized (s),
+        maximum absolute difference between both outputs)
+    """
+    import time
+    import numpy as np
+    import SAMAE.apoCont as apoC
+
+    results = []
+    for name, band in _bands(height):
+        setPoints = np.array([[0, 0], [int(band.shape[0]/2), 0],\
+                              [int(band.shape[0]/2), band.shape[1]], [0, band.shape[1]]])
+        inputs = [('circle', {'setPoints': [[int(band.shape[0]/2), int(band.shape[1]/2)]]}),\
+                  ('set_of_points', {'setPoints': setPoints}),\
+                  ('quadrangle_param', {'param': [0.05, band.shape[0]/3, 10]})]
+        for typeC, kwargs in inputs:
+            t0 = time.perf_counter()
+            C_loop = apoC.initiateContour(band, typeC, method = 'loop', **kwargs)
+            t1 = time.perf_counter()
+            C_vect = apoC.initiateContour(band, typeC, method = 'vectorized', **kwargs)
+            t2 = time.perf_counter()
+            diff = np.max(np.abs(C_loop - C_vect))
+            results.append((name, typeC, t1 - t0, t2 - t1, diff))
+            print(name, band.shape, typeC, ': loop', round(t1 - t0, 4), 's, vectorized',\
+                  round(t2 - t1, 4), 's, max difference', diff)
+    return results
+
+
+def benchActiveContour(nSteps = 50, height = 60):
+    """Compares the computational time per step and the peak memory allocated
+    during a step of the active contour model, for LGIFSolver (float64)
+    and LGIFInPlaceSolver with float64 and float32 buffers, on bands of
+    the sample images.
+
+    Args:
+        nSteps (int): number of steps of the recurrence
+        height (int): number of rows of the bands
+
+    Returns:
+        list of tuples (image name, solver, time per step (s),
+        peak memory allocated during a step (bytes))
+    """
+    import time
+    import tracemalloc
+    import numpy as np
+    import SAMAE.apoCont as apoC
+
+    results = []
+    for name, band in _bands(height):
+        ini = apoC.initiateContour(band, 'quadrangle_param', param = [0.05, band.shape[0]/3, 10])
+        solvers = [('LGIFSolver', apoC.LGIFSolver(band, 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10)),\
+                   ('LGIFInPlaceSolver float64', apoC.LGIFInPlaceSolver(band, 3.0, 0.01, 0.02, 1.0,\
+                                                    1.0, 65.025, 0.10, dtype = np.float64)),\
+                   ('LGIFInPlaceSolver float32', apoC.LGIFInPlaceSolver(band, 3.0, 0.01, 0.02, 1.0,\
+                                                    1.0, 65.025, 0.10, dtype = np.float32))]
+        for solverName, solver in solvers:
+            phi = np.array(ini, dtype = getattr(solver, 'dtype', np.float64))
+            t0 = time.perf_counter()
+            for n in range(nSteps):
+                phi, stop_criterion = solver.step(phi)
+            t1 = time.perf_counter()
+            #memory allocated by one step, buffers excluded
+            tracemalloc.start()
+            phi, stop_criterion = solver.step(phi)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append((name, solverName, (t1 - t0)/nSteps, peak))
+            print(name, band.shape, solverName, ':', round((t1 - t0)/nSteps*1000, 3),\
+                  'ms per step, peak memory', round(peak/1024), 'kB')
+    return results
+
+
+
+def benchWarmStart():
+    """Compares the number of steps of the active contour model started
+    from an initial quadrangle (cold start) and from a previous level set
+    (warm start), on the aponeuroses of the simple sample images, located
+    as in autoS.simpleprocessing:
+    - right half of an aponeurosis sub-image, initiated from the contour
+    of the left half (apoCont.extendContour) or from a quadrangle of width 10
+    around the linear approximation,
+    - second evolution on the whole sub-image, initiated from the first
+    contour widened by 5 pixels (apoCont.widenContour) or from a
+    quadrangle of width 40.
+
+    Returns:
+        list of tuples (image name, aponeurosis, case, steps cold start,
+        steps warm start, fraction of pixels on the same side of both contours)
+    """
+    import numpy as np
+    import SAMAE.apoCont as apoC
+    import SAMAE.apoLoc as apoL
+    import SAMAE.data as dt
+    from SAMAE.preprocessing.preprocess import preprocessingApo
+
+    def evolve(I, ini):
+        solver = apoC.LGIFSolver(I, 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10)
+        return solver.run(ini, 0.5, verbose = False)
+
+    results = []
+    for name, load in [('skmuscle', dt.skmuscimg), ('simple_echo', dt.simpleimg)]:
+        I_pp = np.float64(preprocessingApo(I = load(), typeI = 'simple', mode = 'localmean',\
+                                           margin = 0, sizeContrast = 41))
+        paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(I_pp, angle1 = 80, angle2 = 100,\
+                                                                 thresh = None, calibV = 0.1)
+        if paramSup[0] == 'error':
+            continue
+        for apo, (a, b), loc in [('upper', paramSup, locSup), ('lower', paramInf, locInf)]:
+            band = I_pp[loc[0]:loc[1], :]
+            mid = int(band.shape[1]/2)
+            left, right = band[:, :mid], band[:, mid:]
+            phiLeft, n = evolve(left, apoC.initiateContour(left, 'quadrangle_param', param = [a, b - loc[0], 10]))
+            phiCold, nCold = evolve(right, apoC.initiateContour(right, 'quadrangle_param',\
+                                                               param = [a, b - loc[0] + a*mid, 10]))
+            cases = [('next band', phiCold, nCold, right, apoC.extendContour(phiLeft, right.shape))]
+
+            phi, n = evolve(band, apoC.initiateContour(band, 'quadrangle_param', param = [a, b - loc[0], 10]))
+            phiCold, nCold = evolve(band, apoC.initiateContour(band, 'quadrangle_param', param = [a, b - loc[0], 40]))
+            cases.append(('retry', phiCold, nCold, band, apoC.widenContour(phi, 5)))
+
+            for case, phiCold, nCold, I, ini in cases:
+                if ini is None:
+                    print(name, apo, case, ': no contour to start from')
+                    continue
+                phiWarm, nWarm = evolve(I, ini)
+                agree = np.mean((phiCold < 0) == (phiWarm < 0))
+                results.append((name, apo, case, nCold, nWarm, agree))
+                print(name, apo, case, ': cold start', nCold, 'steps, warm start', nWarm,\
+                      'steps, same side of the contours', round(agree, 4))
+    return results
+
+
+def benchFusedKernel(nSteps = 50, height = 60):
+    """Compares the computational time per step of LGIFSolver with the
+    NumPy dirac/curvature/update stage and with the Numba-compiled fused
+    kernel apoCont._fusedStep, on bands of the sample images. The kernel is
+    compiled before the timing.
+
+    Args:
+        nSteps (int): number of steps of the recurrence
+        height (int): number of rows of the bands
+
+    Returns:
+        list of tuples (image name, time per step NumPy (s), time per
+        step Numba (s), maximum absolute difference between both level sets
+        after one step). Empty list if Numba is not installed.
+    """
+    import time
+    import numpy as np
+    import SAMAE.apoCont as apoC
+
+    if apoC._fusedKernel() is None:
+        print('Numba is not installed')
+        return []
+
+    results = []
+    for name, band in _bands(height):
+        ini = apoC.initiateContour(band, 'quadrangle_param', param = [0.05, band.shape[0]/3, 10])
+        times = []
+        for jit in [False, True]:
+            solver = apoC.LGIFSolver(band, 3.0, 0.01, 0.02, 1.0, 1.0, 65.025, 0.10, jit = jit)
+            first, stop_criterion = solver.step(ini)
+            phi = ini
+            t0 = time.perf_counter()
+            for n in range(nSteps):
+                phi, stop_criterion = solver.step(phi)
+            times.append((time.perf_counter() - t0)/nSteps)
+            if jit:
+                diff = np.max(np.abs(first - firstNumpy))
+            firstNumpy = first
+        results.append((name, times[0], times[1], diff))
+        print(name, band.shape, ': NumPy', round(times[0]*1000, 3), 'ms per step, Numba',\
+              round(times[1]*1000, 3), 'ms per step, max difference', diff)
+    return results
+
+
+def benchMVEF(scales = (1.5, 2., 2.5)):
+    """Compares the computational time of FaDe.MVEF_2D with method = 'loop'
+    and method = 'vectorized', on the inverted sample image skmuscimg (as
+    in autoS, where the filter enhances the dark fascicles of 255-ROI).
+
+    Args:
+        scales (tuple): scales of the filter, in pixels
+
+    Returns:
+        tuple (time loop (s), time vectorized (s), maximum absolute
+        difference between both outputs)
+    """
+    import time
+    import numpy as np
+    import SAMAE.data as dt
+    import SAMAE.FaDe as FaDe
+
+    I = 255 - dt.skmuscimg()
+    #first call compiles the Numba kernel, if any
+    FaDe.MVEF_2D(I[:20, :20], list(scales), [0.5, 0])
+    t0 = time.perf_counter()
+    I_loop = FaDe.MVEF_2D(I, list(scales), [0.5, 0], method = 'loop')
+    t1 = time.perf_counter()
+    I_vect = FaDe.MVEF_2D(I, list(scales), [0.5, 0], method = 'vectorized')
+    t2 = time.perf_counter()
+    diff = np.max(np.abs(I_loop - I_vect))
+    print('skmuscle', I.shape[:2], 'scales', scales, ': loop', round(t1 - t0, 4), 's, vectorized',\
+          round(t2 - t1, 4), 's, max difference', diff)
+    return t1 - t0, t2 - t1, diff
+
+
+def benchMVEFTiled(scales = (1.5, 2., 2.5), tile = 256, workers = None):
+    """Compares the computational time of FaDe.MVEF_2D on the whole
+    inverted sample image skmuscimg and by tiles on a thread pool. The
+    speed-up depends on the number of available cores.
+
+    Args:
+        scales (tuple): scales of the filter, in pixels
+        tile (int): size of the tiles, in pixels
+        workers (int): number of threads (None: default of ThreadPoolExecutor)
+
+    Returns:
+        tuple (time whole image (s), time by tiles (s), True if both outputs
+        are identical)
+    """
+    import time
+    import numpy as np
+    import SAMAE.data as dt
+    import SAMAE.FaDe as FaDe
+
+    I = 255 - dt.skmuscimg()
+    FaDe.MVEF_2D(I[:20, :20], list(scales), [0.5, 0])
+    t0 = time.perf_counter()
+    I_whole = FaDe.MVEF_2D(I, list(scales), [0.5, 0])
+    t1 = time.perf_counter()
+    I_tiled = FaDe.MVEF_2D(I, list(scales), [0.5, 0], tile = tile, workers = workers)
+    t2 = time.perf_counter()
+    same = np.array_equal(I_whole, I_tiled)
+    print('skmuscle', I.shape[:2], 'scales', scales, 'tile', tile, ': whole', round(t1 - t0, 4),\
+          's, tiled', round(t2 - t1, 4), 's, identical', same)
+    return t1 - t0, t2 - t1, same
+
+
+def benchLocateSnippets(scales = (1.5, 2., 2.5), percent = 85):
+    """Compares the computational time of FaDe.locateSnippets with
+    method = 'loop' and method = 'vectorized', on the binarized MVEF image
+    of the inverted sample image skmuscimg (as in autoS).
+
+    Args:
+        scales (tuple): scales of the filter, in pixels
+        percent (float): percentile of the MVEF image used as threshold
+
+    Returns:
+        tuple (number of snippets, time loop (s), time vectorized (s),
+        True if both methods keep the same snippets)
+    """
+    import time
+    import cv2
+    import numpy as np
+    import SAMAE.data as dt
+    import SAMAE.FaDe as FaDe
+
+    I = FaDe.MVEF_2D(255 - dt.skmuscimg(), list(scales), [0.5, 0])
+    I = cv2.threshold(I, np.percentile(I, percent), 255, cv2.THRESH_BINARY)[1]
+    nSnippets = cv2.connectedComponents(np.uint8(I), connectivity = 8)[0] - 1
+    #cv2.fitEllipse perturbs collinear points with the random generator of OpenCV
+    cv2.setRNGSeed(0)
+    t0 = time.perf_counter()
+    S_loop = FaDe.locateSnippets(I, 0.1, 0.1, minLength = 4, method = 'loop')[0]
+    t1 = time.perf_counter()
+    cv2.setRNGSeed(0)
+    t2 = time.perf_counter()
+    S_vect = FaDe.locateSnippets(I, 0.1, 0.1, minLength = 4, method = 'vectorized')[0]
+    t3 = time.perf_counter()
+    same = len(S_loop) == len(S_vect) and all(np.array_equal(a, b) for a, b in zip(S_loop, S_vect))
+    print('skmuscle', I.shape[:2], nSnippets, 'snippets : loop', round(t1 - t0, 4), 's, vectorized',\
+          round(t3 - t2, 4), 's, identical', same)
+    return nSnippets, t1 - t0, t3 - t2, same
@@ -0,0 +1,207 @@
+"""Batched fitting and column-indexed storage of the curves (aponeuroses, fascicles) of an image"""
+
+import numpy as np
+
+def dedupeColumns(points):
+    """Sorts the points of each set of points by increasing column and
+    removes the points whose column is already taken by a previous point of
+    the same set (the first point of each column in the input order is kept).
+
+    Args:
+        points (list): list of arrays (or lists of tuples) of points
+        (row, column), of various lengths
+
+    Returns:
+        rows, columns (arrays): coordinates of the kept points of all sets,
+        concatenated
+        starts (array): index in rows and columns of the first point of each
+        set, followed by the total number of points (the points of set k are
+        rows[starts[k]:starts[k+1]])
+
+    Example:
+        > rows, columns, starts = dedupeColumns([fasc1, fasc2])
+    """
+    sets = [np.asarray(p, dtype = float).reshape(-1, 2) for p in points]
+    sizes = np.array([p.shape[0] for p in sets], dtype = int)
+    if sizes.sum() == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(len(sets) + 1, dtype = int)
+    allPoints = np.concatenate(sets)
+    group = np.repeat(np.arange(len(sets)), sizes)
+    #sort by set, then column, then input order
+    order = np.lexsort((np.arange(group.size), allPoints[:, 1], group))
+    group = group[order]
+    allPoints = allPoints[order]
+    keep = np.ones(group.size, dtype = bool)
+    keep[1:] = (group[1:] != group[:-1]) | (allPoints[1:, 1] != allPoints[:-1, 1])
+    counts = np.bincount(group[keep], minlength = len(sets))
+    starts = np.concatenate([[0], np.cumsum(counts)])
+    return allPoints[keep, 0], allPoints[keep, 1], starts
+
+def fitPolynomials(points, d):
+    """Fits a polynomial of degree d (row as a function of column) to each
+    set of points, as numpy.polyfit does after dedupeColumns, but with one
+    least-squares resolution for all sets.
+
+    Args:
+        points (list): list of arrays (or lists of tuples) of points
+        (row, column), of various lengths
+        d (int): degree of the polynomials
+
+    Returns:
+        CurveBank of the fitted polynomials
+
+    Raises:
+        ValueError: if a set has no point (numpy.polyfit raises as well)
+
+    Example:
+        > bank = fitPolynomials(averages, d = 2)
+        > rows = bank(np.arange(0, 1000))
+    """
+    rows, columns, starts = dedupeColumns(points)
+    counts = np.diff(starts)
+    nCurves = counts.size
+    if nCurves == 0:
+        return CurveBank(np.zeros((0, d + 1)))
+    if np.any(counts == 0):
+        raise ValueError('Set of points ' + str(int(np.argmin(counts))) + ' is empty, no polynomial can be fitted.')
+    #padded Vandermonde matrices: the added null rows do not change the solution
+    nMax = max(int(counts.max()), 1)
+    group = np.repeat(np.arange(nCurves), counts)
+    position = np.arange(rows.size) - starts[group]
+    A = np.zeros((nCurves, nMax, d + 1))
+    y = np.zeros((nCurves, nMax, 1))
+    A[group, position, :] = columns[:, None] ** np.arange(d, -1, -1)
+    y[group, position, 0] = rows
+    #same column scaling and relative condition number as numpy.polyfit
+    scale = np.sqrt(np.sum(A * A, axis = 1))
+    scale[scale == 0] = 1.
+    rcond = counts * np.finfo(float).eps
+    coefficients = np.matmul(np.linalg.pinv(A / scale[:, None, :], rcond = rcond), y)[:, :, 0] / scale
+    return CurveBank(coefficients)
+
+class CurveBank(object):
+    """Polynomials stored as the rows of one array of coefficients, highest
+    degree first (same order as numpy.poly1d), evaluated all at once on a
+    grid of columns.
+
+    Attributes:
+        coefficients (array): array of size (number of curves, degree + 1)
+
+    Example:
+        > bank = fitPolynomials(averages, d = 2) + fitPolynomials(averages2, d = 1)
+        > rows = bank(np.arange(0, 1000))   #size (len(bank), 1000)
+        > fasc = bank[0]                    #numpy.poly1d
+    """
+
+    def __init__(self, coefficients):
+        self.coefficients = np.atleast_2d(np.asarray(coefficients, dtype = float))
+
+    def __len__(self):
+        return self.coefficients.shape[0]
+
+    def __getitem__(self, k):
+        return np.poly1d(self.coefficients[k])
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __add__(self, other):
+        """Concatenation of two banks, of possibly different degrees."""
+        degree = max(self.coefficients.shape[1], other.coefficients.shape[1])
+        pad = lambda c: np.pad(c, ((0, 0), (degree - c.shape[1], 0)))
+        return CurveBank(np.concatenate([pad(self.coefficients), pad(other.coefficients)]))
+
+    def __call__(self, columns):
+        """Evaluates all curves at columns (Horner scheme).
+
+        Returns:
+            array of size (number of curves, number of columns)
+        """
+        columns = np.asarray(columns, dtype = float)
+        values = np.zeros((len(self), columns.size))
+        for c in self.coefficients.T:
+            values = values * columns.ravel() + c[:, None]
+        return values
+
+class ColumnCurve(object):
+    """Curve with at most one row per column (aponeurosis), stored as a
+    dense array of rows indexed by column, from column start, and a mask of
+    the columns where the curve is defined. Rows are looked up in O(1).
+
+    Attributes:
+        start (int): first column of the array rows
+        rows (array of floats): rows[k] is the row of the curve at column start + k
+        valid (array of bools): valid[k] is True if the curve is defined at column start + k
+
+    Example:
+        > curve = ColumnCurve.fromPoints(coordSup)
+        > rows = curve.at(np.arange(mini, maxi + 1))   #nan where not defined
+    """
+
+    def __init__(self, rows, start = 0, valid = None):
+        self.rows = np.asarray(rows, dtype = float)
+        self.start = int(start)
+        self.valid = np.ones(self.rows.size, dtype = bool) if valid is None else np.asarray(valid, dtype = bool)
+
+    @classmethod
+    def fromPoints(cls, points, keep = 'first'):
+        """Creates the curve of an array of points (row, column). The columns
+        are truncated to integers.
+
+        Args:
+            points (array): array of size (n, 2) of points (row, column)
+            keep (string): row kept when several points have the same column:
+            'first' or 'last' point in the array, or 'mean' of their rows
+        """
+        if keep not in ['first', 'last', 'mean']:
+            raise ValueError("keep must be 'first', 'last' or 'mean'.")
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        if points.shape[0] == 0:
+            return cls(np.zeros(0))
+        columns = np.int64(points[:, 1])
+        start = np.amin(columns)
+        index = columns - start
+        count = np.bincount(index)
+        if keep == 'mean':
+            rows = np.bincount(index, weights = points[:, 0]) / np.maximum(count, 1)
+        else:
+            rows = np.zeros(count.size)
+            if keep == 'first':
+                kept = np.unique(index, return_index = True)[1]
+            elif keep == 'last':
+                kept = index.size - 1 - np.unique(index[::-1], return_index = True)[1]
+            rows[index[kept]] = points[kept, 0]
+        return cls(rows, start, count > 0)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.valid))
+
+    @property
+    def columns(self):
+        """Columns where the curve is defined."""
+        return self.start + np.flatnonzero(self.valid)
+
+    def at(self, columns):
+        """Rows of the curve at columns (nan where the curve is not defined)."""
+        scalar = np.ndim(columns) == 0
+        index = np.int64(np.atleast_1d(columns)) - self.start
+        inside = (index >= 0) & (index < self.rows.size)
+        rows = np.full(index.shape, np.nan)
+        defined = inside.copy()
+        defined[inside] = self.valid[index[inside]]
+        rows[defined] = self.rows[index[defined]]
+        return float(rows[0]) if scalar else rows
+
+    def interpolate(self, columns):
+        """Rows of the curve at columns, linearly interpolated in between the
+        columns where the curve is defined."""
+        return np.interp(columns, self.columns, self.rows[self.valid])
+
+    def toPoints(self, columns = None):
+        """Array of size (n, 2) of points (row, column), at the columns where
+        the curve is defined, or at columns (nan rows where not defined)."""
+        if columns is None:
+            columns = self.columns
+        columns = np.asarray(columns)
+        return np.stack([self.at(columns), columns], axis = 1)
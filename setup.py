@@ -16,6 +16,9 @@ setup_requirements = [ ]
 
 test_requirements = [ ]
 
+#optional: compiled kernels of FaDe (exponential of MVEF_2D) and apoCont (jit = True)
+extras_requirements = {'jit': ['numba']}
+
 setup(
     author="Lisa PAILLARD",
     author_email='lisapaillardfr86@gmail.com',
@@ -38,6 +41,7 @@ setup(
         ],
     },
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.FaDe`."""
+
+
+import importlib.util
+import unittest
+
+import numpy as np
+
+import SAMAE.data as dt
+import SAMAE.FaDe as FaDe
+
+
+class TestMVEF(unittest.TestCase):
+    """Compares the vectorized vesselness filter with the pixel loop."""
+
+    @unittest.skipUnless(importlib.util.find_spec('numba'), 'identical to the loop with Numba only')
+    def test_MVEF_2D(self):
+        I = 255 - dt.skmuscimg()[200:260, 100:200]
+        for thresholds in [[0.5, 0], [0.5, 10.]]:
+            ref = FaDe.MVEF_2D(I, [1.5, 2.5], thresholds, method = 'loop')
+            res = FaDe.MVEF_2D(I, [1.5, 2.5], thresholds)
+            np.testing.assert_array_equal(res, ref)
+
+    def test_numpyExp(self):
+        #without Numba, _exp is np.exp: same output up to rounding errors
+        I = 255 - dt.skmuscimg()[200:260, 100:200]
+        ref = FaDe.MVEF_2D(I, [1.5, 2.5], [0.5, 0], method = 'loop')
+        FaDe._exp(np.zeros(1))
+        saved = FaDe._kernels['exp']
+        FaDe._kernels['exp'] = None
+        try:
+            res = FaDe.MVEF_2D(I, [1.5, 2.5], [0.5, 0])
+        finally:
+            FaDe._kernels['exp'] = saved
+        np.testing.assert_allclose(res, ref, rtol = 0, atol = 1e-12)
+
+    @unittest.skipUnless(importlib.util.find_spec('numba'), 'identical to the loop with Numba only')
+    def test_argmax(self):
+        I = 255 - dt.skmuscimg()[200:260, 100:200]
+        ref, refScale = FaDe.MVEF_2D(I, [2., 1.5, 3.], [0.5, 0], method = 'loop', argmax = True)
+        res, resScale = FaDe.MVEF_2D(I, [2., 1.5, 3.], [0.5, 0], argmax = True)
+        np.testing.assert_array_equal(res, ref)
+        np.testing.assert_array_equal(resScale, refScale)
+
+    def test_tiled(self):
+        I = 255 - dt.skmuscimg()[150:297, 80:283]
+        for thresholds in [[0.5, 0], [0.5, 10.]]:
+            ref, refScale = FaDe.MVEF_2D(I, [1.5, 3.], thresholds, argmax = True)
+            res, resScale = FaDe.MVEF_2D(I, [1.5, 3.], thresholds, argmax = True, tile = 40, workers = 3)
+            np.testing.assert_array_equal(res, ref)
+            np.testing.assert_array_equal(resScale, refScale)
+
+
+class TestHessianBank(unittest.TestCase):
+    """Compares the Hessian matrices of the filter bank with skimage."""
+
+    def test_hessian(self):
+        from skimage.feature import hessian_matrix
+
+        I = 255 - dt.skmuscimg()[200:300, 100:250, 0]
+        bank = FaDe.HessianBank(maxEntries = 2, fftSize = 21)
+        for sigma in [1.5, 2.5, 4., 1.5]:
+            ref = hessian_matrix(I, sigma = sigma, order = 'rc', use_gaussian_derivatives = False)
+            for H, H_ref in zip(bank.hessian(I, sigma), ref):
+                np.testing.assert_allclose(H, H_ref, atol = 1e-12)
+        self.assertEqual(bank.report(), {'hits': 0, 'misses': 4, 'entries': 2})
+
+
+class TestSnippets(unittest.TestCase):
+    """Compares the snippets located with array operations on the contours
+    with the snippets located by the loop of the first version.
+    cv2.fitEllipse perturbs collinear points with the random generator of
+    OpenCV, which is seeded before each call to get reproducible features."""
+
+    def locate(self, *args, **kwargs):
+        import cv2
+
+        cv2.setRNGSeed(0)
+        return FaDe.locateSnippets(*args, **kwargs)
+
+    def assertSameSnippets(self, res, ref):
+        self.assertEqual(len(res[0]), len(ref[0]))
+        for fasc, fascRef in zip(res[0], ref[0]):
+            np.testing.assert_array_equal(fasc, fascRef)
+        self.assertEqual(len(res[1]), len(ref[1]))
+        for line, lineRef in zip(res[1], ref[1]):
+            self.assertEqual(line[0], lineRef[0])
+            self.assertEqual([int(x) for x in line[1]], [int(x) for x in lineRef[1]])
+
+    def test_synthetic(self):
+        import cv2
+
+        #3 straight snippets, small blobs (so that the lines are outliers),
+        #and an isolated pixel
+        I = np.zeros((120, 200), dtype = np.uint8)
+        cv2.line(I, (10, 20), (90, 20), 255, 3)
+        cv2.line(I, (20, 100), (100, 60), 255, 3)
+        cv2.line(I, (120, 50), (190, 85), 255, 3)
+        for k in range(12):
+            cv2.line(I, (8 + 16*k, 110), (10 + 16*k + k % 4, 112 - k % 3), 255, 1)
+        I[5, 170] = 255
+        contours = cv2.findContours(I, mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_NONE)[0]
+        #as if I was a sub-image starting at row 7 and column 11
+        ref = self.locate(I, 0.5, 0.5, minLength = 4, offSetX = 7, offSetY = 11, method = 'loop')
+        res = self.locate(I, 0.5, 0.5, minLength = 4, offSetX = 7, offSetY = 11)
+        self.assertSameSnippets(res, ref)
+        #the 3 lines are kept
+        for c in contours:
+            if c.shape[0] > 100:
+                self.assertTrue(any(np.array_equal(fasc, c[:, 0, ::-1] + [7, 11]) for fasc in res[0]))
+        for method in ['loop', 'vectorized']:
+            self.assertEqual(FaDe.locateSnippets(np.zeros((10, 10)), 0.5, 0.5, 4, method = method), ('error', 'error'))
+
+    def test_MVEF(self):
+        import cv2
+
+        #binarized MVEF image of the sample image, as in autoS
+        MVEF = FaDe.MVEF_2D(255 - dt.skmuscimg()[:300, :400], [1.5, 2., 2.5], [0.5, 0])
+        for percent in [80, 85, 92]:
+            I = cv2.threshold(MVEF, np.percentile(MVEF, percent), 255, cv2.THRESH_BINARY)[1]
+            ref = self.locate(I, 0.1, 0.1, minLength = 4, offSetX = 30, method = 'loop')
+            res = self.locate(I, 0.1, 0.1, minLength = 4, offSetX = 30)
+            self.assertGreater(len(res[0]), 0)
+            self.assertSameSnippets(res, ref)
+
+
+class TestApproximateFasc(unittest.TestCase):
+    """Compares the fitting of all fascicles at once with the fitting of
+    each fascicle by numpy.polyfit (or scipy UnivariateSpline), after
+    sorting its points by column and removing the repeated columns."""
+
+    def setUp(self):
+        """Noisy lines and parabolas, with repeated columns, as lists of
+        tuples and as arrays (format of contourAverage)"""
+        rng = np.random.default_rng(1)
+        self.listF = []
+        for n in [12, 30, 7, 50]:
+            columns = rng.integers(0, 200, n)
+            rows = 0.001*columns**2 + 0.3*columns + 40 + rng.normal(0, 1, n)
+            self.listF.append([(r, c) for r, c in zip(rows, columns)])
+        self.listF.append(np.uint64([[10, 4], [12, 9], [11, 4], [15, 14], [17, 20]]))
+
+    def reference(self, f):
+        """Rows and columns of fascicle f, sorted by column, first point of
+        each column"""
+        f = sorted(list(f), key = lambda x: x[1])
+        fa = [f[0]] + [f[k] for k in range(1, len(f)) if f[k][1] != f[k-1][1]]
+        return [p[1] for p in fa], [p[0] for p in fa]
+
+    def test_polyfit(self):
+        columns = np.arange(0, 200)
+        for d in [1, 2]:
+            splines = FaDe.approximateFasc('polyfit', self.listF, d)
+            self.assertEqual(len(splines), len(self.listF))
+            for spline, f in zip(splines, self.listF):
+                ref = np.poly1d(np.polyfit(*self.reference(f), deg = d))
+                np.testing.assert_allclose(spline(columns), ref(columns), atol = 1e-6)
+        with self.assertRaises(ValueError):
+            FaDe.approximateFasc('polyfit', self.listF + [[]], 2)
+
+    def test_Bspline(self):
+        import scipy.interpolate as interpolate
+
+        columns = np.arange(0, 200)
+        splines = FaDe.approximateFasc('Bspline', self.listF, 2)
+        for spline, f in zip(splines, self.listF):
+            ref = interpolate.UnivariateSpline(*self.reference(f), k = 2, ext = 0)
+            np.testing.assert_allclose(spline(columns), ref(columns))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.MUFeaM`."""
+
+
+import unittest
+
+import numpy as np
+
+import SAMAE.MUFeaM as MUFeaM
+from SAMAE.curveFit import ColumnCurve
+
+
+def referenceThickness(start, end, calibV, calibH, points1, points2):
+    """Per-column search of the first versions of muscleThickness"""
+    mt = []
+    absc = []
+    for col in range(start, end + 1):
+        search1 = [pt for pt in points1 if pt[1] == col]
+        search2 = [pt for pt in points2 if pt[1] == col]
+        if search1 and search2:
+            mt.append(abs(search1[0][0] - search2[0][0])*calibV)
+            absc.append(col*calibH)
+    return absc, mt
+
+
+class TestMuscleThickness(unittest.TestCase):
+    """Compares muscleThickness with the per-column search of the first
+    versions, on aponeuroses with unsorted points, repeated columns and
+    missing columns."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        columns = rng.permutation(np.repeat(np.arange(0, 300), 2))[:450]
+        self.points1 = np.stack([np.int32(20 + 0.05*columns + rng.integers(0, 3, columns.size)), columns], axis = 1)
+        columns = rng.integers(10, 280, 400)
+        self.points2 = np.stack([np.int32(200 - 0.1*columns + rng.integers(0, 3, columns.size)), columns], axis = 1)
+
+    def test_points(self):
+        for start, end in [(0, 299), (15, 250)]:
+            ref = referenceThickness(start, end, 0.1, 0.2, self.points1, self.points2)
+            absc, mt, spl = MUFeaM.muscleThickness(start, end, 0.1, 0.2, points1 = self.points1, points2 = self.points2)
+            np.testing.assert_allclose(absc, ref[0])
+            np.testing.assert_allclose(mt, ref[1])
+            self.assertEqual(len(absc), len(mt))
+        #same output from column-indexed curves
+        curves = MUFeaM.muscleThickness(15, 250, 0.1, 0.2, points1 = ColumnCurve.fromPoints(self.points1),\
+                                        points2 = ColumnCurve.fromPoints(self.points2))
+        np.testing.assert_allclose(curves[0], absc)
+        np.testing.assert_allclose(curves[1], mt)
+
+    def test_splines(self):
+        import scipy.interpolate as interpolate
+
+        y = np.arange(0, 300)
+        spl1 = interpolate.UnivariateSpline(y, 20 + 0.05*y, k = 1, ext = 0)
+        spl2 = interpolate.UnivariateSpline(y, 200 - 0.1*y, k = 1, ext = 0)
+        points1 = MUFeaM.pointsCoordinates('spline', spl1, [0, 299])[0]
+        points2 = MUFeaM.pointsCoordinates('spline', spl2, [0, 299])[0]
+        ref = referenceThickness(0, 299, 0.1, 0.2, points1, points2)
+        absc, mt, spl = MUFeaM.muscleThickness(0, 299, 0.1, 0.2, spl1 = spl1, spl2 = spl2)
+        np.testing.assert_allclose(absc, ref[0])
+        np.testing.assert_allclose(mt, ref[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
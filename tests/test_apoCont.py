@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.apoCont`."""
+
+
+import math
+import unittest
+
+import cv2
+import numpy as np
+
+import SAMAE.data as dt
+import SAMAE.apoLoc as apoL
+import SAMAE.apoCont as apoC
+from SAMAE.preprocessing.preprocess import preprocessingApo
+
+#parameters of the active contour in autoS and autoP
+PARAM = (0.01, 0.02, 3.0, 1.0, 1.0, 65.025, 0.10)
+
+
+def referenceContour(I, contourIni, thresh, l1, l2, s, eps, mu, nu, dt, maxIter = 10000):
+    """Recurrence of the first version of activeContour, built from the
+    function intensities."""
+    phi = np.float64(contourIni)
+    w = 0.01
+    step = 1
+    stop_criterion = thresh + 1.
+    while stop_criterion > thresh and step <= maxIter:
+        c1, c2, f1, f2, LIF, GIF = apoC.intensities(I, phi, eps, s, l1, l2)
+        dirac = eps/(math.pi*(eps*eps+phi*phi))
+        grad = np.gradient(phi)
+        normgrad = np.sqrt(grad[0]*grad[0] + grad[1]*grad[1])
+        normgrad = normgrad + (normgrad == 0)*1.
+        div = np.gradient(grad[0]/normgrad, axis = 0) + np.gradient(grad[1]/normgrad, axis = 1)
+        lap = cv2.Laplacian(phi, cv2.CV_64F)
+        dPhi = dirac * ((1-w)*GIF + w*LIF) + nu * dirac * div + mu * (lap - div)
+        phi = phi + dt * dPhi
+        stop_criterion = np.max(abs(dPhi * dt))
+        step = step+1
+    return phi, step-1
+
+
+class TestActiveContour(unittest.TestCase):
+    """Compares the solvers of the active contour with the recurrence of
+    the first version of activeContour, on the bands of the upper and
+    lower aponeuroses of the sample image skmuscimg, as in autoS."""
+
+    def setUp(self):
+        I = preprocessingApo(I = dt.skmuscimg(), typeI = 'simple', mode = 'localmean',\
+                             margin = 0, sizeContrast = 41)
+        paramSup, paramInf, locSup, locInf = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101)
+        self.bands = []
+        self.inis = []
+        for (a, b), loc in [(paramSup, locSup), (paramInf, locInf)]:
+            band = np.float64(I[loc[0]:loc[0] + 60, :200])
+            self.bands.append(band)
+            self.inis.append(apoC.initiateContour(band, 'quadrangle_param', param = [a, b - loc[0], 10]))
+
+    def assertSameContour(self, phi, ref, agreement = 1.):
+        """Same size, and at least the proportion agreement of the pixels on
+        the same side of the contour"""
+        self.assertEqual(phi.shape, ref.shape)
+        self.assertGreaterEqual(np.mean((phi < 0) == (ref < 0)), agreement)
+
+    def test_step(self):
+        for band, ini in zip(self.bands, self.inis):
+            solver = apoC.LGIFSolver(band, PARAM[2], PARAM[0], PARAM[1], *PARAM[3:])
+            phi = ini
+            ref = ini
+            for k in range(10):
+                phi, residual = solver.step(phi)
+                ref, n = referenceContour(band, ref, 0., *PARAM, maxIter = 1)
+                np.testing.assert_allclose(phi, ref, atol = 1e-9)
+
+    def test_activeContour(self):
+        for band, ini in zip(self.bands, self.inis):
+            ref, nRef = referenceContour(band, ini, 0.5, *PARAM)
+            phi, n, record = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)
+            self.assertEqual(n, nRef)
+            self.assertEqual(record['stop'], 'thresh')
+            np.testing.assert_allclose(phi, ref, atol = 1e-8)
+
+    def test_batch(self):
+        phis, steps = apoC.activeContourBatch(self.bands, self.inis, 0.5, *PARAM)
+        self.assertEqual(phis.shape, (2,) + self.bands[0].shape)
+        for band, ini, phi, n in zip(self.bands, self.inis, phis, steps):
+            ref, nRef = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)[:2]
+            self.assertEqual(n, nRef)
+            np.testing.assert_allclose(phi, ref, atol = 1e-8)
+
+    def test_narrowBand(self):
+        for band, ini in zip(self.bands, self.inis):
+            ref = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)[0]
+            phi, n, record = apoC.activeContour(band, ini, 0.5, *PARAM, narrow_band = 6, record = True)
+            self.assertSameContour(phi, ref, 0.998)
+            self.assertEqual(record['steps'], n)
+
+    def test_dtype(self):
+        for band, ini in zip(self.bands, self.inis):
+            ref, nRef = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)[:2]
+            phi, n = apoC.activeContour(band, ini, 0.5, *PARAM, dtype = np.float64, record = True)[:2]
+            self.assertEqual(n, nRef)
+            np.testing.assert_allclose(phi, ref, atol = 1e-8)
+            phi, n = apoC.activeContour(band, ini, 0.5, *PARAM, dtype = np.float32, record = True)[:2]
+            self.assertEqual(phi.dtype, np.float32)
+            self.assertLessEqual(abs(n - nRef), 2)
+            self.assertSameContour(phi, ref, 0.998)
+
+    def test_inPlaceRun(self):
+        solver = apoC.LGIFInPlaceSolver(self.bands[0], PARAM[2], PARAM[0], PARAM[1], *PARAM[3:])
+        phi, n = solver.run(self.inis[0], 0.5, verbose = False)
+        saved = np.copy(phi)
+        solver.run(self.inis[0], 0.5, maxIter = 3, verbose = False)
+        #the result of a run is not overwritten by the next one
+        np.testing.assert_array_equal(phi, saved)
+        self.assertFalse(np.shares_memory(phi, solver.buffers['phi']))
+
+    def test_jit(self):
+        for band, ini in zip(self.bands, self.inis):
+            ref, nRef = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)[:2]
+            phi, n = apoC.activeContour(band, ini, 0.5, *PARAM, jit = True, record = True)[:2]
+            self.assertEqual(n, nRef)
+            np.testing.assert_allclose(phi, ref, atol = 1e-8)
+
+    def test_morph(self):
+        for band, ini in zip(self.bands, self.inis):
+            phi, n, record = apoC.activeContour(band, ini, 0.5, *PARAM, backend = 'morph', record = True)
+            self.assertEqual(phi.shape, band.shape)
+            self.assertEqual(set(np.unique(phi)), {-1., 1.})
+            self.assertEqual(record['steps'], n)
+            overlay, points = apoC.extractContour(phi, cv2.cvtColor(np.uint8(band), cv2.COLOR_GRAY2RGB))
+            self.assertGreater(len(points), 0)
+            self.assertEqual(overlay.shape, band.shape + (3,))
+        with self.assertRaises(ValueError):
+            apoC.activeContour(band, ini, 0.5, *PARAM, backend = 'morph', narrow_band = 6)
+
+    def test_morphAgreement(self):
+        #on these bands of almost constant intensity, the global fitting of
+        #the morphological backend finds the same contour as LGIF
+        for band, ini in zip(self.bands, self.inis):
+            ref = apoC.activeContour(band, ini, 0.5, *PARAM, record = True)[0]
+            for smoothing in [1, 3]:
+                phi = apoC.activeContour(band, ini, 0.5, *PARAM, backend = 'morph', record = True,\
+                                         smoothing = smoothing)[0]
+                self.assertSameContour(phi, ref, 0.99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.apoLoc`."""
+
+
+import unittest
+
+import cv2
+import numpy as np
+
+import SAMAE.data as dt
+import SAMAE.apoLoc as apoL
+from SAMAE.preprocessing.preprocess import preprocessingApo
+
+
+def referenceSelection(R, calibV, mode):
+    """Contour of the region selected by the first versions of the location
+    functions, from cv2.findContours: mode is 'top' (deep aponeurosis in
+    _twoApoPeaks), 'inf' (superficial aponeurosis) or 'one'
+    (oneApoLocation). Returns None if there is no region."""
+    contours = cv2.findContours(R, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[0]
+    if len(contours) < 1:
+        return None
+    elif len(contours) == 1:
+        return contours[0]
+    contours2 = contours
+    if len(contours) > 2:
+        mean_size = sum(c.shape[0] for c in contours) / len(contours)
+        contours2 = [c for c in contours if c.shape[0] >= mean_size - 5]
+    if len(contours2) == 1:
+        return contours2[0]
+    region1 = contours2[0]
+    region2 = contours2[1]
+    if mode == 'inf':
+        for c in contours2[2:]:
+            if np.amax(region1[:,0,1]) < np.amax(region2[:,0,1]):
+                if np.amax(c[:,0,1]) > np.amax(region1[:,0,1]):
+                    region1 = c
+            if np.amax(region1[:,0,1]) >= np.amax(region2[:,0,1]):
+                if np.amax(c[:,0,1]) > np.amax(region2[:,0,1]):
+                    region2 = c
+    else:
+        for c in contours2[2:]:
+            if np.amin(region1[:,0,1]) < np.amin(region2[:,0,1]):
+                if np.amin(c[:,0,1]) < np.amin(region2[:,0,1]):
+                    region2 = c
+            if np.amin(region1[:,0,1]) >= np.amin(region2[:,0,1]):
+                if np.amin(c[:,0,1]) < np.amin(region1[:,0,1]):
+                    region1 = c
+    min1, max1 = np.amin(region1[:,0,1]), np.amax(region1[:,0,1])
+    min2, max2 = np.amin(region2[:,0,1]), np.amax(region2[:,0,1])
+    close12 = abs(min2 - max1)*calibV < 4
+    close21 = abs(min1 - max2)*calibV < 4
+    if mode == 'top':
+        if min1 < min2 and close12:
+            return region2
+        elif min2 < min1 and close21:
+            return region1
+        elif not close12 and not close21:
+            if min1 < min2:
+                return region1
+            elif min2 < min1:
+                return region2
+    elif mode == 'inf':
+        if max1 < max2 and close12:
+            return region1
+        elif max2 < max1 and close21:
+            return region2
+        elif not close12 and not close21:
+            if max1 < max2:
+                return region2
+            elif max2 < max1:
+                return region1
+    else:
+        if min1 < min2 and close12:
+            return region1
+        elif min2 < min1 and close21:
+            return region2
+        elif not close12 and not close21:
+            if min1 < min2:
+                return region2
+            elif min2 < min1:
+                return region1
+    return contours[0]
+
+
+class TestRadonLine(unittest.TestCase):
+    """Compares the lines computed from the radon transform peaks with the
+    lines computed from the inverse radon transform (backprojection), on
+    the sample images."""
+
+    def setUp(self):
+        """Pre-processes the sample images as in autoS."""
+        self.images = [preprocessingApo(I = load(), typeI = 'simple', mode = 'localmean',\
+                                        margin = 0, sizeContrast = 41)\
+                       for load in [dt.skmuscimg, dt.simpleimg, dt.panoimg]]
+
+    def assertSameLine(self, line1, line2, n):
+        """Both lines x = a*y + b are less than 3 pixels apart on [0, n]"""
+        y = np.arange(n)
+        self.assertLess(np.max(np.abs((line1[0] - line2[0])*y + line1[1] - line2[1])), 3.)
+
+    def test_twoApoLocation(self):
+        for I in self.images:
+            n = min(I.shape[:2])
+            ref = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101, backprojection = True)
+            res = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101)
+            self.assertEqual(res[2:], ref[2:])
+            self.assertSameLine(res[0], ref[0], n)
+            self.assertSameLine(res[1], ref[1], n)
+
+    def test_strip(self):
+        #the strip mode finds the aponeuroses of the square mode, which
+        #analyses the leftmost square of the image
+        for I in self.images:
+            n = min(I.shape[:2])
+            ref = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101)
+            res = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101, strip = True)
+            for k in range(2):
+                y = np.arange(n)
+                gap = (res[k][0] - ref[k][0])*y + res[k][1] - ref[k][1]
+                self.assertLess(np.max(np.abs(gap))*0.1, 4.)
+                self.assertLessEqual(abs(res[k+2][0] - ref[k+2][0]), 5)
+
+    def test_oneApoLocation(self):
+        for I in self.images:
+            n = min(I.shape[:2])
+            ref = apoL.oneApoLocation(I, calibV = 0.1, angle1 = 50, angle2 = 90, backprojection = True)
+            res = apoL.oneApoLocation(I, calibV = 0.1, angle1 = 50, angle2 = 90)
+            self.assertEqual(res[1], ref[1])
+            self.assertSameLine(res[0], ref[0], n)
+
+    def test_radonPeak(self):
+        theta = np.arange(0., 180.)
+        for column in [80, 85, 90, 97]:
+            for row in [3, 200, 400]:
+                angle, p = apoL._radonPeak(apoL._radonLine((column, row), theta, 433), 433)
+                self.assertAlmostEqual(angle, column)
+                self.assertAlmostEqual(p, row)
+
+
+class TestCandidateRegions(unittest.TestCase):
+    """Compares the regions selected from the labelled components
+    (_candidateRegions, _selectRegion) with the selection of the first
+    versions, from the contours of cv2.findContours."""
+
+    def masks(self):
+        """Segmented radon transforms of the sample images, random masks
+        (with regions touching the border) and masks with ties"""
+        masks = []
+        SE = np.uint8(np.array([[0,1,0],[1,1,1],[0,1,0]]))
+        for load in [dt.skmuscimg, dt.simpleimg, dt.panoimg]:
+            I = preprocessingApo(I = load(), typeI = 'simple', mode = 'localmean',\
+                                 margin = 0, sizeContrast = 41)
+            n = min(I.shape[:2])
+            I_radon = apoL._radonWindow(I[:n, :n], 80, 101)[0]
+            for q in [99.2, 98., 95.]:
+                R = cv2.threshold(I_radon, np.percentile(I_radon, q), 255, cv2.THRESH_BINARY)[1]
+                R = cv2.erode(src = R.astype(np.uint8), kernel = SE)
+                masks += [R[:int(n/2)], R[int(n/2):]]
+        rng = np.random.default_rng(0)
+        for k in range(60):
+            noise = cv2.GaussianBlur(rng.random((80, 60)), (0, 0), 1 + k % 3)
+            masks.append(np.uint8(noise > np.percentile(noise, 70 + k % 25)) * 255)
+        for rows in [[(5, 10), (5, 10)], [(5, 10), (5, 12), (30, 35)], [(0, 4), (60, 79), (60, 79)],\
+                     [(10, 20), (22, 30), (22, 30), (50, 79)], [(0, 79), (0, 79)]]:
+            R = np.zeros((80, 60), np.uint8)
+            for k, (top, bottom) in enumerate(rows):
+                R[top:bottom+1, 12*k:12*k+8] = 255
+            masks.append(R)
+        masks.append(np.zeros((80, 60), np.uint8))
+        return masks
+
+    def test_selectRegion(self):
+        for R in self.masks():
+            labels, regions = apoL._candidateRegions(R, np.float64(R))
+            contours = cv2.findContours(R, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[0]
+            self.assertEqual(list(regions['size']), [c.shape[0] for c in contours])
+            for calibV in [0.1, 0.5]:
+                for mode in ['top', 'inf', 'one']:
+                    ref = referenceSelection(R, calibV, mode)
+                    k = apoL._selectRegion(regions, calibV, fromBottom = mode == 'inf', skin = mode != 'one')
+                    if ref is None:
+                        self.assertIsNone(k)
+                    else:
+                        self.assertEqual(regions['label'][k], labels[ref[0, 0, 1], ref[0, 0, 0]])
+
+
+class TestRadonCache(unittest.TestCase):
+    """The sparse radon operator is only built for stacks of at least
+    minImages images, and gives the same transform as skimage."""
+
+    def test_project(self):
+        from skimage.transform import radon
+
+        rng = np.random.default_rng(0)
+        images = rng.random((3, 41, 41))
+        theta = np.arange(80., 101.)
+        cache = apoL.RadonCache(minImages = 3)
+        ref = np.stack([radon(I, theta = theta, circle = True) for I in images])
+        #images projected one by one, or in a too small stack: not built
+        for I, R in zip(images, ref):
+            np.testing.assert_allclose(cache.project(I, theta), R)
+        np.testing.assert_allclose(cache.project(images[1:], theta), ref[1:])
+        self.assertEqual(cache.report()['entries'], 0)
+        np.testing.assert_allclose(cache.project(images, theta), ref, atol = 1e-10)
+        self.assertEqual(cache.report()['entries'], 1)
+        #built matrix reused for a single image
+        np.testing.assert_allclose(cache.project(images[0], theta), ref[0], atol = 1e-10)
+        self.assertEqual(cache.report()['hits'], 1)
+        #images of another size: built for a stack, not for a single image
+        cache.project(images[:, :31, :31], theta[:5])
+        self.assertEqual(cache.report()['entries'], 2)
+        cache.project(images[0, :21, :21], theta)
+        self.assertEqual(cache.report()['entries'], 2)
+        #too large for maxBytes
+        small = apoL.RadonCache(maxBytes = 2**10, minImages = 1)
+        np.testing.assert_allclose(small.project(images[0], theta), ref[0])
+        self.assertEqual(small.report()['entries'], 0)
+
+
+class TestApoTracker(unittest.TestCase):
+    """Locates the aponeuroses of the same image twice with a tracker: the
+    second location is computed around the lines of the first one."""
+
+    def test_locate(self):
+        I = preprocessingApo(I = dt.skmuscimg(), typeI = 'simple', mode = 'localmean',\
+                             margin = 0, sizeContrast = 41)
+        tracker = apoL.ApoTracker()
+        ref = apoL.twoApoLocation(I, calibV = 0.1, angle1 = 80, angle2 = 101)
+        self.assertEqual(tracker.locate(I, 0.1, 80, 101), ref)
+        self.assertEqual(tracker.locate(I, 0.1, 80, 101), ref)
+        self.assertEqual(tracker.report(), {'windowed': 1, 'full': 1})
+        with self.assertRaises(ValueError):
+            apoL.twoApoLocation(I, 0.1, 80, 101, prior = ref[:2], backprojection = True)
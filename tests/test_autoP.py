@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.autoP`."""
+
+
+import unittest
+
+import numpy as np
+
+import SAMAE.data as dt
+import SAMAE.autoP as autoP
+from SAMAE.preprocessing.preprocess import preprocessingApo
+
+
+class TestDetectBands(unittest.TestCase):
+    """Detection of the aponeuroses in the bands of a panoramic image built
+    from the sample image skmuscimg (3 bands)."""
+
+    def setUp(self):
+        I = preprocessingApo(I = dt.skmuscimg(), typeI = 'simple', mode = 'localmean',\
+                             margin = 0, sizeContrast = 41)
+        self.I = np.hstack([I, I[:, ::-1], I])[:, :1500]
+
+    def assertSameBands(self, bands1, bands2):
+        self.assertEqual(len(bands1), len(bands2))
+        for band1, band2 in zip(bands1, bands2):
+            self.assertEqual(band1['index'], band2['index'])
+            for apo in ['sup', 'inf']:
+                if band1[apo] is None:
+                    self.assertIsNone(band2[apo])
+                    continue
+                for key in ['steps', 'warm', 'rows', 'columns']:
+                    self.assertEqual(band1[apo][key], band2[apo][key])
+                np.testing.assert_array_equal(band1[apo]['contour'], band2[apo]['contour'])
+
+    def test_workers(self):
+        bands = autoP.detectBands(self.I, 0.1, (0, self.I.shape[1]), workers = 1)
+        self.assertEqual([band['index'] for band in bands], [0, 1, 2])
+        #second band warm started from the first one, in the same chain
+        self.assertTrue(bands[1]['sup']['warm'])
+        self.assertSameBands(autoP.detectBands(self.I, 0.1, (0, self.I.shape[1]), workers = 2), bands)
+
+    def test_narrowImage(self):
+        I = self.I[:, :400]
+        self.assertEqual(autoP.detectBands(I, 0.1, (0, I.shape[1])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
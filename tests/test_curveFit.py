@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Tests for `SAMAE.curveFit`."""
+
+
+import unittest
+
+import numpy as np
+
+import SAMAE.curveFit as curveFit
+from SAMAE.curveFit import ColumnCurve
+
+
+class TestFitPolynomials(unittest.TestCase):
+    """Compares the batched fitting with numpy.polyfit applied to each set
+    of points."""
+
+    def setUp(self):
+        """Noisy parabolas of various lengths, with repeated columns."""
+        rng = np.random.default_rng(0)
+        self.points = []
+        for n in [5, 17, 40, 3]:
+            columns = rng.integers(0, 300, n)
+            rows = 0.002*columns**2 - 0.5*columns + 80 + rng.normal(0, 2, n)
+            self.points.append(np.stack([rows, columns], axis = 1))
+
+    def test_dedupeColumns(self):
+        rows, columns, starts = curveFit.dedupeColumns([[(3, 7), (4, 2), (5, 7)], [(1, 1)]])
+        self.assertEqual(rows.tolist(), [4, 3, 1])
+        self.assertEqual(columns.tolist(), [2, 7, 1])
+        self.assertEqual(starts.tolist(), [0, 2, 3])
+
+    def test_fitPolynomials(self):
+        columns = np.arange(0, 300)
+        for d in [1, 2]:
+            bank = curveFit.fitPolynomials(self.points, d)
+            self.assertEqual(bank(columns).shape, (len(self.points), columns.size))
+            for k, p in enumerate(self.points):
+                _, first = np.unique(p[:, 1], return_index = True)
+                ref = np.poly1d(np.polyfit(p[first, 1], p[first, 0], deg = d))
+                np.testing.assert_allclose(bank(columns)[k], ref(columns), atol = 1e-6)
+                np.testing.assert_allclose(bank[k](columns), ref(columns), atol = 1e-6)
+        both = curveFit.fitPolynomials(self.points, 2) + curveFit.fitPolynomials(self.points[:1], 1)
+        self.assertEqual(len(both), len(self.points) + 1)
+
+    def test_emptySet(self):
+        #numpy.polyfit raises on an empty set of points
+        with self.assertRaises(ValueError):
+            curveFit.fitPolynomials(self.points[:2] + [np.zeros((0, 2))], 2)
+        self.assertEqual(len(curveFit.fitPolynomials([], 2)), 0)
+
+
+class TestColumnCurve(unittest.TestCase):
+    """Lookup of the rows of a curve by column."""
+
+    def test_fromPoints(self):
+        points = np.array([[10, 3], [12, 5], [14, 3], [20, 6]])
+        self.assertEqual(ColumnCurve.fromPoints(points).at(3), 10)
+        self.assertEqual(ColumnCurve.fromPoints(points, keep = 'last').at(3), 14)
+        curve = ColumnCurve.fromPoints(points, keep = 'mean')
+        self.assertEqual(len(curve), 3)
+        np.testing.assert_array_equal(curve.at([2, 3, 4, 5, 6, 7]), [np.nan, 12, np.nan, 12, 20, np.nan])
+        np.testing.assert_array_equal(curve.toPoints(), [[12, 3], [12, 5], [20, 6]])
+        self.assertEqual(curve.interpolate(4), 12)
+        with self.assertRaises(ValueError):
+            ColumnCurve.fromPoints(points, keep = 'middle')
+
+
+if __name__ == '__main__':
+    unittest.main()